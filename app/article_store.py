@@ -0,0 +1,327 @@
+"""
+文章库模块（持久化保存解析结果和压缩后的原始 HTML）
+
+正文在 ARTICLE_STORE_CONTENT_TTL 内有效时只需刷新阅读量和点赞数；正文过期后重新抓取，
+HTML 的 SHA-256 与保存的一致时沿用保存的解析结果（跳过正文解析和 OCR）。
+解析器版本（PARSER_VERSION）升级后可用保存的 HTML 重新解析，无需再次抓取。
+
+离线重新解析旧版本记录（在项目根目录运行）：
+    python -m app.article_store reparse --limit 1000
+修改 CONTENT_HTML_PROFILE 等影响解析结果的配置后，用 --all 重新解析全部记录：
+    python -m app.article_store reparse --all --limit 100000
+"""
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import sqlite3
+import threading
+import time
+import zlib
+from typing import List, Optional
+from app.cache import STATS_FIELDS
+from app.config import settings
+
+
+class ArticleStore:
+    """
+    文章库接口
+
+    同步方法在调用方线程中执行，异步方法在线程中执行同步方法（不阻塞事件循环）。
+    记录格式：{"url", "article", "html", "html_sha256", "parser_version", "fetched_at", "stats_updated_at"}，
+    article 包含统计字段。
+    """
+
+    def get(self, url: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    def get_unchanged(self, url: str, sha256: str) -> Optional[dict]:
+        """保存的 HTML 哈希等于 sha256 时返回记录，否则返回 None"""
+        record = self.get(url)
+        return record if record and record["html_sha256"] == sha256 else None
+
+    def put(self, url: str, article: dict, html: str, parser_version: int):
+        """保存新抓取的文章（解析结果和原始 HTML）"""
+        raise NotImplementedError
+
+    def update_article(self, url: str, article: dict, parser_version: int):
+        """用保存的 HTML 重新解析后更新解析结果（HTML 和抓取时间不变）"""
+        raise NotImplementedError
+
+    def update_stats(self, url: str, read_count: Optional[int], like_count: Optional[int]):
+        """只更新阅读量和点赞数"""
+        raise NotImplementedError
+
+    def mark_refetched(self, url: str, read_count: Optional[int], like_count: Optional[int]):
+        """重新抓取的 HTML 未变化：更新抓取时间和统计字段（解析结果不变）"""
+        raise NotImplementedError
+
+    def outdated_urls(self, parser_version: int, limit: int) -> List[str]:
+        """解析器版本低于 parser_version 的文章 URL"""
+        raise NotImplementedError
+
+    def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+    async def aget(self, url: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.get, url)
+
+    async def aget_unchanged(self, url: str, sha256: str) -> Optional[dict]:
+        return await asyncio.to_thread(self.get_unchanged, url, sha256)
+
+    async def aput(self, url: str, article: dict, html: str, parser_version: int):
+        await asyncio.to_thread(self.put, url, article, html, parser_version)
+
+    async def aupdate_article(self, url: str, article: dict, parser_version: int):
+        await asyncio.to_thread(self.update_article, url, article, parser_version)
+
+    async def aupdate_stats(self, url: str, read_count: Optional[int], like_count: Optional[int]):
+        await asyncio.to_thread(self.update_stats, url, read_count, like_count)
+
+    async def amark_refetched(self, url: str, read_count: Optional[int], like_count: Optional[int]):
+        await asyncio.to_thread(self.mark_refetched, url, read_count, like_count)
+
+
+def html_sha256(html: str) -> str:
+    """原始 HTML 的 SHA-256（判断重新抓取的页面是否变化）"""
+    return hashlib.sha256(html.encode("utf-8")).hexdigest()
+
+
+_SELECT_RECORD = (
+    "SELECT article, html, html_sha256, parser_version, read_count, like_count, fetched_at, stats_updated_at "
+    "FROM articles WHERE url = ?"
+)
+
+
+def _pack(value: str, level: int) -> bytes:
+    return zlib.compress(value.encode("utf-8"), level)
+
+
+def _unpack(value: bytes) -> str:
+    return zlib.decompress(value).decode("utf-8")
+
+
+class SQLiteArticleStore(ArticleStore):
+    """SQLite 文章库：解析结果（不含统计字段）和原始 HTML 均以 zlib 压缩保存"""
+
+    def __init__(self, path: str, compress_level: int = 6, busy_timeout: int = 5000):
+        self.path = path
+        self.compress_level = compress_level
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        # queue 模式下 API 进程和各工作进程共用同一个文件：WAL 下读写互不阻塞，写入冲突时等待而不是立即报错
+        # （busy_timeout 需在切换日志模式之前设置，切换本身也可能与其他进程冲突）
+        self._conn.execute(f"PRAGMA busy_timeout={int(busy_timeout)}")
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS articles ("
+            "url TEXT PRIMARY KEY, article BLOB NOT NULL, html BLOB NOT NULL, html_sha256 TEXT NOT NULL, "
+            "html_size INTEGER NOT NULL, parser_version INTEGER NOT NULL, read_count INTEGER, like_count INTEGER, "
+            "fetched_at REAL NOT NULL, parsed_at REAL NOT NULL, stats_updated_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_articles_parser_version ON articles (parser_version)")
+        self._conn.commit()
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.writes = 0
+        self.unchanged_refetches = 0
+        self.html_bytes = 0
+        self.html_stored_bytes = 0
+
+    def _pack_article(self, article: dict) -> bytes:
+        content = {k: v for k, v in article.items() if k not in STATS_FIELDS}
+        return _pack(json.dumps(content, ensure_ascii=False), self.compress_level)
+
+    def get(self, url: str) -> Optional[dict]:
+        with self._lock:
+            row = self._conn.execute(_SELECT_RECORD, (url,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        return self._record(url, row)
+
+    def get_unchanged(self, url: str, sha256: str) -> Optional[dict]:
+        # 哈希不一致时不解压正文和 HTML
+        with self._lock:
+            row = self._conn.execute(_SELECT_RECORD + " AND html_sha256 = ?", (url, sha256)).fetchone()
+        return self._record(url, row) if row else None
+
+    @staticmethod
+    def _record(url: str, row: tuple) -> dict:
+        article, html, sha256, parser_version, read_count, like_count, fetched_at, stats_updated_at = row
+        return {
+            "url": url,
+            "article": {**json.loads(_unpack(article)), "read_count": read_count, "like_count": like_count},
+            "html": _unpack(html),
+            "html_sha256": sha256,
+            "parser_version": parser_version,
+            "fetched_at": fetched_at,
+            "stats_updated_at": stats_updated_at,
+        }
+
+    def put(self, url: str, article: dict, html: str, parser_version: int):
+        now = time.time()
+        raw = html.encode("utf-8")
+        packed_html = zlib.compress(raw, self.compress_level)
+        packed_article = self._pack_article(article)
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO articles (url, article, html, html_sha256, html_size, parser_version, "
+                "read_count, like_count, fetched_at, parsed_at, stats_updated_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (url, packed_article, packed_html, html_sha256(html), len(raw), parser_version,
+                 article.get("read_count"), article.get("like_count"), now, now, now)
+            )
+            self._conn.commit()
+        self.writes += 1
+        self.html_bytes += len(raw)
+        self.html_stored_bytes += len(packed_html)
+
+    def update_article(self, url: str, article: dict, parser_version: int):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE articles SET article = ?, parser_version = ?, parsed_at = ? WHERE url = ?",
+                (self._pack_article(article), parser_version, time.time(), url)
+            )
+            self._conn.commit()
+
+    def update_stats(self, url: str, read_count: Optional[int], like_count: Optional[int]):
+        with self._lock:
+            self._conn.execute(
+                "UPDATE articles SET read_count = ?, like_count = ?, stats_updated_at = ? WHERE url = ?",
+                (read_count, like_count, time.time(), url)
+            )
+            self._conn.commit()
+
+    def mark_refetched(self, url: str, read_count: Optional[int], like_count: Optional[int]):
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "UPDATE articles SET read_count = ?, like_count = ?, fetched_at = ?, stats_updated_at = ? WHERE url = ?",
+                (read_count, like_count, now, now, url)
+            )
+            self._conn.commit()
+        self.unchanged_refetches += 1
+
+    def outdated_urls(self, parser_version: int, limit: int) -> List[str]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT url FROM articles WHERE parser_version < ? LIMIT ?", (parser_version, limit)
+            ).fetchall()
+        return [row[0] for row in rows]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+    def stats(self) -> dict:
+        with self._lock:
+            entries, html_size = self._conn.execute("SELECT COUNT(*), COALESCE(SUM(html_size), 0) FROM articles").fetchone()
+        return {
+            "backend": "sqlite",
+            "entries": entries,
+            "html_bytes": html_size,
+            "hits": self.hits,
+            "misses": self.misses,
+            "writes": self.writes,
+            "unchanged_refetches": self.unchanged_refetches,
+            "compression_ratio": round(self.html_stored_bytes / self.html_bytes, 3) if self.html_bytes else None,
+        }
+
+
+def _create_store() -> Optional[ArticleStore]:
+    backend = settings.ARTICLE_STORE_BACKEND
+    if backend == "none":
+        return None
+    if backend == "sqlite":
+        return SQLiteArticleStore(
+            settings.ARTICLE_STORE_PATH, settings.ARTICLE_STORE_COMPRESS_LEVEL, settings.ARTICLE_STORE_BUSY_TIMEOUT
+        )
+    raise ValueError(f"Unknown ARTICLE_STORE_BACKEND: {backend}. Expected 'sqlite' or 'none'.")
+
+
+# 全局文章库实例（单例模式）
+_store_instance: Optional[ArticleStore] = None
+_store_initialized = False
+
+
+def get_article_store() -> Optional[ArticleStore]:
+    """获取文章库实例（ARTICLE_STORE_BACKEND=none 时返回 None）"""
+    global _store_instance, _store_initialized
+    if not _store_initialized:
+        _store_instance = _create_store()
+        _store_initialized = True
+    return _store_instance
+
+
+def close_article_store():
+    """关闭文章库"""
+    global _store_instance, _store_initialized
+    if _store_instance:
+        _store_instance.close()
+    _store_instance = None
+    _store_initialized = False
+
+
+async def _reparse_outdated(limit: int, reparse_all: bool = False):
+    # 延迟导入，避免与 service 循环引用
+    from app.executors import shutdown_executors
+    from app.parser import PARSER_VERSION
+    from app.service import reparse_stored_article
+
+    store = get_article_store()
+    if store is None:
+        print("Article store is disabled (ARTICLE_STORE_BACKEND=none)")
+        return
+
+    # --all 时选出所有版本不高于当前版本的记录
+    urls = store.outdated_urls(PARSER_VERSION + 1 if reparse_all else PARSER_VERSION, limit)
+    if reparse_all:
+        print(f"Re-parsing {len(urls)} articles")
+    else:
+        print(f"Re-parsing {len(urls)} articles with parser version < {PARSER_VERSION}")
+    started = time.monotonic()
+    failed = 0
+    for url in urls:
+        record = await store.aget(url)
+        try:
+            await reparse_stored_article(store, record)
+        except Exception as e:
+            failed += 1
+            print(f"Failed to re-parse {url}: {e}")
+    print(f"Re-parsed {len(urls) - failed} articles in {time.monotonic() - started:.2f}s ({failed} failed)")
+    shutdown_executors()
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="Article store maintenance")
+    subparsers = parser.add_subparsers(dest="command", required=True)
+    reparse = subparsers.add_parser("reparse", help="用保存的 HTML 重新解析旧解析器版本的文章（不重新抓取）")
+    reparse.add_argument("--limit", type=int, default=1000, help="本次最多处理的文章数")
+    reparse.add_argument("--all", action="store_true", help="重新解析全部文章（不只是旧解析器版本的文章）")
+    subparsers.add_parser("stats", help="输出文章库统计信息")
+    args = parser.parse_args(argv)
+
+    try:
+        if args.command == "reparse":
+            asyncio.run(_reparse_outdated(args.limit, args.all))
+        elif args.command == "stats":
+            store = get_article_store()
+            print(json.dumps(store.stats() if store else None, indent=2))
+    finally:
+        close_article_store()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,225 @@
+"""文章解析结果缓存模块"""
+import json
+import time
+from collections import OrderedDict
+from typing import Optional, Tuple
+from app.config import settings
+
+
+# 变化频繁的统计字段，单独缓存并使用较短的 TTL
+STATS_FIELDS = ("read_count", "like_count")
+
+
+class CacheBackend:
+    """缓存后端接口"""
+
+    async def get(self, key: str) -> Optional[dict]:
+        raise NotImplementedError
+
+    async def set(self, key: str, value: dict, ttl: int):
+        raise NotImplementedError
+
+    async def delete(self, key: str):
+        raise NotImplementedError
+
+    async def close(self):
+        pass
+
+    def stats(self) -> dict:
+        return {}
+
+
+class MemoryCache(CacheBackend):
+    """进程内 LRU 缓存（带过期时间和条目数上限）"""
+
+    def __init__(self, max_entries: int):
+        self.max_entries = max(1, max_entries)
+        self._data: "OrderedDict[str, Tuple[float, dict]]" = OrderedDict()
+        self.evictions = 0
+
+    async def get(self, key: str) -> Optional[dict]:
+        entry = self._data.get(key)
+        if entry is None:
+            return None
+
+        expires_at, value = entry
+        if expires_at <= time.monotonic():
+            del self._data[key]
+            return None
+
+        self._data.move_to_end(key)
+        return dict(value)
+
+    async def set(self, key: str, value: dict, ttl: int):
+        self._data[key] = (time.monotonic() + ttl, dict(value))
+        self._data.move_to_end(key)
+        while len(self._data) > self.max_entries:
+            self._data.popitem(last=False)
+            self.evictions += 1
+
+    async def delete(self, key: str):
+        self._data.pop(key, None)
+
+    def stats(self) -> dict:
+        return {
+            "backend": "memory",
+            "entries": len(self._data),
+            "max_entries": self.max_entries,
+            "evictions": self.evictions,
+        }
+
+
+class RedisCache(CacheBackend):
+    """Redis 缓存（需要安装 redis 包）"""
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise ValueError("CACHE_BACKEND=redis requires the 'redis' package. Please install it with `pip install redis`.")
+
+        self.url = url
+        self._client = aioredis.from_url(url)
+
+    async def get(self, key: str) -> Optional[dict]:
+        raw = await self._client.get(key)
+        if raw is None:
+            return None
+        return json.loads(raw)
+
+    async def set(self, key: str, value: dict, ttl: int):
+        await self._client.set(key, json.dumps(value, ensure_ascii=False), ex=ttl)
+
+    async def delete(self, key: str):
+        await self._client.delete(key)
+
+    async def close(self):
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {"backend": "redis"}
+
+
+class ArticleCache:
+    """
+    文章缓存
+
+    以清理后的文章 URL 为键，正文等字段与阅读量/点赞数分开存储：
+    正文使用较长的 TTL，统计字段使用较短的 TTL。
+    不同正文格式（variant，如 markdown）的正文分别缓存，统计字段共用。
+    """
+
+    def __init__(self, backend: CacheBackend, content_ttl: int, stats_ttl: int):
+        self.backend = backend
+        self.content_ttl = content_ttl
+        self.stats_ttl = stats_ttl
+
+        # 统计
+        self.hits = 0
+        self.partial_hits = 0
+        self.misses = 0
+
+    @staticmethod
+    def _key(url: str, part: str) -> str:
+        return f"article:{part}:{url}"
+
+    @staticmethod
+    def _content_part(variant: Optional[str]) -> str:
+        return f"content:{variant}" if variant else "content"
+
+    async def get(self, url: str, variant: Optional[str] = None) -> Tuple[Optional[dict], Optional[dict]]:
+        """
+        读取缓存
+
+        Args:
+            url: 清理后的文章 URL
+            variant: 正文格式（None 为默认的 HTML 正文）
+
+        Returns:
+            (正文字段, 统计字段)，未命中或已过期的部分为 None
+        """
+        try:
+            content = await self.backend.get(self._key(url, self._content_part(variant)))
+            stats = await self.backend.get(self._key(url, "stats")) if content else None
+        except Exception as e:
+            print(f"Error reading cache for {url}: {e}")
+            content, stats = None, None
+
+        if content and stats:
+            self.hits += 1
+        elif content:
+            self.partial_hits += 1
+        else:
+            self.misses += 1
+        return content, stats
+
+    async def set(self, url: str, article: dict, variant: Optional[str] = None):
+        """写入完整的文章数据"""
+        if await self.set_content(url, article, variant):
+            await self.set_stats(url, article.get("read_count"), article.get("like_count"))
+
+    async def set_content(self, url: str, article: dict, variant: Optional[str] = None) -> bool:
+        """只写入正文等字段（忽略统计字段），返回是否写入成功"""
+        content = {k: v for k, v in article.items() if k not in STATS_FIELDS}
+        try:
+            await self.backend.set(self._key(url, self._content_part(variant)), content, self.content_ttl)
+        except Exception as e:
+            print(f"Error writing cache for {url}: {e}")
+            return False
+        return True
+
+    async def set_stats(self, url: str, read_count: Optional[int], like_count: Optional[int]):
+        """只写入阅读量和点赞数"""
+        stats = {"read_count": read_count, "like_count": like_count}
+        try:
+            await self.backend.set(self._key(url, "stats"), stats, self.stats_ttl)
+        except Exception as e:
+            print(f"Error writing cache stats for {url}: {e}")
+
+    async def close(self):
+        await self.backend.close()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        return {
+            **self.backend.stats(),
+            "hits": self.hits,
+            "partial_hits": self.partial_hits,
+            "misses": self.misses,
+        }
+
+
+def _create_backend() -> Optional[CacheBackend]:
+    backend = settings.CACHE_BACKEND
+    if backend == "none":
+        return None
+    if backend == "memory":
+        return MemoryCache(settings.CACHE_MAX_ENTRIES)
+    if backend == "redis":
+        return RedisCache(settings.REDIS_URL)
+    raise ValueError(f"Unknown CACHE_BACKEND: {backend}. Expected 'memory', 'redis' or 'none'.")
+
+
+# 全局缓存实例（单例模式）
+_cache_instance: Optional[ArticleCache] = None
+_cache_initialized = False
+
+
+def get_article_cache() -> Optional[ArticleCache]:
+    """获取文章缓存实例（CACHE_BACKEND=none 时返回 None）"""
+    global _cache_instance, _cache_initialized
+    if not _cache_initialized:
+        backend = _create_backend()
+        if backend is not None:
+            _cache_instance = ArticleCache(backend, settings.CACHE_CONTENT_TTL, settings.CACHE_STATS_TTL)
+        _cache_initialized = True
+    return _cache_instance
+
+
+async def close_article_cache():
+    """关闭文章缓存"""
+    global _cache_instance, _cache_initialized
+    if _cache_instance:
+        await _cache_instance.close()
+    _cache_instance = None
+    _cache_initialized = False
@@ -0,0 +1,119 @@
+"""响应压缩模块（按 Accept-Encoding 选择 brotli 或 gzip）"""
+import asyncio
+import gzip
+from typing import Optional
+from app.config import settings
+
+try:
+    import brotli
+except ImportError:  # brotli 为可选依赖，未安装时只使用 gzip
+    brotli = None
+
+
+def choose_encoding(accept_encoding: str) -> Optional[str]:
+    """
+    根据 Accept-Encoding 选择压缩算法（优先 br，其次 gzip），都不接受时返回 None
+
+    忽略 q=0 的编码；不解析其余权重（客户端同时接受两者时总是选择压缩率更高的 br）。
+    """
+    accepted = set()
+    for part in accept_encoding.lower().split(","):
+        name, _, params = part.strip().partition(";")
+        key, _, value = params.partition("=")
+        if key.strip() == "q":
+            try:
+                if float(value) <= 0:
+                    continue
+            except ValueError:
+                continue
+        accepted.add(name.strip())
+
+    if brotli is not None and ("br" in accepted or "*" in accepted):
+        return "br"
+    if "gzip" in accepted or "*" in accepted:
+        return "gzip"
+    return None
+
+
+def compress(body: bytes, encoding: str) -> bytes:
+    if encoding == "br":
+        return brotli.compress(body, quality=settings.RESPONSE_BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=settings.RESPONSE_GZIP_LEVEL)
+
+
+def _merge_vary(headers: list) -> list:
+    """在 Vary 头中加入 Accept-Encoding（已有 Vary 时合并，不重复添加）"""
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == b"vary":
+            fields = {field.strip().lower() for field in value.split(b",")}
+            if b"*" in fields or b"accept-encoding" in fields:
+                return headers
+            headers[index] = (name, value + b", Accept-Encoding")
+            return headers
+    headers.append((b"vary", b"Accept-Encoding"))
+    return headers
+
+
+class CompressionMiddleware:
+    """
+    ASGI 中间件：压缩不小于 RESPONSE_COMPRESS_MIN_SIZE 字节的完整响应体
+
+    流式响应（如批量解析的 NDJSON）和已设置 Content-Encoding 的响应原样返回，
+    以免缓冲整个流、推迟客户端收到第一条结果。其余响应无论是否压缩都带 Vary: Accept-Encoding，
+    不小于 RESPONSE_COMPRESS_THREAD_SIZE 字节的响应体在线程中压缩，不阻塞事件循环。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        accept_encoding = ""
+        for name, value in scope.get("headers", []):
+            if name == b"accept-encoding":
+                accept_encoding = value.decode("latin-1")
+                break
+        encoding = choose_encoding(accept_encoding) if accept_encoding else None
+
+        start_message = None
+        passthrough = False
+
+        async def send_compressed(message):
+            nonlocal start_message, passthrough
+            if message["type"] == "http.response.start":
+                # 等拿到第一段响应体后再决定是否压缩
+                start_message = message
+                return
+            if message["type"] != "http.response.body" or passthrough or start_message is None:
+                await send(message)
+                return
+
+            passthrough = True
+            headers = list(start_message.get("headers", []))
+            body = message.get("body", b"")
+            already_encoded = any(name.lower() == b"content-encoding" for name, _ in headers)
+            if message.get("more_body", False) or already_encoded:
+                await send(start_message)
+                await send(message)
+                return
+
+            headers = _merge_vary(headers)
+            if encoding is None or len(body) < settings.RESPONSE_COMPRESS_MIN_SIZE:
+                await send({**start_message, "headers": headers})
+                await send(message)
+                return
+
+            if len(body) >= settings.RESPONSE_COMPRESS_THREAD_SIZE:
+                compressed = await asyncio.to_thread(compress, body, encoding)
+            else:
+                compressed = compress(body, encoding)
+            headers = [(name, value) for name, value in headers if name.lower() != b"content-length"]
+            headers.append((b"content-encoding", encoding.encode()))
+            headers.append((b"content-length", str(len(compressed)).encode()))
+            await send({**start_message, "headers": headers})
+            await send({**message, "body": compressed})
+
+        await self.app(scope, receive, send_compressed)
@@ -10,6 +10,43 @@ class Settings(BaseSettings):
     # 并发控制
     MAX_CONCURRENCY: int = int(os.getenv("MAX_CONCURRENCY", "5"))
     
+    # 准入队列（超过 MAX_CONCURRENCY 的请求排队等待）
+    MAX_QUEUE_SIZE: int = int(os.getenv("MAX_QUEUE_SIZE", "50"))  # 等待队列长度上限，满了直接返回 503
+    MAX_QUEUE_WAIT: float = float(os.getenv("MAX_QUEUE_WAIT", "30"))  # 排队最长等待时间（秒）
+    
+    # 批量解析
+    BATCH_MAX_URLS: int = int(os.getenv("BATCH_MAX_URLS", "500"))  # 单批次 URL 数量上限
+    BATCH_CONCURRENCY: int = int(os.getenv("BATCH_CONCURRENCY", os.getenv("MAX_CONCURRENCY", "5")))  # 单批次最大并行数
+    
+    # 异步解析任务（POST /api/jobs）
+    JOBS_MAX_ACTIVE: int = int(os.getenv("JOBS_MAX_ACTIVE", "100"))  # 进行中的任务数上限，超过返回 503
+    JOBS_MAX_ENTRIES: int = int(os.getenv("JOBS_MAX_ENTRIES", "1000"))  # 内存中保留的任务数上限
+    JOBS_TTL: int = int(os.getenv("JOBS_TTL", "3600"))  # 已结束任务的保留时间（秒）
+    JOB_WEBHOOK_TIMEOUT: float = float(os.getenv("JOB_WEBHOOK_TIMEOUT", "10"))  # 单次回调超时（秒）
+    JOB_WEBHOOK_MAX_RETRIES: int = int(os.getenv("JOB_WEBHOOK_MAX_RETRIES", "5"))  # 回调失败后的最大重试次数
+    JOB_WEBHOOK_RETRY_BASE_DELAY: float = float(os.getenv("JOB_WEBHOOK_RETRY_BASE_DELAY", "2"))  # 重试退避基数（秒）
+    JOB_WEBHOOK_SECRET: Optional[str] = os.getenv("JOB_WEBHOOK_SECRET", None)  # 设置后回调带 HMAC-SHA256 签名
+    JOB_WEBHOOK_ALLOW_PRIVATE: bool = os.getenv("JOB_WEBHOOK_ALLOW_PRIVATE", "false").lower() == "true"  # 允许回调内网地址（仅用于本地调试）
+    
+    # 执行方式：inline（API 进程内抓取和解析）或 queue（API 进程只入队，由爬虫工作进程消费）
+    EXECUTION_MODE: str = os.getenv("EXECUTION_MODE", "inline")
+    QUEUE_BACKEND: str = os.getenv("QUEUE_BACKEND", "multiprocessing")  # multiprocessing（本机子进程）或 redis（Redis Streams，可跨机器）
+    QUEUE_WORKERS: int = int(os.getenv("QUEUE_WORKERS", "2"))  # multiprocessing 后端由 API 进程启动的工作进程数
+    WORKER_CONCURRENCY: int = int(os.getenv("WORKER_CONCURRENCY", os.getenv("MAX_CONCURRENCY", "5")))  # 每个工作进程同时处理的任务数
+    QUEUE_RESULT_TIMEOUT: float = float(os.getenv("QUEUE_RESULT_TIMEOUT", "120"))  # 等待任务结果的最长时间（秒），超时返回 503
+    QUEUE_STREAM: str = os.getenv("QUEUE_STREAM", "wechat:parse:jobs")  # Redis 任务流名称
+    QUEUE_GROUP: str = os.getenv("QUEUE_GROUP", "wechat-parse-workers")  # Redis 消费者组名称
+    QUEUE_STREAM_MAXLEN: int = int(os.getenv("QUEUE_STREAM_MAXLEN", "10000"))  # 任务流长度上限（近似裁剪）
+    QUEUE_RESULT_TTL: int = int(os.getenv("QUEUE_RESULT_TTL", "300"))  # Redis 结果保留时间（秒）
+    QUEUE_CLAIM_IDLE: float = float(os.getenv("QUEUE_CLAIM_IDLE", "300"))  # 已领取但超过该时间未确认的任务由其他工作进程接管（秒）
+    
+    # 响应压缩（按 Accept-Encoding 选择 brotli 或 gzip，流式响应不压缩）
+    RESPONSE_COMPRESSION: bool = os.getenv("RESPONSE_COMPRESSION", "true").lower() == "true"
+    RESPONSE_COMPRESS_MIN_SIZE: int = int(os.getenv("RESPONSE_COMPRESS_MIN_SIZE", "1024"))  # 小于该字节数的响应不压缩
+    RESPONSE_COMPRESS_THREAD_SIZE: int = int(os.getenv("RESPONSE_COMPRESS_THREAD_SIZE", "65536"))  # 不小于该字节数的响应在线程中压缩
+    RESPONSE_GZIP_LEVEL: int = int(os.getenv("RESPONSE_GZIP_LEVEL", "6"))
+    RESPONSE_BROTLI_QUALITY: int = int(os.getenv("RESPONSE_BROTLI_QUALITY", "4"))  # 0-11，越高压缩率越高、越慢
+    
     # User-Agent
     USER_AGENT: str = os.getenv(
         "USER_AGENT",
@@ -20,15 +57,115 @@ class Settings(BaseSettings):
     API_TOKEN: Optional[str] = os.getenv("API_TOKEN", None)
     
     # 请求延迟配置（秒）
-    MIN_DELAY: float = 1.0
-    MAX_DELAY: float = 3.0
+    MIN_DELAY: float = float(os.getenv("MIN_DELAY", "1.0"))
+    MAX_DELAY: float = float(os.getenv("MAX_DELAY", "3.0"))
+    
+    # 缓存配置
+    CACHE_BACKEND: str = os.getenv("CACHE_BACKEND", "memory")  # memory、redis 或 none
+    CACHE_MAX_ENTRIES: int = int(os.getenv("CACHE_MAX_ENTRIES", "2000"))  # 内存缓存条目上限（LRU 淘汰）
+    CACHE_CONTENT_TTL: int = int(os.getenv("CACHE_CONTENT_TTL", "86400"))  # 正文等字段缓存时间（秒）
+    CACHE_STATS_TTL: int = int(os.getenv("CACHE_STATS_TTL", "300"))  # 阅读量/点赞数缓存时间（秒）
+    REDIS_URL: str = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+    
+    # 文章库（持久化保存解析结果和压缩后的原始 HTML）
+    ARTICLE_STORE_BACKEND: str = os.getenv("ARTICLE_STORE_BACKEND", "sqlite")  # sqlite 或 none
+    ARTICLE_STORE_PATH: str = os.getenv("ARTICLE_STORE_PATH", "data/articles.sqlite3")
+    ARTICLE_STORE_CONTENT_TTL: int = int(os.getenv("ARTICLE_STORE_CONTENT_TTL", "604800"))  # 保存的正文有效时间（秒），过期后重新抓取
+    ARTICLE_STORE_COMPRESS_LEVEL: int = int(os.getenv("ARTICLE_STORE_COMPRESS_LEVEL", "6"))  # zlib 压缩级别
+    ARTICLE_STORE_BUSY_TIMEOUT: int = int(os.getenv("ARTICLE_STORE_BUSY_TIMEOUT", "5000"))  # 其他进程写入时等待锁的最长时间（毫秒）
+    
+    # 正文 HTML 规范化：raw 原样返回，clean 白名单标签并保留少量排版样式，minimal 只保留语义标签
+    CONTENT_HTML_PROFILE: str = os.getenv("CONTENT_HTML_PROFILE", "raw")
+    
+    # 解析引擎：strained 只构建提取字段用到的元素，full 构建完整文档树
+    PARSER_ENGINE: str = os.getenv("PARSER_ENGINE", "strained")
+    
+    # 执行器配置（HTML 解析和 OCR 在事件循环之外运行）
+    PARSE_EXECUTOR: str = os.getenv("PARSE_EXECUTOR", "thread")  # thread 或 process
+    PARSE_WORKERS: int = int(os.getenv("PARSE_WORKERS", "4"))
+    OCR_EXECUTOR: str = os.getenv("OCR_EXECUTOR", "thread")  # thread 或 process
+    OCR_WORKERS: int = int(os.getenv("OCR_WORKERS", "4"))
+    
+    # 抓取方式：auto（先 HTTP 直接抓取，页面不完整时回退浏览器）、http、browser
+    FETCH_MODE: str = os.getenv("FETCH_MODE", "auto")
+    
+    # HTTP 直接抓取配置
+    HTTP_FETCH_TIMEOUT: float = float(os.getenv("HTTP_FETCH_TIMEOUT", "10"))  # 秒
+    HTTP_FETCH_MAX_CONNECTIONS: int = int(os.getenv("HTTP_FETCH_MAX_CONNECTIONS", "20"))
+    HTTP_FETCH_HTTP2: bool = os.getenv("HTTP_FETCH_HTTP2", "true").lower() == "true"
+    
+    # 抓取时把 https://mp.weixin.qq.com 替换为该地址（用于基准测试的本地模拟服务器，留空则不替换）
+    WECHAT_UPSTREAM_BASE: Optional[str] = os.getenv("WECHAT_UPSTREAM_BASE")
     
     # Playwright 配置
     PLAYWRIGHT_HEADLESS: bool = True
     PLAYWRIGHT_TIMEOUT: int = 30000  # 30秒
     
+    # 请求拦截：none、default（屏蔽图片/媒体/字体和统计上报）、aggressive（另屏蔽样式表）
+    RESOURCE_BLOCK_PROFILE: str = os.getenv("RESOURCE_BLOCK_PROFILE", "default")
+    RESOURCE_BLOCK_TYPES: Optional[str] = os.getenv("RESOURCE_BLOCK_TYPES", None)  # 覆盖配置中的资源类型（逗号分隔）
+    RESOURCE_DENY_HOSTS: Optional[str] = os.getenv("RESOURCE_DENY_HOSTS", None)  # 额外拦截的域名规则（逗号分隔，支持通配符）
+    RESOURCE_ALLOW_HOSTS: Optional[str] = os.getenv("RESOURCE_ALLOW_HOSTS", None)  # 始终放行的域名规则（逗号分隔，支持通配符）
+    
+    # 页面就绪策略：selectors（选择器 + 内容稳定检测）或 networkidle（网络空闲后固定等待）
+    READINESS_STRATEGY: str = os.getenv("READINESS_STRATEGY", "selectors")
+    READINESS_SELECTORS: str = os.getenv("READINESS_SELECTORS", "#js_content,.rich_media_title")  # 必需元素（标题、正文）
+    READINESS_OPTIONAL_SELECTORS: str = os.getenv("READINESS_OPTIONAL_SELECTORS", "#publish_time")  # 可选元素，缺失时不阻塞就绪
+    READINESS_OPTIONAL_WAIT: int = int(os.getenv("READINESS_OPTIONAL_WAIT", "500"))  # 必需元素就绪后等待可选元素的最长时间（毫秒）
+    READINESS_TIMEOUT: int = int(os.getenv("READINESS_TIMEOUT", "5000"))  # 毫秒，超时后按当前内容解析
+    READINESS_POLL_INTERVAL: int = int(os.getenv("READINESS_POLL_INTERVAL", "100"))  # 毫秒
+    READINESS_STABLE_ROUNDS: int = int(os.getenv("READINESS_STABLE_ROUNDS", "2"))  # 正文长度连续不变的轮询次数
+    READINESS_FIXED_DELAY: float = float(os.getenv("READINESS_FIXED_DELAY", "2"))  # networkidle 策略下的固定等待（秒）
+    
+    # 页面池配置（池大小取 MAX_CONCURRENCY）
+    PAGE_MAX_USES: int = int(os.getenv("PAGE_MAX_USES", "50"))  # 单个页面复用次数上限，达到后回收重建
+    
+    # 浏览器监管（健康检查、崩溃恢复、按内存轮换）
+    BROWSER_PREWARM: bool = os.getenv("BROWSER_PREWARM", "true").lower() == "true"  # 启动时预先启动浏览器
+    BROWSER_PREWARM_PAGES: int = int(os.getenv("BROWSER_PREWARM_PAGES", "1"))  # 启动时预先创建的页面数
+    BROWSER_HEALTH_INTERVAL: float = float(os.getenv("BROWSER_HEALTH_INTERVAL", "15"))  # 健康检查间隔（秒），0 表示不检查
+    BROWSER_MAX_RSS_MB: int = int(os.getenv("BROWSER_MAX_RSS_MB", "1536"))  # 浏览器进程内存上限，超过后轮换
+    BROWSER_MAX_OPEN_PAGES: int = int(os.getenv("BROWSER_MAX_OPEN_PAGES", "0"))  # 打开页面数上限，0 表示页面池大小的 2 倍
+    BROWSER_ERROR_WINDOW: int = int(os.getenv("BROWSER_ERROR_WINDOW", "20"))  # 计算失败率的最近抓取次数
+    BROWSER_MAX_ERROR_RATE: float = float(os.getenv("BROWSER_MAX_ERROR_RATE", "0.5"))  # 失败率上限（窗口填满后才判断）
+    BROWSER_MAX_AGE: int = int(os.getenv("BROWSER_MAX_AGE", "0"))  # 浏览器最长运行时间（秒），0 表示不限
+    BROWSER_DRAIN_TIMEOUT: float = float(os.getenv("BROWSER_DRAIN_TIMEOUT", "60"))  # 轮换时等待旧浏览器上进行中抓取的最长时间（秒）
+    
     # DashScope 配置
     DASHSCOPE_API_KEY: Optional[str] = os.getenv("DASHSCOPE_API_KEY", None)
+    DASHSCOPE_BASE_URL: Optional[str] = os.getenv("DASHSCOPE_BASE_URL", None)  # 例如本地桩服务 http://127.0.0.1:8081/api/v1
+    
+    # OCR 并发与限流
+    OCR_CONCURRENCY: int = int(os.getenv("OCR_CONCURRENCY", "4"))  # 单篇文章并行识别的图片数
+    OCR_QPS: float = float(os.getenv("OCR_QPS", "2"))  # 全局请求速率上限（按 DashScope QPS 配额设置）
+    OCR_BURST: float = float(os.getenv("OCR_BURST", "4"))  # 令牌桶容量（允许的突发请求数）
+    OCR_RATE_LIMIT_BACKEND: str = os.getenv("OCR_RATE_LIMIT_BACKEND", "auto")  # auto（QUEUE_BACKEND=redis 时用 redis）、local 或 redis
+    OCR_RATE_LIMIT_KEY: str = os.getenv("OCR_RATE_LIMIT_KEY", "wechat:ocr:ratelimit")  # Redis 共享令牌桶的键
+    OCR_MAX_RETRIES: int = int(os.getenv("OCR_MAX_RETRIES", "3"))  # 限流或服务端错误时的最大重试次数
+    OCR_RETRY_BASE_DELAY: float = float(os.getenv("OCR_RETRY_BASE_DELAY", "1.0"))  # 重试退避基数（秒）
+    
+    # OCR 前的图片预过滤（按 data-w / data-ratio / data-type，缺少尺寸时可读取图片头部）
+    OCR_IMAGE_FILTER_ENABLED: bool = os.getenv("OCR_IMAGE_FILTER_ENABLED", "true").lower() == "true"
+    OCR_IMAGE_PROBE: bool = os.getenv("OCR_IMAGE_PROBE", "true").lower() == "true"  # 缺少尺寸属性时用 Range 请求读取图片头部
+    OCR_IMAGE_PROBE_CONCURRENCY: int = int(os.getenv("OCR_IMAGE_PROBE_CONCURRENCY", "8"))
+    OCR_SKIP_GIF: bool = os.getenv("OCR_SKIP_GIF", "true").lower() == "true"  # 跳过 GIF（表情、动图）
+    OCR_MIN_IMAGE_WIDTH: int = int(os.getenv("OCR_MIN_IMAGE_WIDTH", "200"))  # 宽度小于该值视为图标
+    OCR_MIN_IMAGE_HEIGHT: int = int(os.getenv("OCR_MIN_IMAGE_HEIGHT", "60"))  # 高度小于该值视为装饰条
+    OCR_MIN_IMAGE_RATIO: float = float(os.getenv("OCR_MIN_IMAGE_RATIO", "0.08"))  # 高宽比小于该值视为分隔线
+    OCR_QR_MAX_WIDTH: int = int(os.getenv("OCR_QR_MAX_WIDTH", "430"))  # 不超过该宽度、且有二维码特征（关键词或位于文末）的正方形图片视为二维码
+    
+    # OCR 批量规划：single（逐张）、batch（多图合并）、auto（图片数达到阈值时合并）
+    OCR_BATCH_MODE: str = os.getenv("OCR_BATCH_MODE", "auto")
+    OCR_BATCH_MIN_IMAGES: int = int(os.getenv("OCR_BATCH_MIN_IMAGES", "4"))  # auto 模式下启用合并的最少待识别图片数
+    OCR_BATCH_MAX_IMAGES: int = int(os.getenv("OCR_BATCH_MAX_IMAGES", "6"))  # 单个合并请求的图片数上限
+    OCR_BATCH_TOKEN_BUDGET: int = int(os.getenv("OCR_BATCH_TOKEN_BUDGET", "8000"))  # 单个合并请求的估算输入 token 预算
+    OCR_TOKENS_PER_IMAGE: int = int(os.getenv("OCR_TOKENS_PER_IMAGE", "1280"))  # 单张图片的估算 token 数
+    
+    # OCR 结果缓存（SQLite 持久化）
+    OCR_CACHE_ENABLED: bool = os.getenv("OCR_CACHE_ENABLED", "true").lower() == "true"
+    OCR_CACHE_PATH: str = os.getenv("OCR_CACHE_PATH", "data/ocr_cache.sqlite3")
+    OCR_CACHE_MAX_ENTRIES: int = int(os.getenv("OCR_CACHE_MAX_ENTRIES", "100000"))
+    OCR_CACHE_HASH_CONTENT: bool = os.getenv("OCR_CACHE_HASH_CONTENT", "false").lower() == "true"  # URL 未命中时按图片内容哈希再查一次
     
     # 图片文章检测阈值
     IMAGE_ARTICLE_TEXT_THRESHOLD: int = int(os.getenv("IMAGE_ARTICLE_TEXT_THRESHOLD", "100"))  # 文本长度阈值
@@ -1,9 +1,38 @@
 """Playwright 爬虫模块"""
 import asyncio
+import time
+from collections import deque
 from typing import Optional
 from playwright.async_api import async_playwright, Browser, Page, TimeoutError as PlaywrightTimeoutError
 from app.config import settings
-from app.utils import random_delay
+from app.interceptor import ResourceBlocker
+from app.metrics import FETCH_FAILURES, TIMEOUTS, observe_stage
+from app.pool import PagePool
+
+
+# 页面就绪判断：必需选择器都有内容，且正文长度连续若干次轮询不再变化；
+# 可选选择器（如发布时间）在必需条件满足后最多再等 optionalWait 毫秒，缺失时不阻塞就绪
+_READINESS_JS = """
+([selectors, optionalSelectors, stableRounds, optionalWait]) => {
+    const filled = (selector) => {
+        const el = document.querySelector(selector);
+        return el && (el.textContent.trim().length > 0 || el.querySelector('img') !== null);
+    };
+    const state = window.__articleReadiness || (window.__articleReadiness = {length: -1, stable: 0, readyAt: null});
+    const content = document.querySelector('#js_content');
+    const length = content ? content.innerHTML.length : 0;
+    state.stable = length === state.length ? state.stable + 1 : 0;
+    state.length = length;
+    if (!selectors.every(filled) || state.stable < stableRounds) {
+        state.readyAt = null;
+        return false;
+    }
+    if (state.readyAt === null) {
+        state.readyAt = Date.now();
+    }
+    return optionalSelectors.every(filled) || Date.now() - state.readyAt >= optionalWait;
+}
+"""
 
 
 class WeChatCrawler:
@@ -12,18 +41,79 @@ class WeChatCrawler:
     def __init__(self):
         self.browser: Optional[Browser] = None
         self.playwright = None
+        self.pool: Optional[PagePool] = None
+        
+        # 各阶段耗时统计：{阶段: {"count", "avg_ms", "last_ms"}}
+        self.phase_stats: dict = {}
+        self.readiness_timeouts = 0
+        
+        # 请求拦截累计统计
+        self.resource_totals = {"allowed": 0, "blocked": 0, "bytes_loaded": 0, "estimated_bytes_saved": 0}
+        
+        # 健康状态（供浏览器监管使用）
+        self.started_at: Optional[float] = None
+        self.disconnected = False
+        self.disconnected_event = asyncio.Event()
+        self._closing = False
+        self.active = 0  # 进行中的抓取数
+        self._drained = asyncio.Event()
+        self._drained.set()
+        self.recent_results: deque = deque(maxlen=max(1, settings.BROWSER_ERROR_WINDOW))  # 最近的抓取结果（True 为成功）
     
     async def start(self):
         """启动浏览器"""
         if self.browser is None:
             self.playwright = await async_playwright().start()
-            self.browser = await self.playwright.chromium.launch(
-                headless=settings.PLAYWRIGHT_HEADLESS,
-                args=['--disable-blink-features=AutomationControlled']
-            )
+            try:
+                self.browser = await self.playwright.chromium.launch(
+                    headless=settings.PLAYWRIGHT_HEADLESS,
+                    args=['--disable-blink-features=AutomationControlled']
+                )
+            except Exception:
+                # 启动失败时停止 Playwright 驱动进程，避免残留
+                await self.playwright.stop()
+                self.playwright = None
+                raise
+            self.browser.on("disconnected", self._on_disconnected)
+            self.pool = PagePool(self.browser, blocker=ResourceBlocker.from_settings())
+            self.started_at = time.monotonic()
+            self.disconnected = False
+    
+    def _on_disconnected(self, _browser: Browser):
+        """浏览器断开回调（主动关闭时忽略，其余视为崩溃）"""
+        if self._closing:
+            return
+        print("Browser disconnected unexpectedly")
+        self.disconnected = True
+        self.disconnected_event.set()
+    
+    @property
+    def error_rate(self) -> float:
+        """最近抓取的失败比例"""
+        if not self.recent_results:
+            return 0.0
+        return self.recent_results.count(False) / len(self.recent_results)
+    
+    def open_pages(self) -> int:
+        """浏览器中当前打开的页面数（包括未被页面池管理的页面）"""
+        if not self.browser:
+            return 0
+        return sum(len(context.pages) for context in self.browser.contexts)
+    
+    async def drain(self, timeout: float) -> bool:
+        """等待进行中的抓取完成，超时返回 False"""
+        try:
+            await asyncio.wait_for(self._drained.wait(), timeout)
+            return True
+        except asyncio.TimeoutError:
+            return False
     
     async def close(self):
         """关闭浏览器"""
+        self._closing = True
+        if self.pool:
+            await self.pool.close()
+            self.pool = None
         if self.browser:
             await self.browser.close()
             self.browser = None
@@ -31,42 +121,142 @@ class WeChatCrawler:
             await self.playwright.stop()
             self.playwright = None
     
-    async def fetch_article(self, url: str) -> Optional[str]:
-        """抓取文章HTML内容"""
+    async def fetch_article(self, url: str, trace: Optional[dict] = None) -> Optional[str]:
+        """
+        抓取文章HTML内容
+        
+        Args:
+            url: 文章 URL
+            trace: 可选的追踪字典，各阶段耗时（秒）写入 trace["timings"]，
+                请求拦截计数写入 trace["resources"]
+            
+        Returns:
+            文章 HTML，失败时返回 None
+        """
+        self.active += 1
+        self._drained.clear()
+        try:
+            html = await self._fetch_article(url, trace)
+        finally:
+            self.active -= 1
+            if self.active == 0:
+                self._drained.set()
+        self.recent_results.append(html is not None)
+        return html
+    
+    async def _fetch_article(self, url: str, trace: Optional[dict]) -> Optional[str]:
         if not self.browser:
             await self.start()
         
-        page: Page = await self.browser.new_page()
-        
         try:
-            # 设置 User-Agent
-            await page.set_extra_http_headers({
-                'User-Agent': settings.USER_AGENT
-            })
-            
-            # 访问页面
-            await page.goto(
-                url,
-                wait_until='networkidle',
-                timeout=settings.PLAYWRIGHT_TIMEOUT
-            )
-            
-            # 等待页面加载完成（微信公众号文章可能需要时间渲染）
-            await asyncio.sleep(2)
-            
-            # 获取完整HTML
-            html = await page.content()
-            
-            return html
+            started = time.monotonic()
+            async with self.pool.lease() as pooled:
+                page = pooled.page
+                self._record_phase(trace, "page_acquire", time.monotonic() - started)
+                
+                # 访问页面（User-Agent 已在页面所属的上下文中设置）
+                started = time.monotonic()
+                await page.goto(
+                    url,
+                    wait_until='networkidle' if settings.READINESS_STRATEGY == "networkidle" else 'domcontentloaded',
+                    timeout=settings.PLAYWRIGHT_TIMEOUT
+                )
+                self._record_phase(trace, "navigation", time.monotonic() - started)
+                
+                # 等待正文渲染完成
+                started = time.monotonic()
+                await self._wait_until_ready(page, url)
+                self._record_phase(trace, "readiness", time.monotonic() - started)
+                
+                # 获取完整HTML
+                started = time.monotonic()
+                html = await page.content()
+                self._record_phase(trace, "content", time.monotonic() - started)
+                
+                if pooled.route_stats:
+                    self._record_resources(trace, pooled.route_stats.snapshot())
+                
+                return html
         
         except PlaywrightTimeoutError:
+            TIMEOUTS.labels("navigation").inc()
+            FETCH_FAILURES.labels("browser").inc()
             print(f"Timeout error when fetching: {url}")
             return None
         except Exception as e:
+            FETCH_FAILURES.labels("browser").inc()
             print(f"Error fetching {url}: {e}")
             return None
-        finally:
-            await page.close()
+    
+    async def _wait_until_ready(self, page: Page, url: str):
+        """
+        等待页面就绪
+        
+        networkidle 策略：网络空闲后固定等待 READINESS_FIXED_DELAY 秒（旧行为）。
+        selectors 策略：轮询 READINESS_SELECTORS（标题、正文等必需元素）是否都已有内容且正文长度稳定，
+        READINESS_OPTIONAL_SELECTORS（发布时间等）也已有内容或已额外等待 READINESS_OPTIONAL_WAIT 毫秒时返回；
+        超过 READINESS_TIMEOUT 仍未满足时按当前内容继续解析。
+        """
+        if settings.READINESS_STRATEGY == "networkidle":
+            await asyncio.sleep(settings.READINESS_FIXED_DELAY)
+            return
+        
+        selectors = [s.strip() for s in settings.READINESS_SELECTORS.split(",") if s.strip()]
+        optional_selectors = [s.strip() for s in settings.READINESS_OPTIONAL_SELECTORS.split(",") if s.strip()]
+        try:
+            await page.wait_for_function(
+                _READINESS_JS,
+                arg=[selectors, optional_selectors, settings.READINESS_STABLE_ROUNDS, settings.READINESS_OPTIONAL_WAIT],
+                polling=settings.READINESS_POLL_INTERVAL,
+                timeout=settings.READINESS_TIMEOUT
+            )
+        except PlaywrightTimeoutError:
+            self.readiness_timeouts += 1
+            TIMEOUTS.labels("readiness").inc()
+            print(f"Readiness check timed out, using current content: {url}")
+    
+    def _record_phase(self, trace: Optional[dict], phase: str, seconds: float):
+        """记录阶段耗时"""
+        observe_stage(phase, seconds)
+        if trace is not None:
+            trace.setdefault("timings", {})[phase] = seconds
+        
+        ms = seconds * 1000
+        stat = self.phase_stats.setdefault(phase, {"count": 0, "avg_ms": 0.0, "last_ms": 0.0})
+        stat["count"] += 1
+        # 前 100 次为算术平均，之后按 1/100 的权重滑动平均
+        stat["avg_ms"] += (ms - stat["avg_ms"]) / min(stat["count"], 100)
+        stat["last_ms"] = ms
+    
+    def _record_resources(self, trace: Optional[dict], resources: dict):
+        """记录本次抓取的请求拦截计数"""
+        if trace is not None:
+            trace["resources"] = resources
+        
+        self.resource_totals["allowed"] += resources["allowed"]
+        self.resource_totals["blocked"] += resources["blocked_total"]
+        self.resource_totals["bytes_loaded"] += resources["bytes_loaded"]
+        self.resource_totals["estimated_bytes_saved"] += resources["estimated_bytes_saved"]
+    
+    def stats(self) -> dict:
+        """爬虫统计信息"""
+        return {
+            "pool": self.pool.stats() if self.pool else None,
+            "phases": {
+                phase: {k: round(v, 1) if isinstance(v, float) else v for k, v in stat.items()}
+                for phase, stat in self.phase_stats.items()
+            },
+            "readiness_timeouts": self.readiness_timeouts,
+            "resources": dict(self.resource_totals),
+            "health": {
+                "uptime_s": round(time.monotonic() - self.started_at, 1) if self.started_at else None,
+                "disconnected": self.disconnected,
+                "active": self.active,
+                "open_pages": self.open_pages(),
+                "error_rate": round(self.error_rate, 3),
+                "recent_fetches": len(self.recent_results),
+            }
+        }
     
     async def __aenter__(self):
         """异步上下文管理器入口"""
@@ -80,20 +270,74 @@ class WeChatCrawler:
 
 # 全局爬虫实例（单例模式）
 _crawler_instance: Optional[WeChatCrawler] = None
+_crawler_lock: Optional[asyncio.Lock] = None
+
+
+def _get_lock() -> asyncio.Lock:
+    global _crawler_lock
+    if _crawler_lock is None:
+        _crawler_lock = asyncio.Lock()
+    return _crawler_lock
 
 
 async def get_crawler() -> WeChatCrawler:
-    """获取爬虫实例（单例）"""
+    """获取爬虫实例（单例，并发的首次调用只启动一个浏览器）"""
     global _crawler_instance
     if _crawler_instance is None:
-        _crawler_instance = WeChatCrawler()
-        await _crawler_instance.start()
+        async with _get_lock():
+            if _crawler_instance is None:
+                crawler = WeChatCrawler()
+                await crawler.start()
+                _crawler_instance = crawler
+    return _crawler_instance
+
+
+def peek_crawler() -> Optional[WeChatCrawler]:
+    """当前爬虫实例（未启动时返回 None，不会启动浏览器）"""
     return _crawler_instance
 
 
+async def replace_crawler(drain_timeout: float) -> bool:
+    """
+    替换爬虫实例（先启动新浏览器，再排空并关闭旧浏览器）
+    
+    新浏览器启动后立即接收新请求；旧浏览器等待进行中的抓取完成（最多 drain_timeout 秒）后关闭。
+    新浏览器启动失败时保留旧实例。
+    
+    Returns:
+        是否替换成功
+    """
+    global _crawler_instance
+    async with _get_lock():
+        crawler = WeChatCrawler()
+        try:
+            await crawler.start()
+        except Exception as e:
+            print(f"Failed to start replacement browser: {e}")
+            await crawler.close()
+            return False
+        old, _crawler_instance = _crawler_instance, crawler
+    
+    if old:
+        if not await old.drain(drain_timeout):
+            print(f"Browser drain timed out after {drain_timeout}s with {old.active} fetches in flight, closing anyway")
+        try:
+            await old.close()
+        except Exception as e:
+            print(f"Error closing replaced browser: {e}")
+    return True
+
+
 async def close_crawler():
     """关闭爬虫实例"""
     global _crawler_instance
     if _crawler_instance:
         await _crawler_instance.close()
         _crawler_instance = None
+
+
+def get_crawler_stats() -> Optional[dict]:
+    """获取爬虫统计信息（爬虫未启动时返回 None）"""
+    if _crawler_instance is None:
+        return None
+    return _crawler_instance.stats()
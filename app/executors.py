@@ -0,0 +1,81 @@
+"""执行器模块（把 CPU 密集的解析和阻塞的 OCR 调用移出事件循环）"""
+import asyncio
+import contextvars
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+from app.config import settings
+
+
+_parse_executor: Optional[Executor] = None
+_ocr_executor: Optional[Executor] = None
+
+
+def _create_executor(kind: str, workers: int, name: str) -> Executor:
+    """
+    创建执行器
+
+    Args:
+        kind: 执行器类型，thread 或 process
+        workers: 工作线程/进程数
+        name: 线程名前缀
+
+    Returns:
+        执行器实例
+    """
+    workers = max(1, workers)
+    if kind == "process":
+        return ProcessPoolExecutor(max_workers=workers)
+    if kind == "thread":
+        return ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+    raise ValueError(f"Unknown executor type: {kind}. Expected 'thread' or 'process'.")
+
+
+def get_parse_executor() -> Executor:
+    """获取 HTML 解析执行器"""
+    global _parse_executor
+    if _parse_executor is None:
+        _parse_executor = _create_executor(settings.PARSE_EXECUTOR, settings.PARSE_WORKERS, "parse")
+    return _parse_executor
+
+
+def get_ocr_executor() -> Executor:
+    """获取 OCR 执行器"""
+    global _ocr_executor
+    if _ocr_executor is None:
+        _ocr_executor = _create_executor(settings.OCR_EXECUTOR, settings.OCR_WORKERS, "ocr")
+    return _ocr_executor
+
+
+async def _run_in_executor(executor: Executor, func: Callable[..., Any], *args, **kwargs) -> Any:
+    """
+    在执行器中运行函数
+
+    线程执行器在当前上下文的副本中运行（阶段计时等 contextvars 随请求传入工作线程），
+    进程执行器无法传递上下文。
+    """
+    loop = asyncio.get_running_loop()
+    call = partial(func, *args, **kwargs)
+    if isinstance(executor, ThreadPoolExecutor):
+        return await loop.run_in_executor(executor, contextvars.copy_context().run, call)
+    return await loop.run_in_executor(executor, call)
+
+
+async def run_in_parse_executor(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在解析执行器中运行函数（进程模式下函数和参数需可 pickle）"""
+    return await _run_in_executor(get_parse_executor(), func, *args, **kwargs)
+
+
+async def run_in_ocr_executor(func: Callable[..., Any], *args, **kwargs) -> Any:
+    """在 OCR 执行器中运行函数"""
+    return await _run_in_executor(get_ocr_executor(), func, *args, **kwargs)
+
+
+def shutdown_executors():
+    """关闭所有执行器"""
+    global _parse_executor, _ocr_executor
+    for executor in (_parse_executor, _ocr_executor):
+        if executor is not None:
+            executor.shutdown(wait=False, cancel_futures=True)
+    _parse_executor = None
+    _ocr_executor = None
@@ -0,0 +1,268 @@
+"""
+正文格式转换模块（Markdown 和结构化块）
+
+在解析器已构建的正文容器上一次遍历生成，调用方无需再解析 content_html：
+- blocks：按文档顺序的块列表，每个块为 {"type", ...}：
+    heading（level、text）、paragraph（text）、image（index、src、alt）、quote（text、blocks）、
+    code（text）、list（ordered、items）、table（rows）
+- markdown：由同一组块拼接，保留加粗、斜体、行内代码、删除线和链接
+
+与 sanitizer 一致地跳过隐藏元素和非正文元素，图片使用 data-src 作为地址。
+"""
+import re
+import time
+from typing import List, Optional
+from bs4 import CData, NavigableString, Tag
+from app.metrics import observe_stage
+from app.sanitizer import DROPPED_TAGS, HIDDEN_STYLE_RE
+
+
+OUTPUT_FORMATS = ("html", "markdown", "blocks")
+
+_HEADING_TAGS = {'h1': 1, 'h2': 2, 'h3': 3, 'h4': 4, 'h5': 5, 'h6': 6}
+
+# 结束当前段落的块级元素（其余块级元素单独处理）
+_BLOCK_CONTAINERS = frozenset({
+    'p', 'div', 'section', 'article', 'header', 'footer', 'center', 'main', 'aside',
+    'figure', 'figcaption', 'li', 'dd', 'dt', 'dl', 'hr', 'caption',
+})
+
+# 行内格式对应的 Markdown 标记
+_INLINE_MARKS = {'strong': '**', 'b': '**', 'em': '*', 'i': '*', 'del': '~~', 's': '~~', 'code': '`'}
+
+_WHITESPACE_RE = re.compile(r'[ \t\r\n\f\v]+')
+_MARKDOWN_SPECIAL_RE = re.compile(r'([\\`*_\[\]])')
+
+# 文本节点类型（与 get_text() 一致，不含注释等）
+_TEXT_TYPES = (NavigableString, CData)
+
+
+def _escape_markdown(text: str) -> str:
+    return _MARKDOWN_SPECIAL_RE.sub(r'\\\1', text)
+
+
+def _is_skipped(tag: Tag) -> bool:
+    return tag.name in DROPPED_TAGS or bool(HIDDEN_STYLE_RE.search(tag.get('style') or ''))
+
+
+def _image_src(tag: Tag) -> Optional[str]:
+    src = tag.get('data-src') or tag.get('src') or ''
+    if not src or src.startswith('data:'):
+        return None
+    return src
+
+
+def _join_lines(parts: List[str], separator: str) -> str:
+    """合并行内片段：<br> 处换行，每行去掉首尾空白并丢弃空行"""
+    lines = (line.strip() for line in ''.join(parts).split('\n'))
+    return separator.join(line for line in lines if line)
+
+
+class _BlockBuilder:
+    """遍历正文容器，把行内内容累积为段落，遇到块级元素时结束当前段落"""
+
+    def __init__(self):
+        self.blocks: List[dict] = []
+        self.image_count = 0
+        self._text: List[str] = []
+        self._markdown: List[str] = []
+        self._flushes = 0
+
+    def flush(self):
+        """结束当前段落（只含空白时丢弃）"""
+        text = _join_lines(self._text, '\n')
+        if text:
+            self.blocks.append({
+                "type": "paragraph",
+                "text": text,
+                "markdown": _join_lines(self._markdown, '  \n'),
+            })
+        self._text = []
+        self._markdown = []
+        self._flushes += 1
+
+    def walk(self, node: Tag):
+        for child in node.contents:
+            if isinstance(child, Tag):
+                self._element(child)
+            elif type(child) in _TEXT_TYPES:
+                text = _WHITESPACE_RE.sub(' ', str(child))
+                self._text.append(text)
+                self._markdown.append(_escape_markdown(text))
+
+    def _element(self, tag: Tag):
+        name = tag.name
+        if _is_skipped(tag):
+            return
+
+        if name == 'br':
+            self._text.append('\n')
+            self._markdown.append('\n')
+        elif name == 'img':
+            self._image(tag)
+        elif name in _HEADING_TAGS:
+            self.flush()
+            text, markdown = _inline(tag)
+            if text:
+                level = _HEADING_TAGS[name]
+                self.blocks.append({
+                    "type": "heading", "level": level, "text": text,
+                    "markdown": f"{'#' * level} {markdown}",
+                })
+            self._collect_images(tag)
+        elif name == 'pre':
+            self.flush()
+            text = _preformatted_text(tag).strip('\n')
+            if text.strip():
+                self.blocks.append({"type": "code", "text": text, "markdown": f"```\n{text}\n```"})
+        elif name == 'blockquote':
+            self.flush()
+            inner = _BlockBuilder()
+            inner.image_count = self.image_count
+            inner.walk(tag)
+            inner.flush()
+            self.image_count = inner.image_count
+            # 引用内的列表、表格等块嵌套在 quote 块中，图片仍作为独立的图片块输出
+            quoted = [block for block in inner.blocks if block["type"] != "image"]
+            if quoted:
+                text = '\n'.join(block["text"] for block in quoted if "text" in block)
+                markdown = '\n>\n'.join(_quote_markdown(block["markdown"]) for block in quoted)
+                self.blocks.append({"type": "quote", "text": text, "blocks": quoted, "markdown": markdown})
+            self.blocks.extend(block for block in inner.blocks if block["type"] == "image")
+        elif name in ('ul', 'ol'):
+            self.flush()
+            self._list(tag, name == 'ol')
+        elif name == 'table':
+            self.flush()
+            self._table(tag)
+        elif name in _BLOCK_CONTAINERS:
+            self.flush()
+            self.walk(tag)
+            self.flush()
+        elif name == 'a' and tag.get('href', '').startswith(('http://', 'https://')):
+            self._wrap(tag, '[', f"]({tag['href']})")
+        elif name in _INLINE_MARKS:
+            mark = _INLINE_MARKS[name]
+            self._wrap(tag, mark, mark)
+        else:
+            self.walk(tag)
+
+    def _wrap(self, tag: Tag, prefix: str, suffix: str):
+        """输出带 Markdown 标记的行内元素；内部出现块级元素时不加标记"""
+        start = len(self._markdown)
+        flushes = self._flushes
+        self.walk(tag)
+        if self._flushes != flushes:
+            return
+        inner = ''.join(self._markdown[start:]).strip()
+        if inner and '\n' not in inner:
+            self._markdown[start:] = [f"{prefix}{inner}{suffix}"]
+
+    def _image(self, tag: Tag):
+        src = _image_src(tag)
+        if src is None:
+            return
+        self.flush()
+        self.image_count += 1
+        alt = tag.get('alt') or ''
+        self.blocks.append({
+            "type": "image", "index": self.image_count, "src": src, "alt": alt,
+            "markdown": f"![{_escape_markdown(alt)}]({src})",
+        })
+
+    def _collect_images(self, tag: Tag):
+        """标题、列表、表格中的图片作为独立的图片块输出"""
+        for img in tag.find_all('img'):
+            if not any(_is_skipped(parent) for parent in img.parents if parent is not tag):
+                self._image(img)
+
+    def _list(self, tag: Tag, ordered: bool):
+        items = []
+        markdown_items = []
+        for li in tag.find_all('li', recursive=False):
+            if _is_skipped(li):
+                continue
+            text, markdown = _inline(li)
+            if text:
+                items.append(text)
+                marker = f"{len(items)}." if ordered else "-"
+                markdown_items.append(f"{marker} {markdown}")
+        if items:
+            self.blocks.append({
+                "type": "list", "ordered": ordered, "items": items, "markdown": '\n'.join(markdown_items),
+            })
+        self._collect_images(tag)
+
+    def _table(self, tag: Tag):
+        rows = []
+        markdown_rows = []
+        for tr in tag.find_all('tr'):
+            if tr.find_parent('table') is not tag or _is_skipped(tr):
+                continue
+            cells = [_inline(cell) for cell in tr.find_all(('td', 'th'), recursive=False)]
+            if not any(text for text, _ in cells):
+                continue
+            rows.append([text.replace('\n', ' ') for text, _ in cells])
+            markdown_rows.append(
+                '| ' + ' | '.join(markdown.replace('\n', ' ').replace('|', '\\|') for _, markdown in cells) + ' |'
+            )
+        if rows:
+            # Markdown 表格以第一行为表头
+            markdown_rows.insert(1, '| ' + ' | '.join('---' for _ in rows[0]) + ' |')
+            self.blocks.append({"type": "table", "rows": rows, "markdown": '\n'.join(markdown_rows)})
+        self._collect_images(tag)
+
+
+def _quote_markdown(markdown: str) -> str:
+    """每行加上引用前缀"""
+    return '\n'.join(f"> {line}" if line else ">" for line in markdown.split('\n'))
+
+
+def _strip_markdown(block: dict) -> dict:
+    stripped = {k: v for k, v in block.items() if k != "markdown"}
+    if "blocks" in stripped:
+        stripped["blocks"] = [_strip_markdown(inner) for inner in stripped["blocks"]]
+    return stripped
+
+
+def _inline(tag: Tag) -> tuple[str, str]:
+    """元素内全部文字合并为一行（标题、列表项、单元格），返回 (纯文本, Markdown)"""
+    builder = _BlockBuilder()
+    builder.walk(tag)
+    builder.flush()
+    texts = [block["text"] for block in builder.blocks if "text" in block]
+    markdowns = [block["markdown"] for block in builder.blocks if "text" in block]
+    return ' '.join(texts), ' '.join(markdowns)
+
+
+def _preformatted_text(tag: Tag) -> str:
+    """代码块文字：保留空白，<br> 和块级子元素（微信代码块常按行包在 code / p 中）转为换行"""
+    parts = []
+    for node in tag.descendants:
+        if isinstance(node, Tag):
+            if node.name == 'br':
+                parts.append('\n')
+            elif (node.name in _BLOCK_CONTAINERS or node.name == 'code') and parts and not parts[-1].endswith('\n'):
+                parts.append('\n')
+        elif type(node) in _TEXT_TYPES:
+            parts.append(str(node))
+    return ''.join(parts)
+
+
+def _build(content_div: Tag) -> List[dict]:
+    started = time.perf_counter()
+    builder = _BlockBuilder()
+    builder.walk(content_div)
+    builder.flush()
+    observe_stage("format", time.perf_counter() - started)
+    return builder.blocks
+
+
+def render_blocks(content_div: Tag) -> List[dict]:
+    """正文结构化块列表（按文档顺序，图片 index 从 1 开始）"""
+    return [_strip_markdown(block) for block in _build(content_div)]
+
+
+def render_markdown(content_div: Tag) -> str:
+    """正文 Markdown（块之间以空行分隔）"""
+    return '\n\n'.join(block["markdown"] for block in _build(content_div))
@@ -0,0 +1,81 @@
+"""HTTP 直接抓取模块（无需浏览器渲染的快速路径）"""
+from typing import Optional
+import httpx
+from app.config import settings
+from app.metrics import FETCH_FAILURES, TIMEOUTS
+
+
+def _http2_available() -> bool:
+    """HTTP/2 需要安装 h2 包（httpx[http2]）"""
+    try:
+        import h2  # noqa: F401
+    except ImportError:
+        return False
+    return True
+
+
+class HttpFetcher:
+    """基于连接池的异步 HTTP 抓取器（keep-alive，可选 HTTP/2）"""
+
+    def __init__(self):
+        http2 = settings.HTTP_FETCH_HTTP2 and _http2_available()
+        if settings.HTTP_FETCH_HTTP2 and not http2:
+            print("HTTP/2 requested but the 'h2' package is not installed. Falling back to HTTP/1.1.")
+
+        self.client = httpx.AsyncClient(
+            http2=http2,
+            headers={
+                'User-Agent': settings.USER_AGENT,
+                'Accept': 'text/html,application/xhtml+xml,application/xml;q=0.9,*/*;q=0.8',
+                'Accept-Language': 'zh-CN,zh;q=0.9,en;q=0.8',
+            },
+            timeout=settings.HTTP_FETCH_TIMEOUT,
+            limits=httpx.Limits(
+                max_connections=settings.HTTP_FETCH_MAX_CONNECTIONS,
+                max_keepalive_connections=settings.HTTP_FETCH_MAX_CONNECTIONS
+            ),
+            follow_redirects=True
+        )
+
+    async def fetch_article(self, url: str) -> Optional[str]:
+        """抓取文章HTML内容（服务端直出的页面）"""
+        try:
+            response = await self.client.get(url)
+            if response.status_code != 200:
+                FETCH_FAILURES.labels("http").inc()
+                print(f"HTTP fetch failed for {url}: status_code={response.status_code}")
+                return None
+            return response.text
+        except httpx.TimeoutException:
+            TIMEOUTS.labels("http_fetch").inc()
+            FETCH_FAILURES.labels("http").inc()
+            print(f"Timeout error when fetching (http): {url}")
+            return None
+        except Exception as e:
+            FETCH_FAILURES.labels("http").inc()
+            print(f"Error fetching (http) {url}: {e}")
+            return None
+
+    async def close(self):
+        """关闭连接池"""
+        await self.client.aclose()
+
+
+# 全局抓取器实例（单例模式）
+_fetcher_instance: Optional[HttpFetcher] = None
+
+
+def get_http_fetcher() -> HttpFetcher:
+    """获取 HTTP 抓取器实例（单例）"""
+    global _fetcher_instance
+    if _fetcher_instance is None:
+        _fetcher_instance = HttpFetcher()
+    return _fetcher_instance
+
+
+async def close_http_fetcher():
+    """关闭 HTTP 抓取器实例"""
+    global _fetcher_instance
+    if _fetcher_instance:
+        await _fetcher_instance.close()
+        _fetcher_instance = None
@@ -0,0 +1,212 @@
+"""OCR 前的图片预过滤模块（跳过分隔线、表情动图、小图标、二维码等不含正文的图片）"""
+import asyncio
+import re
+import struct
+from typing import List, Optional, Tuple
+from app.config import settings
+from app.http_fetcher import get_http_fetcher
+
+
+# 读取图片头部的字节数上限（足够解析 PNG / GIF / WebP 以及绝大多数 JPEG 的尺寸）
+_PROBE_BYTES = 64 * 1024
+
+# 二维码的地址或 alt 特征
+_QR_HINT_RE = re.compile(r'qr_?code|二维码|扫码|长按识别', re.IGNORECASE)
+
+# 文末的图片数（关注二维码通常放在文章末尾）
+_QR_TAIL_IMAGES = 2
+
+# 过滤统计：{原因: 次数}
+_filter_stats = {
+    "checked": 0,
+    "kept": 0,
+    "probed": 0,
+    "skipped": {},
+}
+
+
+def image_size(data: bytes) -> Optional[Tuple[int, int, str]]:
+    """
+    从图片头部字节解析宽高和格式
+
+    Returns:
+        (宽, 高, 格式)，无法识别时返回 None
+    """
+    if data.startswith(b'\x89PNG\r\n\x1a\n') and len(data) >= 24:
+        width, height = struct.unpack('>II', data[16:24])
+        return width, height, "png"
+
+    if data[:6] in (b'GIF87a', b'GIF89a') and len(data) >= 10:
+        width, height = struct.unpack('<HH', data[6:10])
+        return width, height, "gif"
+
+    if data[:4] == b'RIFF' and data[8:12] == b'WEBP' and len(data) >= 30:
+        chunk = data[12:16]
+        if chunk == b'VP8 ':
+            width, height = struct.unpack('<HH', data[26:30])
+            return width & 0x3fff, height & 0x3fff, "webp"
+        if chunk == b'VP8L' and len(data) >= 25:
+            bits = int.from_bytes(data[21:25], 'little')
+            return (bits & 0x3fff) + 1, ((bits >> 14) & 0x3fff) + 1, "webp"
+        if chunk == b'VP8X':
+            width = int.from_bytes(data[24:27], 'little') + 1
+            height = int.from_bytes(data[27:30], 'little') + 1
+            return width, height, "webp"
+        return None
+
+    if data[:2] == b'\xff\xd8':
+        # 顺序扫描 JPEG 段，找到 SOF 段读取尺寸
+        offset = 2
+        while offset + 9 < len(data):
+            if data[offset] != 0xff:
+                offset += 1
+                continue
+            marker = data[offset + 1]
+            if marker in (0xd8, 0x01) or 0xd0 <= marker <= 0xd7:
+                offset += 2
+                continue
+            length = struct.unpack('>H', data[offset + 2:offset + 4])[0]
+            if 0xc0 <= marker <= 0xcf and marker not in (0xc4, 0xc8, 0xcc):
+                height, width = struct.unpack('>HH', data[offset + 5:offset + 9])
+                return width, height, "jpeg"
+            offset += 2 + length
+        return None
+
+    return None
+
+
+def _looks_like_qr(image: dict, at_tail: bool) -> bool:
+    """小尺寸正方形之外的二维码特征：地址或 alt 含二维码关键词，或位于文末"""
+    return at_tail or bool(_QR_HINT_RE.search(image["url"]) or _QR_HINT_RE.search(image.get("alt") or ""))
+
+
+def skip_reason(image: dict, at_tail: bool = False) -> Optional[str]:
+    """
+    根据图片属性判断是否跳过 OCR
+
+    正方形小图只在另有二维码特征（地址 / alt 关键词或位于文末）时才视为二维码，
+    避免误跳过正文中的方形文字图片。
+
+    Args:
+        image: 图片信息（url、width、ratio（高/宽）、type、alt）
+        at_tail: 是否为文章最后几张图片之一
+
+    Returns:
+        跳过原因，需要 OCR 时返回 None
+    """
+    if settings.OCR_SKIP_GIF and image.get("type") == "gif":
+        return "gif"
+
+    width = image.get("width")
+    ratio = image.get("ratio")
+
+    if width is not None and width < settings.OCR_MIN_IMAGE_WIDTH:
+        return "too_small"
+
+    if ratio is not None:
+        if ratio < settings.OCR_MIN_IMAGE_RATIO:
+            return "divider"
+        if width is not None:
+            if width * ratio < settings.OCR_MIN_IMAGE_HEIGHT:
+                return "too_short"
+            if abs(ratio - 1) <= 0.05 and width <= settings.OCR_QR_MAX_WIDTH and _looks_like_qr(image, at_tail):
+                return "likely_qr_code"
+
+    return None
+
+
+async def _probe(image: dict) -> dict:
+    """
+    读取图片头部，补全缺失的宽高和格式
+
+    带 Range 请求头流式读取，能解析出尺寸或读满 _PROBE_BYTES 即关闭连接
+    （服务器忽略 Range 返回整张图片时也不会下载全部内容）。
+    """
+    try:
+        async with get_http_fetcher().client.stream(
+            "GET", image["url"], headers={"Range": f"bytes=0-{_PROBE_BYTES - 1}"}
+        ) as response:
+            if response.status_code not in (200, 206):
+                return image
+            data = b""
+            size = None
+            async for chunk in response.aiter_bytes():
+                data += chunk
+                size = image_size(data[:_PROBE_BYTES])
+                if size or len(data) >= _PROBE_BYTES:
+                    break
+    except Exception as e:
+        print(f"Error probing image size ({image['url']}): {e}")
+        return image
+
+    _filter_stats["probed"] += 1
+    if not size:
+        return image
+    width, height, image_type = size
+    if not width or not height:
+        return image
+    return {**image, "width": width, "ratio": height / width, "type": image.get("type") or image_type}
+
+
+def filter_by_attributes(images: List[dict]) -> Tuple[List[str], List[dict]]:
+    """
+    只按已有的图片属性过滤（不发网络请求）
+
+    Returns:
+        (需要 OCR 的图片 URL 列表, 跳过的图片 [{"url", "reason"}])
+    """
+    if not settings.OCR_IMAGE_FILTER_ENABLED:
+        return [image["url"] for image in images], []
+
+    kept: List[str] = []
+    skipped: List[dict] = []
+    tail_start = len(images) - _QR_TAIL_IMAGES
+    for index, image in enumerate(images):
+        reason = skip_reason(image, at_tail=index >= tail_start)
+        if reason:
+            skipped.append({"url": image["url"], "reason": reason})
+            _filter_stats["skipped"][reason] = _filter_stats["skipped"].get(reason, 0) + 1
+        else:
+            kept.append(image["url"])
+
+    _filter_stats["checked"] += len(images)
+    _filter_stats["kept"] += len(kept)
+    return kept, skipped
+
+
+async def filter_images(images: List[dict], probe: Optional[bool] = None) -> Tuple[List[str], List[dict]]:
+    """
+    过滤不需要 OCR 的图片
+
+    先按 data-w / data-ratio / data-type 判断；缺少宽高属性的图片可选用 Range 请求读取图片头部。
+
+    Args:
+        images: 图片信息列表（utils.extract_images 的结果）
+        probe: 是否探测缺少尺寸的图片，默认 OCR_IMAGE_PROBE
+
+    Returns:
+        (需要 OCR 的图片 URL 列表, 跳过的图片 [{"url", "reason"}])
+    """
+    if not settings.OCR_IMAGE_FILTER_ENABLED:
+        return [image["url"] for image in images], []
+
+    if probe is None:
+        probe = settings.OCR_IMAGE_PROBE
+
+    if probe:
+        semaphore = asyncio.Semaphore(max(1, settings.OCR_IMAGE_PROBE_CONCURRENCY))
+
+        async def complete(image: dict) -> dict:
+            if image.get("width") and image.get("ratio"):
+                return image
+            async with semaphore:
+                return await _probe(image)
+
+        images = list(await asyncio.gather(*(complete(image) for image in images)))
+
+    return filter_by_attributes(images)
+
+
+def get_filter_stats() -> dict:
+    """图片预过滤统计信息"""
+    return {**_filter_stats, "skipped": dict(_filter_stats["skipped"])}
@@ -0,0 +1,135 @@
+"""浏览器请求拦截模块（屏蔽解析用不到的资源）"""
+from fnmatch import fnmatch
+from typing import Dict, Iterable, List, Optional
+from urllib.parse import urlparse
+from playwright.async_api import BrowserContext, Response, Route
+from app.config import settings
+
+
+# 常见的统计 / 上报域名
+TRACKER_HOSTS = [
+    "badjs.weixinbridge.com",
+    "*.beacon.qq.com",
+    "pingfore.qq.com",
+    "*.google-analytics.com",
+    "*.googletagmanager.com",
+    "*.doubleclick.net",
+]
+
+# 预置拦截配置：资源类型 + 域名规则
+PROFILES: Dict[str, dict] = {
+    "none": {"block_types": [], "deny_hosts": []},
+    "default": {"block_types": ["image", "media", "font"], "deny_hosts": TRACKER_HOSTS},
+    "aggressive": {"block_types": ["image", "media", "font", "stylesheet"], "deny_hosts": TRACKER_HOSTS},
+}
+
+# 被拦截资源的典型大小（字节），用于估算节省的流量
+_ESTIMATED_SIZES = {
+    "image": 80 * 1024,
+    "media": 500 * 1024,
+    "font": 40 * 1024,
+    "stylesheet": 20 * 1024,
+}
+_DEFAULT_ESTIMATED_SIZE = 2 * 1024
+
+
+def _split(value: Optional[str]) -> List[str]:
+    return [item.strip() for item in (value or "").split(",") if item.strip()]
+
+
+class RouteStats:
+    """单个页面的请求拦截计数（每次借出页面时重置）"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.allowed = 0
+        self.blocked: Dict[str, int] = {}
+        self.bytes_loaded = 0
+        self.estimated_bytes_saved = 0
+
+    def record_blocked(self, resource_type: str):
+        self.blocked[resource_type] = self.blocked.get(resource_type, 0) + 1
+        self.estimated_bytes_saved += _ESTIMATED_SIZES.get(resource_type, _DEFAULT_ESTIMATED_SIZE)
+
+    def on_response(self, response: Response):
+        length = response.headers.get("content-length")
+        if length and length.isdigit():
+            self.bytes_loaded += int(length)
+
+    def snapshot(self) -> dict:
+        return {
+            "allowed": self.allowed,
+            "blocked": dict(self.blocked),
+            "blocked_total": sum(self.blocked.values()),
+            "bytes_loaded": self.bytes_loaded,
+            "estimated_bytes_saved": self.estimated_bytes_saved,
+        }
+
+
+class ResourceBlocker:
+    """
+    按资源类型和域名规则拦截请求
+
+    允许规则优先：命中 allow_hosts 的请求始终放行；
+    否则资源类型在 block_types 中或域名命中 deny_hosts 时拦截。
+    """
+
+    def __init__(self, block_types: Iterable[str], deny_hosts: Iterable[str], allow_hosts: Iterable[str] = ()):
+        self.block_types = set(block_types)
+        self.deny_hosts = list(deny_hosts)
+        self.allow_hosts = list(allow_hosts)
+
+    @classmethod
+    def from_settings(cls) -> Optional["ResourceBlocker"]:
+        """根据配置创建拦截器，不需要拦截时返回 None"""
+        profile = PROFILES.get(settings.RESOURCE_BLOCK_PROFILE)
+        if profile is None:
+            raise ValueError(
+                f"Unknown RESOURCE_BLOCK_PROFILE: {settings.RESOURCE_BLOCK_PROFILE}. "
+                f"Expected one of: {', '.join(PROFILES)}"
+            )
+
+        block_types = _split(settings.RESOURCE_BLOCK_TYPES) if settings.RESOURCE_BLOCK_TYPES is not None else profile["block_types"]
+        deny_hosts = list(profile["deny_hosts"]) + _split(settings.RESOURCE_DENY_HOSTS)
+        allow_hosts = _split(settings.RESOURCE_ALLOW_HOSTS)
+
+        if not block_types and not deny_hosts:
+            return None
+        return cls(block_types, deny_hosts, allow_hosts)
+
+    @staticmethod
+    def _host_matches(host: str, patterns: List[str]) -> bool:
+        return any(fnmatch(host, pattern) for pattern in patterns)
+
+    def should_block(self, resource_type: str, url: str) -> bool:
+        """判断请求是否需要拦截"""
+        host = (urlparse(url).hostname or "").lower()
+        if self.allow_hosts and self._host_matches(host, self.allow_hosts):
+            return False
+        if resource_type in self.block_types:
+            return True
+        return self._host_matches(host, self.deny_hosts)
+
+    async def attach(self, context: BrowserContext) -> RouteStats:
+        """
+        在浏览器上下文上注册拦截规则
+
+        Returns:
+            该上下文的拦截计数
+        """
+        stats = RouteStats()
+
+        async def handle(route: Route):
+            request = route.request
+            if self.should_block(request.resource_type, request.url):
+                stats.record_blocked(request.resource_type)
+                await route.abort("blockedbyclient")
+            else:
+                stats.allowed += 1
+                await route.continue_()
+
+        await context.route("**/*", handle)
+        context.on("response", stats.on_response)
+        return stats
@@ -0,0 +1,299 @@
+"""任务队列模块（queue 模式下 API 进程只入队解析任务，由爬虫工作进程消费并通过结果存储返回）"""
+import asyncio
+import json
+import multiprocessing
+import time
+import uuid
+from collections import deque
+from multiprocessing.connection import Connection
+from typing import Deque, Dict, List, Optional, Set
+from app.config import settings
+from app.scheduler import AdmissionError
+
+
+class JobTimeoutError(AdmissionError):
+    """等待任务结果超时"""
+
+
+class WorkerCrashedError(AdmissionError):
+    """处理任务的工作进程意外退出"""
+
+
+def new_job(payload: dict, timeout: float) -> dict:
+    """构造任务：附加任务 ID 和截止时间（工作进程跳过已超过截止时间的任务）"""
+    return {**payload, "job_id": uuid.uuid4().hex, "deadline": time.time() + timeout}
+
+
+class _WorkerHandle:
+    """API 进程一侧的工作进程：进程、任务管道（写端）、结果管道（读端）和已分配给它的任务"""
+
+    def __init__(self, index: int, process: multiprocessing.Process, jobs: Connection, results: Connection):
+        self.index = index
+        self.process = process
+        self.jobs = jobs
+        self.results = results
+        self.running: Set[str] = set()
+        self.exited = False
+
+
+class MultiprocessingJobQueue:
+    """
+    本机多进程任务队列
+
+    API 进程启动 QUEUE_WORKERS 个工作进程，每个进程有自己的任务管道和结果管道（事件循环监听结果管道）。
+    任务先进入 API 进程的积压队列，再分配给已分配任务最少的工作进程，每个进程最多 concurrency 个。
+    工作进程意外退出时立即重启（管道随进程重建，不会因进程在读写中途被杀而卡住其他进程），
+    已分配给它的任务以 WorkerCrashedError 结束。
+    """
+
+    def __init__(self, workers: int, concurrency: int):
+        self.workers = max(1, workers)
+        self.concurrency = max(1, concurrency)
+        self._context = multiprocessing.get_context("spawn")
+        self._handles: List[_WorkerHandle] = []
+        self._backlog: Deque[dict] = deque()
+        self._pending: Dict[str, asyncio.Future] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+        self._closing = False
+
+        # 统计
+        self.submitted = 0
+        self.completed = 0
+        self.timeouts = 0
+        self.restarts = 0
+        self.crashed_jobs = 0
+
+    async def start(self):
+        """启动工作进程"""
+        self._loop = asyncio.get_running_loop()
+        self._handles = [self._spawn(index) for index in range(self.workers)]
+        print(f"Started {self.workers} crawler worker processes")
+
+    def _spawn(self, index: int) -> _WorkerHandle:
+        # 延迟导入，避免与 service 循环引用
+        from app.worker import run_process_worker
+
+        job_reader, job_writer = self._context.Pipe(duplex=False)
+        result_reader, result_writer = self._context.Pipe(duplex=False)
+        process = self._context.Process(
+            target=run_process_worker,
+            args=(job_reader, result_writer, index, self.workers),
+            name=f"wechat-parse-worker-{index}",
+            daemon=True,
+        )
+        process.start()
+        # 子进程使用的一端在本进程关闭，子进程退出后结果管道读到 EOF
+        job_reader.close()
+        result_writer.close()
+
+        handle = _WorkerHandle(index, process, job_writer, result_reader)
+        self._loop.add_reader(result_reader.fileno(), self._read_results, handle)
+        self._loop.add_reader(process.sentinel, self._on_exit, handle)
+        return handle
+
+    def _read_results(self, handle: _WorkerHandle):
+        try:
+            while handle.results.poll():
+                result = handle.results.recv()
+                handle.running.discard(result["job_id"])
+                future = self._pending.pop(result["job_id"], None)
+                if future is not None and not future.done():
+                    future.set_result(result)
+        except (EOFError, OSError):
+            # 工作进程已退出，由 _on_exit 处理
+            self._loop.remove_reader(handle.results.fileno())
+        self._dispatch()
+
+    def _on_exit(self, handle: _WorkerHandle):
+        """工作进程退出：读完已写出的结果，结束其余已分配的任务，未在关闭中时重启该进程"""
+        if handle.exited:
+            return
+        handle.exited = True
+        self._loop.remove_reader(handle.process.sentinel)
+        self._read_results(handle)
+        self._loop.remove_reader(handle.results.fileno())
+        handle.jobs.close()
+        handle.results.close()
+        handle.process.join()
+        exitcode = handle.process.exitcode
+        handle.process.close()
+
+        for job_id in handle.running:
+            future = self._pending.pop(job_id, None)
+            if future is not None and not future.done():
+                self.crashed_jobs += 1
+                future.set_exception(
+                    WorkerCrashedError(f"Crawler worker {handle.index} exited while running the job", retry_after=1)
+                )
+        handle.running.clear()
+
+        if self._closing:
+            return
+        print(f"Crawler worker {handle.index} exited with code {exitcode}, restarting")
+        self._handles[handle.index] = self._spawn(handle.index)
+        self.restarts += 1
+        self._dispatch()
+
+    def _dispatch(self):
+        """把积压的任务分配给已分配任务最少的工作进程（都已满时留在积压队列中）"""
+        while self._backlog and self._handles:
+            handle = min(self._handles, key=lambda h: len(h.running))
+            if len(handle.running) >= self.concurrency:
+                return
+            job = self._backlog.popleft()
+            if job["job_id"] not in self._pending:
+                # 等待结果已超时
+                continue
+            try:
+                handle.jobs.send(job)
+            except OSError:
+                # 工作进程刚退出，重启后再分配
+                self._backlog.appendleft(job)
+                return
+            handle.running.add(job["job_id"])
+
+    async def submit(self, payload: dict, timeout: float) -> dict:
+        """入队并等待结果"""
+        job = new_job(payload, timeout)
+        future = self._loop.create_future()
+        self._pending[job["job_id"]] = future
+        self.submitted += 1
+        self._backlog.append(job)
+        self._dispatch()
+        try:
+            result = await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            self.timeouts += 1
+            raise JobTimeoutError(f"Job did not finish within {timeout:.0f}s", retry_after=int(timeout))
+        finally:
+            self._pending.pop(job["job_id"], None)
+        self.completed += 1
+        return result
+
+    async def close(self):
+        """通知工作进程退出（处理完进行中的任务），超时未退出的强制结束"""
+        self._closing = True
+        for handle in self._handles:
+            if not handle.exited:
+                try:
+                    handle.jobs.send(None)
+                except OSError:
+                    pass
+        for handle in self._handles:
+            if handle.exited:
+                continue
+            await asyncio.to_thread(handle.process.join, settings.BROWSER_DRAIN_TIMEOUT)
+            # 等待期间进程退出时 _on_exit 已由事件循环调用
+            if not handle.exited:
+                if handle.process.is_alive():
+                    handle.process.terminate()
+                self._on_exit(handle)
+        self._handles = []
+
+    def stats(self) -> dict:
+        return {
+            "backend": "multiprocessing",
+            "workers": self.workers,
+            "alive_workers": sum(1 for handle in self._handles if not handle.exited and handle.process.is_alive()),
+            "pending": len(self._pending),
+            "backlog": len(self._backlog),
+            "running": sum(len(handle.running) for handle in self._handles),
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+            "restarts": self.restarts,
+            "crashed_jobs": self.crashed_jobs,
+        }
+
+
+def result_key(job_id: str) -> str:
+    """Redis 结果键"""
+    return f"{settings.QUEUE_STREAM}:result:{job_id}"
+
+
+class RedisJobQueue:
+    """
+    Redis Streams 任务队列（需要安装 redis 包）
+
+    任务写入 QUEUE_STREAM，由任意机器上的 `python -m app.worker` 以消费者组 QUEUE_GROUP 消费；
+    结果写入按任务 ID 命名的列表，API 进程用 BLPOP 等待。
+    """
+
+    def __init__(self, url: str):
+        try:
+            import redis.asyncio as aioredis
+        except ImportError:
+            raise ValueError("QUEUE_BACKEND=redis requires the 'redis' package. Please install it with `pip install redis`.")
+
+        self._client = aioredis.from_url(url, decode_responses=True)
+
+        # 统计
+        self.submitted = 0
+        self.completed = 0
+        self.timeouts = 0
+
+    async def start(self):
+        # 工作进程独立部署（python -m app.worker），这里只检查连接
+        await self._client.ping()
+
+    async def submit(self, payload: dict, timeout: float) -> dict:
+        """写入任务流并等待结果"""
+        job = new_job(payload, timeout)
+        self.submitted += 1
+        await self._client.xadd(
+            settings.QUEUE_STREAM,
+            {"job": json.dumps(job)},
+            maxlen=settings.QUEUE_STREAM_MAXLEN,
+            approximate=True,
+        )
+        # BLPOP 的超时为整数秒时兼容所有 Redis 版本
+        reply = await self._client.blpop([result_key(job["job_id"])], timeout=max(1, int(timeout)))
+        if reply is None:
+            self.timeouts += 1
+            raise JobTimeoutError(f"Job did not finish within {timeout:.0f}s", retry_after=int(timeout))
+        self.completed += 1
+        return json.loads(reply[1])
+
+    async def close(self):
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        return {
+            "backend": "redis",
+            "stream": settings.QUEUE_STREAM,
+            "group": settings.QUEUE_GROUP,
+            "submitted": self.submitted,
+            "completed": self.completed,
+            "timeouts": self.timeouts,
+        }
+
+
+# 全局任务队列实例（单例模式）
+_job_queue_instance = None
+
+
+def get_job_queue():
+    """获取任务队列实例（单例），后端由 QUEUE_BACKEND 决定"""
+    global _job_queue_instance
+    if _job_queue_instance is None:
+        backend = settings.QUEUE_BACKEND.lower()
+        if backend == "multiprocessing":
+            _job_queue_instance = MultiprocessingJobQueue(settings.QUEUE_WORKERS, settings.WORKER_CONCURRENCY)
+        elif backend == "redis":
+            _job_queue_instance = RedisJobQueue(settings.REDIS_URL)
+        else:
+            raise ValueError(f"Unknown QUEUE_BACKEND: {backend}. Expected 'multiprocessing' or 'redis'.")
+    return _job_queue_instance
+
+
+async def start_job_queue():
+    """启动任务队列（queue 模式下在应用启动时调用）"""
+    await get_job_queue().start()
+
+
+async def close_job_queue():
+    """关闭任务队列"""
+    global _job_queue_instance
+    if _job_queue_instance:
+        await _job_queue_instance.close()
+        _job_queue_instance = None
@@ -0,0 +1,324 @@
+"""异步解析任务模块（提交后立即返回任务 ID，客户端轮询或接收 Webhook 回调）"""
+import asyncio
+import hashlib
+import hmac
+import ipaddress
+import json
+import socket
+import uuid
+from collections import OrderedDict
+from datetime import datetime
+from typing import Dict, List, Optional, Set
+from urllib.parse import urlsplit
+import httpx
+from app.config import settings
+from app.scheduler import AdmissionError, QueueFullError
+from app.service import FetchError, parse_article_url
+
+
+def _now() -> str:
+    return datetime.utcnow().isoformat() + "Z"
+
+
+class WebhookURLError(ValueError):
+    """Webhook 地址不合法（协议、域名或指向内网地址）"""
+    pass
+
+
+def _is_public_address(address: str) -> bool:
+    """是否为公网地址（回环、私有、链路本地、保留、组播等地址均不是）"""
+    ip = ipaddress.ip_address(address.split("%", 1)[0])
+    if ip.version == 6 and ip.ipv4_mapped:
+        ip = ip.ipv4_mapped
+    return ip.is_global and not ip.is_multicast
+
+
+async def _resolve(host: str, port: int) -> List[str]:
+    """解析域名的全部地址"""
+    infos = await asyncio.get_running_loop().getaddrinfo(host, port, type=socket.SOCK_STREAM)
+    return [info[4][0] for info in infos]
+
+
+async def validate_webhook_url(url: str) -> List[str]:
+    """
+    校验 Webhook 地址，防止借回调访问内网（SSRF）
+
+    只允许 http / https 且带域名的地址；域名解析出的所有地址都必须是公网地址
+    （JOB_WEBHOOK_ALLOW_PRIVATE=true 时跳过地址检查，用于本地调试）。
+
+    Returns:
+        校验过的地址列表（跳过地址检查时为空列表）
+
+    Raises:
+        WebhookURLError: 地址不合法
+    """
+    try:
+        parts = urlsplit(url)
+        port = parts.port or (443 if parts.scheme == "https" else 80)
+    except ValueError as e:
+        raise WebhookURLError(f"Invalid webhook URL: {e}")
+    if parts.scheme not in ("http", "https"):
+        raise WebhookURLError("Webhook URL must use http or https")
+    host = parts.hostname
+    if not host:
+        raise WebhookURLError("Webhook URL must include a host")
+    if parts.username or parts.password:
+        raise WebhookURLError("Webhook URL must not include credentials")
+    if settings.JOB_WEBHOOK_ALLOW_PRIVATE:
+        return []
+
+    try:
+        addresses = [str(ipaddress.ip_address(host))]
+    except ValueError:
+        try:
+            addresses = await _resolve(host, port)
+        except OSError as e:
+            raise WebhookURLError(f"Cannot resolve webhook host {host}: {e}")
+    if not addresses:
+        raise WebhookURLError(f"Cannot resolve webhook host {host}")
+    for address in addresses:
+        if not _is_public_address(address):
+            raise WebhookURLError(f"Webhook host {host} resolves to non-public address {address}")
+    return addresses
+
+
+class WebhookTransport(httpx.AsyncBaseTransport):
+    """
+    Webhook 传输层：每次请求前校验地址，并直接连接校验过的 IP
+
+    请求地址的域名替换为校验时解析出的第一个地址，Host 请求头和 TLS SNI 仍使用原域名，
+    连接时不再解析域名，避免 DNS 重绑定在校验后把域名改指向内网地址。
+    """
+
+    def __init__(self, transport: httpx.AsyncBaseTransport):
+        self._transport = transport
+
+    async def handle_async_request(self, request: httpx.Request) -> httpx.Response:
+        addresses = await validate_webhook_url(str(request.url))
+        if addresses:
+            host = request.url.host
+            request.url = request.url.copy_with(host=addresses[0])
+            if request.url.scheme == "https":
+                request.extensions = {**request.extensions, "sni_hostname": host}
+        return await self._transport.handle_async_request(request)
+
+    async def aclose(self):
+        await self._transport.aclose()
+
+
+class ParseJob:
+    """
+    解析任务
+
+    状态：queued → running → partial（正文字段已可用，OCR 进行中）→ done / error
+    """
+
+    def __init__(self, url: str, cache_mode: str, fetch_mode: Optional[str], webhook_url: Optional[str]):
+        self.job_id = uuid.uuid4().hex
+        self.url = url
+        self.cache_mode = cache_mode
+        self.fetch_mode = fetch_mode
+        self.webhook_url = webhook_url
+        self.status = "queued"
+        self.data: Optional[dict] = None
+        self.cache_status: Optional[str] = None
+        self.error: Optional[str] = None
+        self.created_at = _now()
+        self.updated_at = self.created_at
+        self.webhook: Optional[dict] = {"status": "pending", "attempts": 0, "last_error": None} if webhook_url else None
+
+    @property
+    def finished(self) -> bool:
+        return self.status in ("done", "error")
+
+    def set_partial(self, article: dict):
+        """OCR 开始前写入不含 OCR 文本的文章字段"""
+        self.data = {**article, "parsed_at": _now()}
+        self.status = "partial"
+        self.updated_at = _now()
+
+    def to_dict(self) -> dict:
+        return {
+            "job_id": self.job_id,
+            "url": self.url,
+            "status": self.status,
+            "ocr_pending": self.status == "partial",
+            "data": self.data,
+            "cache_status": self.cache_status,
+            "error": self.error,
+            "created_at": self.created_at,
+            "updated_at": self.updated_at,
+            "webhook": dict(self.webhook) if self.webhook else None,
+        }
+
+
+class JobManager:
+    """
+    任务管理
+
+    任务保存在当前进程内存中（多副本部署时查询需路由到提交任务的实例）；
+    已结束的任务保留 JOBS_TTL 秒，总数超过 JOBS_MAX_ENTRIES 时淘汰最早结束的任务。
+    """
+
+    def __init__(self):
+        self._jobs: "OrderedDict[str, ParseJob]" = OrderedDict()
+        self._finished_at: Dict[str, float] = {}
+        self._tasks: Set[asyncio.Task] = set()
+        self._client: Optional[httpx.AsyncClient] = None
+
+        # 统计
+        self.submitted = 0
+        self.rejected = 0
+        self.webhooks_delivered = 0
+        self.webhooks_failed = 0
+
+    @property
+    def active(self) -> int:
+        return len(self._tasks)
+
+    def submit(self, url: str, cache_mode: str = "default", fetch_mode: Optional[str] = None,
+               webhook_url: Optional[str] = None) -> ParseJob:
+        """创建任务并在后台执行（进行中的任务数达到 JOBS_MAX_ACTIVE 时拒绝）"""
+        if self.active >= settings.JOBS_MAX_ACTIVE:
+            self.rejected += 1
+            raise QueueFullError("Too many jobs in progress", retry_after=max(1, int(settings.MAX_QUEUE_WAIT)))
+
+        self._purge()
+        job = ParseJob(url, cache_mode, fetch_mode, webhook_url)
+        self._jobs[job.job_id] = job
+        self.submitted += 1
+
+        task = asyncio.create_task(self._run(job))
+        self._tasks.add(task)
+        task.add_done_callback(self._tasks.discard)
+        return job
+
+    def get(self, job_id: str) -> Optional[ParseJob]:
+        return self._jobs.get(job_id)
+
+    def _purge(self):
+        loop_time = asyncio.get_running_loop().time()
+        for job_id, finished_at in list(self._finished_at.items()):
+            if loop_time - finished_at > settings.JOBS_TTL:
+                self._finished_at.pop(job_id)
+                self._jobs.pop(job_id, None)
+
+        # 超出上限时按结束先后淘汰（进行中的任务不淘汰）
+        while len(self._jobs) >= settings.JOBS_MAX_ENTRIES and self._finished_at:
+            job_id = next(iter(self._finished_at))
+            self._finished_at.pop(job_id)
+            self._jobs.pop(job_id, None)
+
+    async def _run(self, job: ParseJob):
+        job.status = "running"
+        job.updated_at = _now()
+        try:
+            job.data, job.cache_status = await parse_article_url(
+                job.url, job.cache_mode, job.fetch_mode, on_partial=job.set_partial
+            )
+            job.status = "done"
+        except (FetchError, AdmissionError) as e:
+            job.status = "error"
+            job.error = str(e)
+        except Exception as e:
+            print(f"Error running job {job.job_id} for {job.url}: {e}")
+            job.status = "error"
+            job.error = f"Internal server error: {str(e)}"
+        job.updated_at = _now()
+        self._finished_at[job.job_id] = asyncio.get_running_loop().time()
+
+        if job.webhook_url:
+            await self._deliver(job)
+
+    async def _deliver(self, job: ParseJob):
+        """
+        投递 Webhook 回调
+
+        网络错误、超时、429 和 5xx 按指数退避重试，其余 4xx 不重试。
+        配置 JOB_WEBHOOK_SECRET 时带上请求体的 HMAC-SHA256 签名（X-Signature-SHA256）。
+        每次投递都重新校验地址并直接连接校验过的 IP（见 WebhookTransport），不跟随重定向。
+        """
+        if self._client is None:
+            self._client = httpx.AsyncClient(
+                transport=WebhookTransport(httpx.AsyncHTTPTransport()),
+                timeout=settings.JOB_WEBHOOK_TIMEOUT,
+                follow_redirects=False,
+                # 不经环境变量中的代理（代理会自行解析域名）
+                trust_env=False
+            )
+
+        event = "job.completed" if job.status == "done" else "job.failed"
+        body = json.dumps({"event": event, **job.to_dict()}, ensure_ascii=False).encode("utf-8")
+        headers = {"Content-Type": "application/json", "X-Job-Id": job.job_id}
+        if settings.JOB_WEBHOOK_SECRET:
+            signature = hmac.new(settings.JOB_WEBHOOK_SECRET.encode(), body, hashlib.sha256).hexdigest()
+            headers["X-Signature-SHA256"] = signature
+
+        for attempt in range(settings.JOB_WEBHOOK_MAX_RETRIES + 1):
+            job.webhook["attempts"] = attempt + 1
+            try:
+                response = await self._client.post(job.webhook_url, content=body, headers=headers)
+                if response.is_success:
+                    job.webhook["status"] = "delivered"
+                    job.webhook["last_error"] = None
+                    self.webhooks_delivered += 1
+                    return
+                job.webhook["last_error"] = f"HTTP {response.status_code}"
+                if response.status_code != 429 and response.status_code < 500:
+                    break
+            except WebhookURLError as e:
+                job.webhook["last_error"] = str(e)
+                break
+            except httpx.HTTPError as e:
+                job.webhook["last_error"] = f"{type(e).__name__}: {e}"
+
+            if attempt < settings.JOB_WEBHOOK_MAX_RETRIES:
+                await asyncio.sleep(settings.JOB_WEBHOOK_RETRY_BASE_DELAY * (2 ** attempt))
+
+        job.webhook["status"] = "failed"
+        self.webhooks_failed += 1
+        print(f"Webhook delivery failed for job {job.job_id}: {job.webhook['last_error']}")
+
+    async def close(self):
+        """取消进行中的任务并关闭 Webhook 客户端"""
+        for task in list(self._tasks):
+            task.cancel()
+        if self._tasks:
+            await asyncio.gather(*self._tasks, return_exceptions=True)
+        if self._client:
+            await self._client.aclose()
+            self._client = None
+
+    def stats(self) -> dict:
+        statuses: Dict[str, int] = {}
+        for job in self._jobs.values():
+            statuses[job.status] = statuses.get(job.status, 0) + 1
+        return {
+            "active": self.active,
+            "stored": len(self._jobs),
+            "statuses": statuses,
+            "submitted": self.submitted,
+            "rejected": self.rejected,
+            "webhooks_delivered": self.webhooks_delivered,
+            "webhooks_failed": self.webhooks_failed,
+        }
+
+
+# 全局任务管理实例（单例模式）
+_job_manager_instance: Optional[JobManager] = None
+
+
+def get_job_manager() -> JobManager:
+    """获取任务管理实例（单例）"""
+    global _job_manager_instance
+    if _job_manager_instance is None:
+        _job_manager_instance = JobManager()
+    return _job_manager_instance
+
+
+async def close_job_manager():
+    """关闭任务管理实例"""
+    global _job_manager_instance
+    if _job_manager_instance:
+        await _job_manager_instance.close()
+        _job_manager_instance = None
@@ -1,13 +1,30 @@
 """FastAPI 主入口"""
 import time
-from datetime import datetime
-from fastapi import FastAPI, Query, HTTPException
+from typing import Literal, Optional
+import orjson
+from fastapi import FastAPI, Query, HTTPException, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from app.models import ArticleResponse, HealthResponse
-from app.crawler import get_crawler, close_crawler
-from app.parser import ArticleParser
-from app.utils import validate_wechat_url, clean_article_url, random_delay
+from fastapi.responses import StreamingResponse
+from app.models import ArticleResponse, HealthResponse, BatchParseRequest, BatchParseItem, JobCreateRequest, JobResponse
+from app.crawler import close_crawler, get_crawler_stats
+from app.scheduler import get_scheduler, AdmissionError
+from app.executors import shutdown_executors
+from app.cache import get_article_cache, close_article_cache
+from app.article_store import get_article_store, close_article_store
+from app.service import parse_article_url, parse_article_batch, stream_article_events, get_service_stats, FetchError
+from app.http_fetcher import close_http_fetcher
+from app.ocr_cache import get_ocr_cache, close_ocr_cache
+from app.vision import get_ocr_stats, close_ocr_rate_limiter
+from app.image_filter import get_filter_stats
+from app.sanitizer import get_sanitizer_stats
+from app.metrics import ServerTimingMiddleware, render_metrics, stage_timer
+from app.compression import CompressionMiddleware
+from app.supervisor import get_supervisor
+from app.job_queue import start_job_queue, close_job_queue
+from app.jobs import get_job_manager, close_job_manager, validate_webhook_url, WebhookURLError
 from app.config import settings
+from app.parser import BODY_FIELDS
+from app.utils import validate_wechat_url, clean_article_url
 
 # 应用启动时间
 start_time = time.time()
@@ -25,19 +42,42 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["Server-Timing", "X-Cache"],
 )
 
+# 响应压缩（在 Server-Timing 之内，total 包含压缩耗时）
+if settings.RESPONSE_COMPRESSION:
+    app.add_middleware(CompressionMiddleware)
+
+# 请求耗时指标和 Server-Timing 响应头
+app.add_middleware(ServerTimingMiddleware)
+
 
 @app.on_event("startup")
 async def startup_event():
     """应用启动事件"""
     print("Starting WeChat Article Parser API...")
+    if settings.EXECUTION_MODE == "queue":
+        # 抓取和解析由工作进程完成，API 进程不启动浏览器
+        await start_job_queue()
+    else:
+        # 预热浏览器并启动健康检查
+        await get_supervisor().start()
 
 
 @app.on_event("shutdown")
 async def shutdown_event():
     """应用关闭事件"""
+    await close_job_manager()
+    await close_job_queue()
+    await get_supervisor().stop()
     await close_crawler()
+    await close_http_fetcher()
+    await close_article_cache()
+    close_article_store()
+    close_ocr_cache()
+    await close_ocr_rate_limiter()
+    shutdown_executors()
     print("Shutting down WeChat Article Parser API...")
 
 
@@ -51,14 +91,84 @@ async def health_check():
     )
 
 
+@app.get("/api/stats")
+async def stats():
+    """运行状态统计（准入队列深度、等待时间、页面池借出/空闲/等待数等）"""
+    article_cache = get_article_cache()
+    article_store = get_article_store()
+    ocr_cache = get_ocr_cache()
+    return {
+        "cache": article_cache.stats() if article_cache else None,
+        "article_store": article_store.stats() if article_store else None,
+        "image_filter": get_filter_stats(),
+        "sanitizer": get_sanitizer_stats(),
+        "ocr": get_ocr_stats(),
+        "ocr_cache": ocr_cache.stats() if ocr_cache else None,
+        "service": get_service_stats(),
+        "scheduler": get_scheduler().stats(),
+        "crawler": get_crawler_stats(),
+        "supervisor": get_supervisor().stats(),
+        "jobs": get_job_manager().stats()
+    }
+
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus 指标"""
+    content, content_type = render_metrics()
+    return Response(content=content, media_type=content_type)
+
+
+# /api/parse 可返回的字段（按 ArticleResponse 的字段顺序）
+ARTICLE_FIELDS = tuple(ArticleResponse.model_fields)
+
+
+def _parse_fields(fields: Optional[str], output_format: str = "html") -> tuple:
+    """解析 fields 参数，未指定时返回全部字段（只含所选格式的正文字段），包含未知字段或其他格式的正文字段时返回 400"""
+    if not fields:
+        other_bodies = {field for name, field in BODY_FIELDS.items() if name != output_format}
+        return tuple(name for name in ARTICLE_FIELDS if name not in other_bodies)
+    requested = {name.strip() for name in fields.split(",") if name.strip()}
+    unknown = requested - set(ARTICLE_FIELDS)
+    if unknown or not requested:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown fields: {', '.join(sorted(unknown)) or '(empty)'}. Available fields: {', '.join(ARTICLE_FIELDS)}"
+        )
+    other_bodies = requested & {field for name, field in BODY_FIELDS.items() if name != output_format}
+    if other_bodies:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Fields {', '.join(sorted(other_bodies))} are not available with format={output_format}, "
+                   f"use {BODY_FIELDS[output_format]}"
+        )
+    return tuple(name for name in ARTICLE_FIELDS if name in requested)
+
+
 @app.get("/api/parse", response_model=ArticleResponse)
 async def parse_article(
-    url: str = Query(..., description="微信公众号文章URL")
+    url: str = Query(..., description="微信公众号文章URL"),
+    cache_mode: Literal["default", "bypass", "refresh"] = Query(
+        "default", alias="cache", description="缓存策略：default 读写缓存，bypass 不读不写，refresh 跳过读取并刷新缓存"
+    ),
+    fetch_mode: Optional[Literal["auto", "http", "browser"]] = Query(
+        None, alias="fetch", description="抓取方式：auto 先 HTTP 直接抓取、不完整时回退浏览器，http 仅 HTTP，browser 仅浏览器；默认使用 FETCH_MODE"
+    ),
+    fields: Optional[str] = Query(
+        None, description="只返回指定字段（逗号分隔，例如 title,read_count,like_count）；未请求的正文字段不会计算"
+    ),
+    output_format: Literal["html", "markdown", "blocks"] = Query(
+        "html", alias="format", description="正文格式：html 返回 content_html，markdown 返回 content_markdown，blocks 返回 content_blocks"
+    )
 ):
     """
     解析微信公众号文章
     
     - **url**: 微信公众号文章链接（例如：https://mp.weixin.qq.com/s/abcd1234）
+    - **cache**: 缓存策略（default / bypass / refresh）
+    - **fetch**: 抓取方式（auto / http / browser）
+    - **fields**: 返回字段（逗号分隔），默认全部
+    - **format**: 正文格式（html / markdown / blocks）
     """
     # 验证URL
     if not validate_wechat_url(url):
@@ -67,36 +177,31 @@ async def parse_article(
             detail="Invalid WeChat article URL. URL must be from mp.weixin.qq.com"
         )
     
+    # 解析返回字段
+    selected_fields = _parse_fields(fields, output_format)
+    
     # 清理URL，去掉查询参数
     url = clean_article_url(url)
     
     try:
-        # 获取爬虫实例
-        crawler = await get_crawler()
-        
-        # 随机延迟（反爬虫）
-        random_delay(settings.MIN_DELAY, settings.MAX_DELAY)
-        
-        # 抓取文章HTML
-        html = await crawler.fetch_article(url)
-        
-        if not html:
-            raise HTTPException(
-                status_code=500,
-                detail="Failed to fetch article content"
-            )
-        
-        # 解析文章内容
-        parser = ArticleParser()
-        article_data = parser.parse(html, url)
-        
-        # 添加解析时间
-        article_data["parsed_at"] = datetime.utcnow().isoformat() + "Z"
-        
-        return ArticleResponse(**article_data)
-    
-    except HTTPException:
-        raise
+        article_data, cache_status = await parse_article_url(
+            url, cache_mode, fetch_mode, fields=selected_fields if fields else None, output_format=output_format
+        )
+        with stage_timer("serialize"):
+            body = orjson.dumps({name: article_data.get(name) for name in selected_fields})
+        return Response(content=body, media_type="application/json", headers={"X-Cache": cache_status})
+    
+    except FetchError as e:
+        raise HTTPException(
+            status_code=500,
+            detail=str(e)
+        )
+    except AdmissionError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
     except Exception as e:
         print(f"Error parsing article: {e}")
         raise HTTPException(
@@ -105,6 +210,119 @@ async def parse_article(
         )
 
 
+@app.post("/api/parse/batch")
+async def parse_batch(request: BatchParseRequest):
+    """
+    批量解析微信公众号文章
+    
+    以 NDJSON（application/x-ndjson）流式返回，每行一个 BatchParseItem，按完成顺序输出。
+    重复的 URL（清理查询参数后相同）只解析一次。
+    """
+    if len(request.urls) > settings.BATCH_MAX_URLS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Too many URLs in one batch (max {settings.BATCH_MAX_URLS})"
+        )
+    
+    concurrency = min(request.concurrency or settings.BATCH_CONCURRENCY, settings.BATCH_CONCURRENCY)
+    
+    async def stream():
+        async for item in parse_article_batch(request.urls, request.cache, concurrency, request.fetch):
+            yield BatchParseItem(**item).model_dump_json() + "\n"
+    
+    return StreamingResponse(stream(), media_type="application/x-ndjson")
+
+
+@app.get("/api/parse/stream")
+async def parse_article_stream(
+    request: Request,
+    url: str = Query(..., description="微信公众号文章URL"),
+    cache_mode: Literal["default", "bypass", "refresh"] = Query(
+        "default", alias="cache", description="缓存策略：default 读写缓存，bypass 不读不写，refresh 跳过读取并刷新缓存"
+    ),
+    fetch_mode: Optional[Literal["auto", "http", "browser"]] = Query(
+        None, alias="fetch", description="抓取方式：auto / http / browser，默认使用 FETCH_MODE"
+    )
+):
+    """
+    流式解析微信公众号文章
+    
+    按可用顺序返回事件：metadata（标题、作者、时间、封面、统计数据）→ content（正文 HTML 和纯文本）
+    → ocr_image（每张图片识别完成时）→ done（含 OCR 文本的最终 content_text）；失败时返回 error 事件。
+    
+    请求头 Accept 包含 text/event-stream 时以 Server-Sent Events 返回，否则以 NDJSON 返回（每行 {"event", "data"}）。
+    """
+    if not validate_wechat_url(url):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid WeChat article URL. URL must be from mp.weixin.qq.com"
+        )
+    
+    url = clean_article_url(url)
+    use_sse = "text/event-stream" in request.headers.get("accept", "")
+    
+    async def stream():
+        async for name, data in stream_article_events(url, cache_mode, fetch_mode):
+            if use_sse:
+                yield b"event: " + name.encode() + b"\ndata: " + orjson.dumps(data) + b"\n\n"
+            else:
+                yield orjson.dumps({"event": name, "data": data}) + b"\n"
+    
+    return StreamingResponse(
+        stream(),
+        media_type="text/event-stream" if use_sse else "application/x-ndjson",
+        # 禁止代理缓冲，事件产生后立即送达客户端
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+@app.post("/api/jobs", response_model=JobResponse, status_code=202)
+async def create_job(request: JobCreateRequest):
+    """
+    提交异步解析任务
+    
+    立即返回任务 ID，用 `GET /api/jobs/{job_id}` 查询状态和结果。
+    图片文章在 OCR 开始前即进入 partial 状态并返回正文字段，OCR 文本识别完成后再补全。
+    提供 webhook_url 时任务结束后 POST 任务状态到该地址（失败按指数退避重试），
+    webhook_url 必须是 http / https 且解析到公网地址。
+    """
+    if not validate_wechat_url(request.url):
+        raise HTTPException(
+            status_code=400,
+            detail="Invalid WeChat article URL. URL must be from mp.weixin.qq.com"
+        )
+    
+    if request.webhook_url:
+        try:
+            await validate_webhook_url(str(request.webhook_url))
+        except WebhookURLError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+    
+    try:
+        job = get_job_manager().submit(
+            clean_article_url(request.url),
+            request.cache,
+            request.fetch,
+            str(request.webhook_url) if request.webhook_url else None
+        )
+    except AdmissionError as e:
+        raise HTTPException(
+            status_code=503,
+            detail=str(e),
+            headers={"Retry-After": str(e.retry_after)}
+        )
+    return job.to_dict()
+
+
+@app.get("/api/jobs/{job_id}", response_model=JobResponse)
+async def get_job(job_id: str):
+    """查询异步解析任务状态和（部分）结果"""
+    job = get_job_manager().get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job not found or expired")
+    return job.to_dict()
+
+
 @app.get("/")
 async def root():
     """根路径"""
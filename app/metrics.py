@@ -0,0 +1,211 @@
+"""Prometheus 指标与请求阶段计时模块"""
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, Iterator, Optional
+from prometheus_client import Counter, Histogram, REGISTRY, CONTENT_TYPE_LATEST, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+
+
+# 阶段耗时分桶（秒）：覆盖从毫秒级的解析到数十秒的排队和页面加载
+_STAGE_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+STAGE_SECONDS = Histogram(
+    "wechat_parser_stage_seconds",
+    "Time spent in each stage of article processing",
+    ["stage"],
+    buckets=_STAGE_BUCKETS,
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "wechat_parser_http_request_seconds",
+    "HTTP request latency by route and status code",
+    ["route", "status"],
+    buckets=_STAGE_BUCKETS,
+)
+
+CACHE_RESULTS = Counter(
+    "wechat_parser_cache_results_total",
+    "Article cache results (HIT, STATS-REFRESH, MISS, BYPASS)",
+    ["result"],
+)
+
+TIMEOUTS = Counter(
+    "wechat_parser_timeouts_total",
+    "Timeouts by kind (queue, http_fetch, navigation, readiness)",
+    ["kind"],
+)
+
+FETCH_FAILURES = Counter(
+    "wechat_parser_fetch_failures_total",
+    "Article fetch failures by method (http, browser)",
+    ["method"],
+)
+
+BROWSER_RESTARTS = Counter(
+    "wechat_parser_browser_restarts_total",
+    "Browser restarts by reason (crashed, memory, page_leak, error_rate, max_age)",
+    ["reason"],
+)
+
+
+# 当前请求的阶段耗时：{阶段: [累计秒数, 次数]}，由 ServerTimingMiddleware 为每个请求创建
+_request_timings: ContextVar[Optional[Dict[str, list]]] = ContextVar("request_timings", default=None)
+
+
+def observe_stage(stage: str, seconds: float):
+    """记录阶段耗时（写入直方图，并计入当前请求的 Server-Timing）"""
+    STAGE_SECONDS.labels(stage).observe(seconds)
+    timings = _request_timings.get()
+    if timings is not None:
+        entry = timings.setdefault(stage, [0.0, 0])
+        entry[0] += seconds
+        entry[1] += 1
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """阶段计时的上下文管理器"""
+    started = time.monotonic()
+    try:
+        yield
+    finally:
+        observe_stage(stage, time.monotonic() - started)
+
+
+def child_process_rss(root_pid: Optional[int] = None) -> Dict[str, int]:
+    """
+    统计 root_pid（默认当前进程）的所有子孙进程的常驻内存（字节），按类型（browser / other）汇总
+
+    浏览器（chromium / headless_shell）及 Playwright 驱动进程都是服务进程的子孙进程。
+    读取 /proc，非 Linux 环境返回空字典。
+    """
+    children: Dict[int, list] = {}
+    info: Dict[int, tuple] = {}
+    try:
+        pids = [int(name) for name in os.listdir("/proc") if name.isdigit()]
+    except OSError:
+        return {}
+
+    page_size = os.sysconf("SC_PAGE_SIZE")
+    for pid in pids:
+        try:
+            with open(f"/proc/{pid}/stat") as f:
+                stat = f.read()
+            with open(f"/proc/{pid}/statm") as f:
+                resident_pages = int(f.read().split()[1])
+        except (OSError, IndexError, ValueError):
+            continue
+        # stat 格式：pid (comm) state ppid ...，comm 可能包含空格
+        comm = stat[stat.index("(") + 1:stat.rindex(")")]
+        ppid = int(stat[stat.rindex(")") + 2:].split()[1])
+        children.setdefault(ppid, []).append(pid)
+        info[pid] = (comm, resident_pages * page_size)
+
+    totals: Dict[str, int] = {}
+    stack = list(children.get(root_pid or os.getpid(), []))
+    while stack:
+        pid = stack.pop()
+        comm, rss = info[pid]
+        name = "browser" if ("chrom" in comm or "headless" in comm) else "other"
+        totals[name] = totals.get(name, 0) + rss
+        stack.extend(children.get(pid, []))
+    return totals
+
+
+class _RuntimeCollector:
+    """抓取时读取的运行状态指标（页面池、准入队列、浏览器内存）"""
+
+    def describe(self):
+        # 注册时只声明指标名，不调用 collect（collect 依赖的模块此时可能尚未加载完成）
+        yield GaugeMetricFamily("wechat_parser_browser_pages", "Browser pages in the pool by state", labels=["state"])
+        yield GaugeMetricFamily("wechat_parser_admission", "Admission scheduler state", labels=["state"])
+        yield GaugeMetricFamily("wechat_parser_child_process_rss_bytes", "Resident memory of child processes (browser and others)", labels=["kind"])
+
+    def collect(self):
+        # 延迟导入，避免与 crawler / scheduler 循环引用
+        from app.crawler import get_crawler_stats
+        from app.scheduler import get_scheduler
+
+        crawler_stats = get_crawler_stats()
+        pool = (crawler_stats or {}).get("pool") or {}
+        pages = GaugeMetricFamily("wechat_parser_browser_pages", "Browser pages in the pool by state", labels=["state"])
+        pages.add_metric(["open"], pool.get("created", 0))
+        pages.add_metric(["in_use"], pool.get("in_use", 0))
+        pages.add_metric(["idle"], pool.get("idle", 0))
+        pages.add_metric(["waiting"], pool.get("waiting", 0))
+        yield pages
+
+        scheduler = get_scheduler().stats()
+        admission = GaugeMetricFamily("wechat_parser_admission", "Admission scheduler state", labels=["state"])
+        admission.add_metric(["active"], scheduler["active"])
+        admission.add_metric(["queued"], scheduler["queue_depth"])
+        yield admission
+
+        rss = GaugeMetricFamily(
+            "wechat_parser_child_process_rss_bytes",
+            "Resident memory of child processes (browser and others)",
+            labels=["kind"],
+        )
+        totals = child_process_rss()
+        for kind in ("browser", "other"):
+            rss.add_metric([kind], totals.get(kind, 0))
+        yield rss
+
+
+REGISTRY.register(_RuntimeCollector())
+
+
+def render_metrics() -> tuple[bytes, str]:
+    """生成 Prometheus 文本格式的指标，返回 (内容, Content-Type)"""
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def _server_timing_header(timings: Dict[str, list], total: float) -> str:
+    parts = []
+    for stage, (seconds, count) in timings.items():
+        part = f"{stage};dur={seconds * 1000:.1f}"
+        if count > 1:
+            part += f';desc="x{count}"'
+        parts.append(part)
+    parts.append(f"total;dur={total * 1000:.1f}")
+    return ", ".join(parts)
+
+
+class ServerTimingMiddleware:
+    """
+    ASGI 中间件：记录 HTTP 请求耗时，并在响应头 Server-Timing 中返回本次请求各阶段耗时
+
+    阶段耗时通过 observe_stage 写入当前请求的上下文；合并到其他请求上的调用（SingleFlight 跟随者）
+    只包含 total。
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        timings: Dict[str, list] = {}
+        token = _request_timings.set(timings)
+        started = time.monotonic()
+        status = {"code": 500}
+
+        async def send_with_timing(message):
+            if message["type"] == "http.response.start":
+                status["code"] = message["status"]
+                headers = list(message.get("headers", []))
+                headers.append((b"server-timing", _server_timing_header(timings, time.monotonic() - started).encode()))
+                message = {**message, "headers": headers}
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_timing)
+        finally:
+            _request_timings.reset(token)
+            route = scope.get("route")
+            path = getattr(route, "path", None) or "unmatched"
+            HTTP_REQUEST_SECONDS.labels(path, str(status["code"])).observe(time.monotonic() - started)
@@ -1,16 +1,27 @@
 """数据模型"""
 from datetime import datetime
-from typing import Optional
-from pydantic import BaseModel, HttpUrl, Field
+from typing import List, Literal, Optional
+from pydantic import BaseModel, HttpUrl, Field, model_serializer, model_validator
+from app.parser import BODY_FIELDS
 
 
 class ArticleResponse(BaseModel):
-    """文章解析响应模型"""
+    """
+    文章解析响应模型
+
+    正文只有所选格式（format）对应的一个字段：html 格式为 content_html（不为 null），
+    markdown / blocks 格式为 content_markdown / content_blocks，其他格式的正文字段不出现在输出中。
+    """
     title: str = Field(..., description="文章标题")
     author: Optional[str] = Field(None, description="作者")
     publish_time: Optional[str] = Field(None, description="发布时间")
     cover: Optional[str] = Field(None, description="封面图URL")
-    content_html: str = Field(..., description="HTML格式正文")
+    content_html: Optional[str] = Field(None, description="HTML格式正文（format=html，其他格式时不返回）")
+    content_markdown: Optional[str] = Field(None, description="Markdown格式正文（format=markdown，其他格式时不返回）")
+    content_blocks: Optional[List[dict]] = Field(
+        None,
+        description="结构化正文块（format=blocks，其他格式时不返回）：heading、paragraph、image、quote、code、list、table"
+    )
     content_text: str = Field(..., description="纯文本格式正文")
     read_count: Optional[int] = Field(None, description="阅读量")
     like_count: Optional[int] = Field(None, description="点赞数")
@@ -33,8 +44,89 @@ class ArticleResponse(BaseModel):
             }
         }
 
+    @model_validator(mode="after")
+    def _check_body(self):
+        bodies = [name for name in BODY_FIELDS.values() if getattr(self, name) is not None]
+        if len(bodies) != 1:
+            raise ValueError(f"Exactly one body field is required, got: {', '.join(bodies) or 'none'}")
+        return self
+
+    @model_serializer(mode="wrap")
+    def _omit_other_bodies(self, handler):
+        data = handler(self)
+        for name in BODY_FIELDS.values():
+            if data.get(name) is None:
+                data.pop(name, None)
+        return data
+
 
 class HealthResponse(BaseModel):
     """健康检查响应模型"""
     status: str = Field(..., description="服务状态")
     uptime: Optional[str] = Field(None, description="运行时长（秒）")
+
+
+class BatchParseRequest(BaseModel):
+    """批量解析请求模型"""
+    urls: List[str] = Field(..., min_length=1, description="微信公众号文章URL列表")
+    cache: Literal["default", "bypass", "refresh"] = Field("default", description="缓存策略")
+    concurrency: Optional[int] = Field(None, ge=1, description="本批次最大并行数（不超过 BATCH_CONCURRENCY）")
+    fetch: Optional[Literal["auto", "http", "browser"]] = Field(None, description="抓取方式，默认使用 FETCH_MODE")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "urls": [
+                    "https://mp.weixin.qq.com/s/abcd1234",
+                    "https://mp.weixin.qq.com/s/efgh5678"
+                ],
+                "cache": "default"
+            }
+        }
+
+
+class BatchParseItem(BaseModel):
+    """批量解析结果（NDJSON 中的一行）"""
+    url: str = Field(..., description="文章URL（有效URL为清理后的地址）")
+    status: Literal["ok", "invalid", "error"] = Field(..., description="解析状态")
+    data: Optional[ArticleResponse] = Field(None, description="解析结果")
+    error: Optional[str] = Field(None, description="错误信息")
+
+
+class JobCreateRequest(BaseModel):
+    """异步解析任务请求模型"""
+    url: str = Field(..., description="微信公众号文章URL")
+    cache: Literal["default", "bypass", "refresh"] = Field("default", description="缓存策略")
+    fetch: Optional[Literal["auto", "http", "browser"]] = Field(None, description="抓取方式，默认使用 FETCH_MODE")
+    webhook_url: Optional[HttpUrl] = Field(None, description="任务结束后回调的地址（POST JSON）")
+    
+    class Config:
+        json_schema_extra = {
+            "example": {
+                "url": "https://mp.weixin.qq.com/s/abcd1234",
+                "webhook_url": "https://example.com/hooks/wechat-article"
+            }
+        }
+
+
+class WebhookStatus(BaseModel):
+    """Webhook 投递状态"""
+    status: Literal["pending", "delivered", "failed"] = Field(..., description="投递状态")
+    attempts: int = Field(..., description="已尝试次数")
+    last_error: Optional[str] = Field(None, description="最近一次失败原因")
+
+
+class JobResponse(BaseModel):
+    """异步解析任务状态"""
+    job_id: str = Field(..., description="任务ID")
+    url: str = Field(..., description="文章URL（清理后的地址）")
+    status: Literal["queued", "running", "partial", "done", "error"] = Field(
+        ..., description="任务状态，partial 表示正文字段已可用、OCR 文本仍在识别"
+    )
+    ocr_pending: bool = Field(..., description="OCR 文本是否仍在识别")
+    data: Optional[ArticleResponse] = Field(None, description="解析结果（partial 时不含 OCR 文本）")
+    cache_status: Optional[str] = Field(None, description="缓存状态（HIT / STATS-REFRESH / MISS / BYPASS）")
+    error: Optional[str] = Field(None, description="错误信息")
+    created_at: str = Field(..., description="创建时间（ISO格式）")
+    updated_at: str = Field(..., description="更新时间（ISO格式）")
+    webhook: Optional[WebhookStatus] = Field(None, description="Webhook 投递状态")
@@ -0,0 +1,180 @@
+"""OCR 结果缓存模块（SQLite 持久化，按图片地址或内容哈希寻址）"""
+import asyncio
+import hashlib
+import os
+import re
+import sqlite3
+import threading
+import time
+from typing import Dict, Optional
+from urllib.parse import urlparse
+from app.config import settings
+
+
+# 微信图片地址末尾的尺寸段（/0、/640 等），不同尺寸的同一图片文字相同
+_SIZE_SEGMENT_RE = re.compile(r'/\d+$')
+
+
+def normalize_image_url(url: str) -> str:
+    """
+    规范化图片 URL 作为缓存键
+
+    统一为 https、小写域名，去掉锚点。微信图床（*.qpic.cn）的查询参数（wx_fmt、tp、from 等）
+    和末尾的尺寸段只影响格式和尺寸，一并去掉；其他域名保留查询参数（可能用于区分不同图片）。
+    """
+    parsed = urlparse(url.strip())
+    host = (parsed.hostname or "").lower()
+    path = parsed.path
+    if host == "qpic.cn" or host.endswith(".qpic.cn"):
+        return f"https://{host}{_SIZE_SEGMENT_RE.sub('', path)}"
+    query = f"?{parsed.query}" if parsed.query else ""
+    return f"https://{host}{path}{query}"
+
+
+class OCRCache:
+    """
+    OCR 结果缓存
+
+    以规范化的图片 URL（可选再加图片内容 SHA-256）为键保存识别文字，
+    条目数超过上限时按最近访问时间淘汰最旧的条目。
+    """
+
+    # 每次淘汰时额外清理的比例，避免每次写入都触发淘汰
+    EVICT_RATIO = 0.1
+
+    # 命中时的访问时间先记在内存中，积累到一定数量或时间后批量写入（读缓存不逐次提交事务）
+    ACCESS_FLUSH_SIZE = 256
+    ACCESS_FLUSH_INTERVAL = 60.0
+
+    def __init__(self, path: str, max_entries: int):
+        self.path = path
+        self.max_entries = max(1, max_entries)
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS ocr_results ("
+            "key TEXT PRIMARY KEY, text TEXT NOT NULL, created_at REAL NOT NULL, accessed_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_ocr_results_accessed_at ON ocr_results (accessed_at)")
+        self._conn.commit()
+        self._count = self._conn.execute("SELECT COUNT(*) FROM ocr_results").fetchone()[0]
+
+        # 尚未写入的访问时间 {key: accessed_at}
+        self._pending_access: Dict[str, float] = {}
+        self._last_access_flush = time.monotonic()
+
+        # 统计
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[str]:
+        """读取缓存，未命中返回 None（图片无文字时缓存值为空字符串）"""
+        with self._lock:
+            row = self._conn.execute("SELECT text FROM ocr_results WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                self.misses += 1
+                return None
+            self._pending_access[key] = time.time()
+            if (len(self._pending_access) >= self.ACCESS_FLUSH_SIZE
+                    or time.monotonic() - self._last_access_flush >= self.ACCESS_FLUSH_INTERVAL):
+                self._flush_access()
+                self._conn.commit()
+        self.hits += 1
+        return row[0]
+
+    def _flush_access(self):
+        """批量写入访问时间（调用方持有锁并负责提交）"""
+        if self._pending_access:
+            self._conn.executemany(
+                "UPDATE ocr_results SET accessed_at = ? WHERE key = ?",
+                [(accessed_at, key) for key, accessed_at in self._pending_access.items()]
+            )
+            self._pending_access.clear()
+        self._last_access_flush = time.monotonic()
+
+    def set(self, key: str, text: str):
+        """写入缓存"""
+        now = time.time()
+        with self._lock:
+            exists = self._conn.execute("SELECT 1 FROM ocr_results WHERE key = ?", (key,)).fetchone()
+            if not exists:
+                self._count += 1
+            self._conn.execute(
+                "INSERT OR REPLACE INTO ocr_results (key, text, created_at, accessed_at) VALUES (?, ?, ?, ?)",
+                (key, text, now, now)
+            )
+            self._pending_access.pop(key, None)
+            if self._count > self.max_entries:
+                # 淘汰前写入访问时间，按最新的访问顺序淘汰
+                self._flush_access()
+            self._evict()
+            self._conn.commit()
+
+    def _evict(self):
+        if self._count <= self.max_entries:
+            return
+        excess = self._count - self.max_entries + int(self.max_entries * self.EVICT_RATIO)
+        deleted = self._conn.execute(
+            "DELETE FROM ocr_results WHERE key IN (SELECT key FROM ocr_results ORDER BY accessed_at LIMIT ?)",
+            (excess,)
+        ).rowcount
+        self._count -= deleted
+        self.evictions += deleted
+
+    async def aget(self, key: str) -> Optional[str]:
+        """异步读取缓存（在线程中执行 SQLite 操作）"""
+        return await asyncio.to_thread(self.get, key)
+
+    async def aset(self, key: str, text: str):
+        """异步写入缓存"""
+        await asyncio.to_thread(self.set, key, text)
+
+    def close(self):
+        with self._lock:
+            self._flush_access()
+            self._conn.commit()
+            self._conn.close()
+
+    def stats(self) -> dict:
+        """缓存统计信息"""
+        total = self.hits + self.misses
+        return {
+            "entries": self._count,
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": round(self.hits / total, 3) if total else 0.0,
+            "evictions": self.evictions,
+        }
+
+
+def content_key(data: bytes) -> str:
+    """图片内容哈希键"""
+    return "sha256:" + hashlib.sha256(data).hexdigest()
+
+
+# 全局缓存实例（单例模式）
+_cache_instance: Optional[OCRCache] = None
+
+
+def get_ocr_cache() -> Optional[OCRCache]:
+    """获取 OCR 缓存实例（未启用时返回 None）"""
+    global _cache_instance
+    if _cache_instance is None and settings.OCR_CACHE_ENABLED:
+        _cache_instance = OCRCache(settings.OCR_CACHE_PATH, settings.OCR_CACHE_MAX_ENTRIES)
+    return _cache_instance
+
+
+def close_ocr_cache():
+    """关闭 OCR 缓存"""
+    global _cache_instance
+    if _cache_instance:
+        _cache_instance.close()
+        _cache_instance = None
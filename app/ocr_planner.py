@@ -0,0 +1,75 @@
+"""OCR 批量规划模块（决定逐张识别还是多图合并识别）"""
+import re
+from typing import List, Optional
+from app.config import settings
+
+
+# 多图请求的提示词：要求模型在每张图片的文字前输出序号标记，便于拆分回单张图片
+BATCH_PROMPT = (
+    "请按顺序提取以下 {count} 张图片中的所有文字内容，保持段落结构。"
+    "每张图片的文字前单独一行标注【图片 序号】（序号从 1 开始），没有文字的图片也要输出标注。"
+    "只输出图片中的文字，不要添加任何解释。"
+)
+
+# 序号标记：【图片 1】 / [图片 1]
+_MARKER_RE = re.compile(r'^[ \t]*[【\[][ \t]*图片[ \t]*(\d+)[ \t]*[】\]][ \t]*$', re.M)
+
+
+def should_batch(image_count: int) -> bool:
+    """
+    判断是否使用多图合并请求
+
+    OCR_BATCH_MODE=single 始终逐张；batch 始终合并；auto 在待识别图片数不少于 OCR_BATCH_MIN_IMAGES 时合并。
+    """
+    mode = settings.OCR_BATCH_MODE
+    if mode == "single" or image_count < 2:
+        return False
+    if mode == "batch":
+        return True
+    return image_count >= settings.OCR_BATCH_MIN_IMAGES
+
+
+def chunk_size() -> int:
+    """单个请求包含的图片数：同时受图片数上限和估算 token 预算限制"""
+    by_tokens = settings.OCR_BATCH_TOKEN_BUDGET // max(1, settings.OCR_TOKENS_PER_IMAGE)
+    return max(1, min(settings.OCR_BATCH_MAX_IMAGES, by_tokens))
+
+
+def plan_chunks(image_count: int) -> List[List[int]]:
+    """
+    把图片切分为请求单元
+
+    Args:
+        image_count: 待识别图片数
+
+    Returns:
+        每个请求包含的图片位置列表（按原顺序）
+    """
+    positions = list(range(image_count))
+    if not should_batch(image_count):
+        return [[position] for position in positions]
+
+    size = chunk_size()
+    return [positions[start:start + size] for start in range(0, image_count, size)]
+
+
+def split_batch_output(text: str, count: int) -> Optional[List[str]]:
+    """
+    按序号标记把多图请求的输出拆分为每张图片的文字
+
+    Args:
+        text: 模型输出
+        count: 请求中的图片数
+
+    Returns:
+        每张图片的文字（按序号），标记缺失或不完整时返回 None
+    """
+    matches = list(_MARKER_RE.finditer(text or ""))
+    sections = {}
+    for i, match in enumerate(matches):
+        end = matches[i + 1].start() if i + 1 < len(matches) else len(text)
+        sections[int(match.group(1))] = text[match.end():end].strip()
+
+    if set(sections) != set(range(1, count + 1)):
+        return None
+    return [sections[index] for index in range(1, count + 1)]
@@ -1,18 +1,116 @@
 """HTML 解析模块"""
-from typing import Optional, List
+import asyncio
+import re
+from typing import Callable, Collection, Optional, List
 from bs4 import BeautifulSoup, Tag
-from app.utils import clean_text, format_publish_time, extract_image_urls
+from app.utils import clean_text, format_publish_time, extract_content_parts
 from app.config import settings
+from app.executors import run_in_parse_executor
+from app.image_filter import filter_images
+from app.metrics import stage_timer
+from app.sanitizer import sanitize_html
+from app.formats import render_blocks, render_markdown
+from app.strainer import ARTICLE_STRAINER, METADATA_STRAINER, STATS_STRAINER, FieldStrainer
 from app.vision import VisionOCR
 
 
+# 解析器版本：提取逻辑变化时递增，文章库中旧版本的记录会用保存的 HTML 重新解析
+PARSER_VERSION = 1
+
+# 计算开销大的正文字段（HTML 序列化、纯文本和 OCR），按需计算
+CONTENT_FIELDS = ("content_html", "content_text")
+
+# 正文输出格式（format 参数）及对应的字段：非 html 格式以该字段代替 content_html
+BODY_FIELDS = {"html": "content_html", "markdown": "content_markdown", "blocks": "content_blocks"}
+
+# 完整性检查使用的正则（避免为判断是否需要浏览器渲染而完整解析一次 HTML）
+_CONTENT_OPEN_RE = re.compile(r'<div\b[^>]*\bid=["\']js_content["\'][^>]*>', re.I)
+_TITLE_RE = re.compile(r'<meta\b[^>]*property=["\']og:title["\'][^>]*content=["\'][^"\']+|class=["\'][^"\']*\brich_media_title\b', re.I)
+_TAG_RE = re.compile(r'<[^>]+>')
+_BLOCKED_MARKERS = ("环境异常", "完成验证后即可继续访问")
+
+
 class ArticleParser:
     """文章解析器"""
     
     @staticmethod
-    def parse(html: str, url: str) -> dict:
-        """解析微信公众号文章HTML"""
-        soup = BeautifulSoup(html, 'lxml')
+    async def parse_async(
+        html: str,
+        url: str,
+        on_partial: Optional[Callable[[dict], None]] = None,
+        fields: Optional[Collection[str]] = None,
+        on_image: Optional[Callable[[int, int, str, Optional[str]], None]] = None,
+        output_format: str = "html",
+        on_metadata: Optional[Callable[[dict], None]] = None
+    ) -> dict:
+        """
+        异步解析微信公众号文章HTML
+        
+        HTML 解析在解析执行器中运行，OCR 并发调用（阻塞的 SDK 调用在 OCR 执行器中运行），均不阻塞事件循环。
+        
+        Args:
+            html: 文章 HTML
+            url: 文章 URL
+            on_partial: 需要 OCR 时，在 OCR 开始前以不含 OCR 文本的文章字段调用一次
+            fields: 需要计算的正文字段（正文格式字段和 content_text），None 表示全部；不需要 content_text 时跳过 OCR
+            on_image: 每张图片 OCR 完成时以 (序号, 图片数, 图片 URL, 文字) 调用，序号从 1 开始
+            output_format: 正文格式（html / markdown / blocks，见 BODY_FIELDS）
+            on_metadata: 解析出标题、作者、时间、封面和统计字段后、构建正文之前，以这些字段调用一次
+                （在事件循环中调用）；PARSE_EXECUTOR=process 时回调无法传入子进程，不调用
+        """
+        metadata_callback = None
+        if on_metadata and settings.PARSE_EXECUTOR == "thread":
+            loop = asyncio.get_running_loop()
+
+            def metadata_callback(metadata: dict):
+                loop.call_soon_threadsafe(on_metadata, metadata)
+
+        with stage_timer("parse"):
+            article, images = await run_in_parse_executor(
+                ArticleParser.parse_html, html, url, fields, output_format, metadata_callback
+            )
+        
+        if fields is not None and "content_text" not in fields:
+            return article
+        
+        if ArticleParser.is_image_article(article["content_text"], images):
+            if on_partial:
+                on_partial(dict(article))
+            with stage_timer("image_filter"):
+                image_urls, skipped = await filter_images(images)
+            ArticleParser._log_skipped_images(url, skipped)
+            if ArticleParser.is_image_article(article["content_text"], image_urls):
+                with stage_timer("ocr"):
+                    ocr_text = await ArticleParser._extract_text_with_ocr_async(image_urls, on_image)
+                article["content_text"] = ArticleParser._merge_ocr_text(article["content_text"], ocr_text)
+        
+        return article
+    
+    @staticmethod
+    def parse_html(
+        html: str,
+        url: str,
+        fields: Optional[Collection[str]] = None,
+        output_format: str = "html",
+        on_metadata: Optional[Callable[[dict], None]] = None
+    ) -> tuple[dict, List[dict]]:
+        """
+        解析 HTML 中的文章字段（不含 OCR）
+        
+        Args:
+            html: 文章 HTML
+            url: 文章 URL
+            fields: 需要计算的正文字段（正文格式字段和 content_text），None 表示全部；未计算的字段为空值
+            output_format: 正文格式，正文保存在 BODY_FIELDS[output_format] 字段中
+            on_metadata: 提取正文之前以标题、作者、时间、封面、统计字段和 URL 调用一次（在解析线程中调用）
+            
+        Returns:
+            (文章字段字典, 正文图片信息列表)
+        """
+        body_field = BODY_FIELDS[output_format]
+        include_body = fields is None or body_field in fields
+        include_content = include_body or "content_text" in fields
+        soup = ArticleParser._make_soup(html, ARTICLE_STRAINER if include_content else METADATA_STRAINER)
         
         # 提取标题
         title = ArticleParser._extract_title(soup)
@@ -26,33 +124,110 @@ class ArticleParser:
         # 提取封面图
         cover = ArticleParser._extract_cover(soup)
         
-        # 提取正文（包含图片 URL 提取）
-        content_html, content_text, image_urls = ArticleParser._extract_content(soup)
-        
-        # 检测是否为图片文章，如果是则使用 OCR 提取文字
-        if ArticleParser._is_image_article(content_text, image_urls):
-            ocr_text = ArticleParser._extract_text_with_ocr(image_urls)
-            if ocr_text:
-                # 合并原有文本和 OCR 提取的文本
-                if content_text:
-                    content_text = f"{content_text}\n\n{ocr_text}"
-                else:
-                    content_text = ocr_text
-        
         # 提取阅读量和点赞数
         read_count, like_count = ArticleParser._extract_stats(soup)
         
-        return {
+        if on_metadata:
+            on_metadata({
+                "title": title,
+                "author": author,
+                "publish_time": publish_time,
+                "cover": cover,
+                "read_count": read_count,
+                "like_count": like_count,
+                "url": url
+            })
+        
+        # 提取正文（包含图片提取）
+        if include_content:
+            body, content_text, images = ArticleParser._extract_content(soup, include_body, output_format)
+        else:
+            body, content_text, images = ([] if output_format == "blocks" else ""), "", []
+        
+        article = {
             "title": title,
             "author": author,
             "publish_time": publish_time,
             "cover": cover,
-            "content_html": content_html,
+            body_field: body,
             "content_text": content_text,
             "read_count": read_count,
             "like_count": like_count,
             "url": url
         }
+        return article, images
+    
+    @staticmethod
+    def parse_stats(html: str) -> tuple[Optional[int], Optional[int]]:
+        """只解析阅读量和点赞数（正文已缓存时使用）"""
+        soup = ArticleParser._make_soup(html, STATS_STRAINER)
+        return ArticleParser._extract_stats(soup)
+    
+    @staticmethod
+    def _make_soup(html: str, strainer: FieldStrainer) -> BeautifulSoup:
+        """
+        构建 BeautifulSoup 对象
+        
+        PARSER_ENGINE=strained 时只构建提取字段用到的元素（结果与完整解析一致，CPU 和内存开销更低）；
+        full 时构建完整文档树。
+        """
+        if settings.PARSER_ENGINE == "strained":
+            return BeautifulSoup(html, 'lxml', parse_only=strainer)
+        return BeautifulSoup(html, 'lxml')
+    
+    @staticmethod
+    def is_complete(html: Optional[str]) -> bool:
+        """
+        快速判断 HTML 是否已包含解析所需的字段（标题和正文）
+        
+        用于 HTTP 快速抓取后决定是否需要回退到浏览器渲染。
+        
+        Args:
+            html: 文章 HTML
+            
+        Returns:
+            是否可以直接解析
+        """
+        if not html:
+            return False
+        
+        # 验证页 / 异常页
+        if any(marker in html for marker in _BLOCKED_MARKERS):
+            return False
+        
+        if not _TITLE_RE.search(html):
+            return False
+        
+        match = _CONTENT_OPEN_RE.search(html)
+        if not match:
+            return False
+        
+        # 正文开头部分（到第一个 </div> 为止）需要有文字或图片
+        head = html[match.end():match.end() + 20000]
+        head = head.split('</div>', 1)[0]
+        if '<img' in head:
+            return True
+        return bool(_TAG_RE.sub('', head).strip())
+    
+    @staticmethod
+    def _log_skipped_images(url: str, skipped: List[dict]):
+        """输出 OCR 前被过滤的图片及原因"""
+        if not skipped:
+            return
+        reasons: dict = {}
+        for image in skipped:
+            reasons[image["reason"]] = reasons.get(image["reason"], 0) + 1
+        summary = ", ".join(f"{reason}={count}" for reason, count in reasons.items())
+        print(f"Skipped {len(skipped)} images before OCR for {url}: {summary}")
+    
+    @staticmethod
+    def _merge_ocr_text(content_text: str, ocr_text: str) -> str:
+        """合并原有文本和 OCR 提取的文本"""
+        if not ocr_text:
+            return content_text
+        if content_text:
+            return f"{content_text}\n\n{ocr_text}"
+        return ocr_text
     
     @staticmethod
     def _extract_title(soup: BeautifulSoup) -> str:
@@ -132,37 +307,48 @@ class ArticleParser:
         return None
     
     @staticmethod
-    def _extract_content(soup: BeautifulSoup) -> tuple[str, str, List[str]]:
-        """提取正文内容（HTML、纯文本和图片 URL）"""
+    def _extract_content(
+        soup: BeautifulSoup,
+        include_body: bool = True,
+        output_format: str = "html"
+    ) -> tuple[object, str, List[dict]]:
+        """
+        提取正文内容（正文、纯文本和图片信息），include_body 为 False 时不生成正文
+        
+        正文按 output_format 生成：html 为 HTML 字符串，markdown 为 Markdown 字符串，blocks 为结构化块列表，
+        均在同一棵文档树上生成，不再重新解析。
+        """
         # 查找正文容器
         content_div = soup.find('div', class_='rich_media_content') or soup.find('div', id='js_content')
         
         if not content_div:
-            return "", "", []
-        
-        # 移除不需要的元素
-        for tag in content_div.find_all(['script', 'style', 'iframe']):
-            tag.decompose()
-        
-        # 提取 HTML
-        content_html = str(content_div)
-        
-        # 提取纯文本
-        content_text = clean_text(content_div.get_text())
-        
-        # 提取图片 URL（只从正文容器中提取，排除封面图）
-        image_urls = extract_image_urls(soup, content_div)
-        
-        return content_html, content_text, image_urls
+            return ([] if output_format == "blocks" else ""), "", []
+        
+        # 一次遍历得到 HTML、纯文本和图片（移除 script / style / iframe，图片只从正文容器中提取，排除封面图）
+        profile = settings.CONTENT_HTML_PROFILE
+        serialize_raw = include_body and output_format == "html" and profile == "raw"
+        body, content_text, images = extract_content_parts(content_div, serialize_raw)
+        
+        if include_body and output_format == "markdown":
+            body = render_markdown(content_div)
+        elif include_body and output_format == "blocks":
+            body = render_blocks(content_div)
+        elif include_body and profile != "raw":
+            # 按 CONTENT_HTML_PROFILE 精简正文 HTML（纯文本和图片不受影响）
+            body = sanitize_html(content_div, profile)
+        elif output_format == "blocks":
+            body = []
+        
+        return body, content_text, images
     
     @staticmethod
-    def _is_image_article(content_text: str, image_urls: List[str]) -> bool:
+    def is_image_article(content_text: str, image_urls: list) -> bool:
         """
         判断是否为图片文章
         
         Args:
             content_text: 提取的文本内容
-            image_urls: 图片 URL 列表
+            image_urls: 图片 URL（或图片信息）列表
             
         Returns:
             是否为图片文章
@@ -181,24 +367,31 @@ class ArticleParser:
         return True
     
     @staticmethod
-    def _extract_text_with_ocr(image_urls: List[str]) -> str:
+    async def _extract_text_with_ocr_async(
+        image_urls: List[str],
+        on_image: Optional[Callable[[int, int, str, Optional[str]], None]] = None
+    ) -> str:
         """
-        使用 OCR 从图片中提取文字
+        使用 OCR 从图片中提取文字（异步并发版本）
         
         Args:
             image_urls: 图片 URL 列表
+            on_image: 每张图片识别完成时以 (序号, 图片数, 图片 URL, 文字) 调用
             
         Returns:
             提取的文字内容
         """
-        # 检查是否配置了 API Key
         if not settings.DASHSCOPE_API_KEY:
             print("DASHSCOPE_API_KEY is not configured. Skipping OCR.")
             return ""
         
         try:
             ocr = VisionOCR()
-            return ocr.extract_text_from_images(image_urls)
+            on_result = None
+            if on_image:
+                def on_result(position: int, text: Optional[str]):
+                    on_image(position + 1, len(image_urls), image_urls[position], text)
+            return await ocr.extract_text_from_images_async(image_urls, on_result)
         except Exception as e:
             print(f"Error during OCR extraction: {e}")
             return ""
@@ -0,0 +1,201 @@
+"""浏览器页面池模块"""
+import asyncio
+from contextlib import asynccontextmanager
+from typing import List, Optional
+from playwright.async_api import Browser, BrowserContext, Page
+from app.config import settings
+from app.interceptor import ResourceBlocker, RouteStats
+
+
+class PooledPage:
+    """池中的页面（每个页面独占一个浏览器上下文）"""
+
+    def __init__(self, context: BrowserContext, page: Page, route_stats: Optional[RouteStats] = None):
+        self.context = context
+        self.page = page
+        self.route_stats = route_stats
+        self.uses = 0
+        self.crashed = False
+        page.on("crash", self._on_crash)
+
+    def _on_crash(self, _page: Page):
+        """页面崩溃回调"""
+        self.crashed = True
+
+    @property
+    def healthy(self) -> bool:
+        """页面是否可继续复用"""
+        return not self.crashed and not self.page.is_closed()
+
+    async def close(self):
+        """关闭页面及其上下文"""
+        try:
+            await self.context.close()
+        except Exception as e:
+            print(f"Error closing pooled page: {e}")
+
+
+class PagePool:
+    """
+    有界的浏览器页面池
+
+    页面按需创建，最多 size 个；每个页面使用 max_uses 次或崩溃后回收重建。
+    池满时 acquire 会等待其他请求归还页面。
+    """
+
+    def __init__(
+        self,
+        browser: Browser,
+        size: Optional[int] = None,
+        max_uses: Optional[int] = None,
+        blocker: Optional[ResourceBlocker] = None
+    ):
+        self.browser = browser
+        self.blocker = blocker
+        self.size = max(1, size or settings.MAX_CONCURRENCY)
+        self.max_uses = max(1, max_uses or settings.PAGE_MAX_USES)
+
+        self._idle: List[PooledPage] = []
+        self._created = 0  # 已创建的页面数（含借出中的页面）
+        self._cond = asyncio.Condition()
+        self._closed = False
+
+        # 统计
+        self.checked_out = 0
+        self.waiting = 0
+        self.total_acquired = 0
+        self.total_recycled = 0
+        self.total_waits = 0
+
+    async def _create(self) -> PooledPage:
+        """创建新的上下文和页面"""
+        context = await self.browser.new_context(user_agent=settings.USER_AGENT)
+        try:
+            route_stats = await self.blocker.attach(context) if self.blocker else None
+            page = await context.new_page()
+        except Exception:
+            await context.close()
+            raise
+        return PooledPage(context, page, route_stats)
+
+    def _available(self) -> bool:
+        return bool(self._idle) or self._created < self.size or self._closed
+
+    async def acquire(self) -> PooledPage:
+        """借出一个页面（池满时等待）"""
+        stale: Optional[PooledPage] = None
+
+        async with self._cond:
+            if not self._available():
+                self.waiting += 1
+                self.total_waits += 1
+                try:
+                    await self._cond.wait_for(self._available)
+                finally:
+                    self.waiting -= 1
+
+            if self._closed:
+                raise RuntimeError("Page pool is closed")
+
+            item: Optional[PooledPage] = None
+            if self._idle:
+                item = self._idle.pop()
+                if not item.healthy:
+                    # 空闲期间崩溃的页面直接替换，名额不变
+                    stale, item = item, None
+                    self.total_recycled += 1
+            else:
+                self._created += 1
+            self.checked_out += 1
+
+        if stale:
+            await stale.close()
+
+        if item is None:
+            try:
+                item = await self._create()
+            except Exception:
+                async with self._cond:
+                    self._created -= 1
+                    self.checked_out -= 1
+                    self._cond.notify()
+                raise
+
+        item.uses += 1
+        if item.route_stats:
+            item.route_stats.reset()
+        self.total_acquired += 1
+        return item
+
+    async def release(self, item: PooledPage, discard: bool = False):
+        """归还页面；崩溃、用满次数或要求丢弃时回收"""
+        recycle = discard or self._closed or not item.healthy or item.uses >= self.max_uses
+        if recycle:
+            await item.close()
+
+        async with self._cond:
+            self.checked_out -= 1
+            if recycle:
+                self._created -= 1
+                self.total_recycled += 1
+            else:
+                self._idle.append(item)
+            self._cond.notify()
+
+    @asynccontextmanager
+    async def lease(self):
+        """借出页面的上下文管理器（产出 PooledPage），异常退出时丢弃该页面"""
+        item = await self.acquire()
+        discard = False
+        try:
+            yield item
+        except BaseException:
+            discard = True
+            raise
+        finally:
+            await self.release(item, discard=discard)
+
+    async def prewarm(self, count: int):
+        """预先创建页面放入空闲列表（总数不超过 count 和池大小）"""
+        count = min(count, self.size)
+        while True:
+            async with self._cond:
+                if self._closed or self._created >= count:
+                    return
+                self._created += 1
+
+            try:
+                item = await self._create()
+            except Exception:
+                async with self._cond:
+                    self._created -= 1
+                    self._cond.notify()
+                raise
+
+            async with self._cond:
+                self._idle.append(item)
+                self._cond.notify()
+
+    async def close(self):
+        """关闭池中所有空闲页面，借出中的页面在归还时关闭"""
+        async with self._cond:
+            self._closed = True
+            idle, self._idle = self._idle, []
+            self._created -= len(idle)
+            self._cond.notify_all()
+
+        for item in idle:
+            await item.close()
+
+    def stats(self) -> dict:
+        """页面池统计信息"""
+        return {
+            "size": self.size,
+            "created": self._created,
+            "idle": len(self._idle),
+            "in_use": self.checked_out,
+            "waiting": self.waiting,
+            "total_acquired": self.total_acquired,
+            "total_recycled": self.total_recycled,
+            "total_waits": self.total_waits,
+        }
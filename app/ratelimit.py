@@ -0,0 +1,127 @@
+"""限流模块"""
+import asyncio
+import time
+
+
+class TokenBucket:
+    """
+    异步令牌桶
+
+    以 rate 个/秒的速度补充令牌，最多积累 capacity 个；
+    acquire 取不到令牌时等待，等待者按到达顺序获得令牌。
+    """
+
+    def __init__(self, rate: float, capacity: float):
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._lock = asyncio.Lock()
+
+        # 统计
+        self.total_acquired = 0
+        self.total_wait = 0.0
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate)
+        self._updated_at = now
+
+    async def acquire(self):
+        """获取一个令牌"""
+        started = time.monotonic()
+        async with self._lock:
+            self._refill()
+            while self._tokens < 1:
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+                self._refill()
+            self._tokens -= 1
+
+        self.total_acquired += 1
+        self.total_wait += time.monotonic() - started
+
+    def stats(self) -> dict:
+        """限流统计信息"""
+        return {
+            "backend": "local",
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "total_acquired": self.total_acquired,
+            "total_wait_ms": round(self.total_wait * 1000, 1),
+        }
+
+
+# 原子地补充令牌并预留一个：令牌不足时余额记为负数，返回调用方需要等待的秒数（按预留顺序排队）
+_REDIS_ACQUIRE_SCRIPT = """
+local now_parts = redis.call('TIME')
+local now = tonumber(now_parts[1]) + tonumber(now_parts[2]) / 1000000
+local rate = tonumber(ARGV[1])
+local capacity = tonumber(ARGV[2])
+local state = redis.call('HMGET', KEYS[1], 'tokens', 'updated_at')
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now
+tokens = math.min(capacity, tokens + math.max(0, now - updated_at) * rate) - 1
+redis.call('HSET', KEYS[1], 'tokens', tostring(tokens), 'updated_at', tostring(now))
+redis.call('EXPIRE', KEYS[1], math.ceil((capacity - tokens) / rate) + 60)
+if tokens >= 0 then
+    return '0'
+end
+return tostring(-tokens / rate)
+"""
+
+
+class RedisTokenBucket:
+    """
+    Redis 共享令牌桶
+
+    多个进程（可在不同机器上）以同一个键共享速率上限，时间取 Redis 服务器时间；
+    Redis 不可用时退回进程内的 fallback 令牌桶。
+    """
+
+    def __init__(self, client, key: str, rate: float, capacity: float, fallback: TokenBucket):
+        if rate <= 0:
+            raise ValueError("Token bucket rate must be positive")
+        self.rate = rate
+        self.capacity = max(1.0, capacity)
+        self.key = key
+        self.fallback = fallback
+        self._client = client
+        self._script = client.register_script(_REDIS_ACQUIRE_SCRIPT)
+
+        # 统计
+        self.total_acquired = 0
+        self.total_wait = 0.0
+        self.redis_errors = 0
+
+    async def acquire(self):
+        """获取一个令牌"""
+        started = time.monotonic()
+        try:
+            wait = float(await self._script(keys=[self.key], args=[self.rate, self.capacity]))
+        except Exception as e:
+            self.redis_errors += 1
+            print(f"Redis rate limiter unavailable, using local limiter: {e}")
+            await self.fallback.acquire()
+        else:
+            if wait > 0:
+                await asyncio.sleep(wait)
+
+        self.total_acquired += 1
+        self.total_wait += time.monotonic() - started
+
+    async def close(self):
+        await self._client.aclose()
+
+    def stats(self) -> dict:
+        """限流统计信息"""
+        return {
+            "backend": "redis",
+            "key": self.key,
+            "rate": self.rate,
+            "capacity": self.capacity,
+            "total_acquired": self.total_acquired,
+            "total_wait_ms": round(self.total_wait * 1000, 1),
+            "redis_errors": self.redis_errors,
+        }
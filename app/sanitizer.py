@@ -0,0 +1,383 @@
+"""
+正文 HTML 规范化模块
+
+按配置（CONTENT_HTML_PROFILE）精简 content_html：
+- raw：原样返回（str(content_div)）
+- clean：标签和属性白名单，只保留少量排版样式（对齐、颜色、粗细等），展开无属性的包装元素
+- minimal：只保留语义标签和必要属性（链接、图片、表格合并），不保留任何样式
+
+两种精简配置都会移除隐藏元素、空节点和注释，把图片的 data-src 转为 src，并合并连续空白。
+"""
+import html
+import re
+import time
+from typing import Dict, FrozenSet, List, Tuple
+from bs4 import NavigableString, Tag
+from app.metrics import observe_stage
+
+
+PROFILES = ("raw", "clean", "minimal")
+
+# 不属于正文的元素，连同内容一起移除
+DROPPED_TAGS = frozenset({
+    'script', 'style', 'iframe', 'noscript', 'svg', 'canvas', 'template', 'object', 'embed',
+    'video', 'audio', 'form', 'input', 'button', 'select', 'textarea', 'link', 'meta',
+    'mpvoice', 'mpvideo', 'mp-style-type', 'mp-common-profile', 'mp-common-videosnap', 'qqmusic',
+})
+
+# 块级包装元素：有保留属性时输出为 div，只含文字和行内元素时输出为 p，
+# 含块级子元素时展开（其中连续的行内子节点合并为一个 p，保留段落边界）
+_BLOCK_WRAPPERS = frozenset({'section', 'div', 'article', 'header', 'footer', 'center', 'main', 'aside'})
+
+# 行内包装元素：有保留属性时输出为 span，否则展开
+_INLINE_WRAPPERS = frozenset({'span', 'font', 'label'})
+
+# 判断包装元素是否含块级子元素（含有时不能转为 p）
+_BLOCK_TAGS = frozenset({
+    'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'table', 'blockquote', 'pre', 'figure', 'hr',
+}) | _BLOCK_WRAPPERS
+
+# 只含空白的文本节点在这些元素中直接丢弃（不影响排版）
+_STRUCTURAL_TAGS = frozenset({
+    'ul', 'ol', 'table', 'thead', 'tbody', 'tfoot', 'tr', 'figure', 'blockquote',
+}) | _BLOCK_WRAPPERS
+
+_VOID_TAGS = frozenset({'br', 'hr', 'img'})
+
+# 内容只能是行内元素的输出标签（其中的块级包装元素和 p 展开，不再输出 p）
+_INLINE_CONTEXT_TAGS = frozenset({
+    'p', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'pre', 'span', 'a', 'strong', 'b', 'em', 'i', 'u', 's', 'del',
+    'sup', 'sub', 'code',
+})
+
+# 行内上下文中展开的块级元素前后的分隔占位，段落结束时两侧都有可见内容的占位转为 <br>
+_BREAK = object()
+
+_SEMANTIC_TAGS = frozenset({
+    'p', 'br', 'hr', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'strong', 'b', 'em', 'i', 'u', 's', 'del',
+    'sup', 'sub', 'blockquote', 'pre', 'code', 'ul', 'ol', 'li', 'a', 'img',
+    'table', 'thead', 'tbody', 'tfoot', 'tr', 'th', 'td', 'caption', 'figure', 'figcaption',
+})
+
+_CELL_ATTRIBUTES = frozenset({'colspan', 'rowspan'})
+
+_WHITESPACE_RE = re.compile(r'\s+')
+HIDDEN_STYLE_RE = re.compile(r'display\s*:\s*none|visibility\s*:\s*hidden', re.I)
+_SAFE_HREF_RE = re.compile(r'^(https?:|mailto:|/|#)', re.I)
+
+
+class SanitizeProfile:
+    """规范化配置：保留的标签、各标签保留的属性、保留的样式属性"""
+
+    def __init__(self, tags: FrozenSet[str], attributes: Dict[str, FrozenSet[str]], styles: FrozenSet[str]):
+        self.tags = tags
+        self.attributes = attributes
+        self.styles = styles
+
+
+_PROFILE_CONFIGS = {
+    "clean": SanitizeProfile(
+        tags=_SEMANTIC_TAGS | {'div', 'span'},
+        attributes={'a': frozenset({'href', 'title'}), 'img': frozenset({'src', 'alt'}),
+                    'td': _CELL_ATTRIBUTES, 'th': _CELL_ATTRIBUTES},
+        styles=frozenset({'text-align', 'color', 'background-color', 'font-weight', 'font-style', 'text-decoration'}),
+    ),
+    "minimal": SanitizeProfile(
+        tags=_SEMANTIC_TAGS,
+        attributes={'a': frozenset({'href'}), 'img': frozenset({'src', 'alt'}),
+                    'td': _CELL_ATTRIBUTES, 'th': _CELL_ATTRIBUTES},
+        styles=frozenset(),
+    ),
+}
+
+# 各配置的运行统计（单进程内）
+_sanitize_stats: Dict[str, Dict[str, float]] = {}
+
+# 每隔多少次规范化序列化一次原始 HTML 统计输入大小（完整序列化的开销高于规范化本身）
+_INPUT_SAMPLE_EVERY = 10
+
+
+def _filter_style(style: str, allowed: FrozenSet[str]) -> str:
+    kept = []
+    for declaration in style.split(';'):
+        name, _, value = declaration.partition(':')
+        name = name.strip().lower()
+        value = value.strip()
+        if name in allowed and value and 'url(' not in value.lower() and 'expression' not in value.lower():
+            kept.append(f"{name}: {value}")
+    return '; '.join(kept)
+
+
+def _attributes(tag: Tag, name: str, profile: SanitizeProfile) -> List[Tuple[str, str]]:
+    """按白名单过滤属性，返回 [(属性名, 属性值)]"""
+    attrs = []
+    if name == 'img':
+        # 微信图片地址在 data-src 中，src 通常是占位图
+        src = tag.get('data-src') or tag.get('src') or ''
+        if src and not src.startswith('data:'):
+            attrs.append(('src', src))
+        alt = tag.get('alt')
+        if alt:
+            attrs.append(('alt', alt))
+        return attrs
+
+    for attr in profile.attributes.get(name, ()):
+        value = tag.get(attr)
+        if value is None:
+            continue
+        if isinstance(value, list):
+            value = ' '.join(value)
+        if attr == 'href' and not _SAFE_HREF_RE.match(value.strip()):
+            continue
+        attrs.append((attr, value))
+
+    if profile.styles:
+        style = _filter_style(tag.get('style') or '', profile.styles)
+        if style:
+            attrs.append(('style', style))
+    return attrs
+
+
+def _open_tag(name: str, attrs: List[Tuple[str, str]]) -> str:
+    if not attrs:
+        return f"<{name}>"
+    rendered = ''.join(f' {key}="{html.escape(value, quote=True)}"' for key, value in attrs)
+    return f"<{name}{rendered}>"
+
+
+def _has_block_child(tag: Tag) -> bool:
+    return any(isinstance(child, Tag) and child.name in _BLOCK_TAGS for child in tag.contents)
+
+
+def _is_visible_part(part) -> bool:
+    return part is not _BREAK and (part.startswith('<img') or (not part.startswith('<') and bool(part.strip())))
+
+
+def _resolve_breaks(parts: List[str], start: int):
+    """把 parts[start:] 中的分隔占位转为 <br>（只保留与前后可见内容之间都没有 <br> 的位置）"""
+    resolved = []
+    seen_content = False
+    pending = False
+    for part in parts[start:]:
+        if part is _BREAK:
+            pending = pending or seen_content
+            continue
+        if part == '<br>':
+            pending = False
+            seen_content = False
+        elif _is_visible_part(part):
+            if pending:
+                resolved.append('<br>')
+                pending = False
+            seen_content = True
+        resolved.append(part)
+    parts[start:] = resolved
+
+
+def _render_blocks(tag: Tag, profile: SanitizeProfile, parts: List[str]) -> bool:
+    """
+    输出含块级子元素的容器的子节点，返回是否包含可见内容
+
+    块级子元素之间连续的行内子节点（文字、span、strong、img 等）合并为一个 <p>，
+    避免展开包装元素后相邻段落的文字连在一起。
+    """
+    has_content = False
+    run_start = -1
+    run_content = False
+
+    def close_run():
+        nonlocal has_content, run_start, run_content
+        if run_start < 0:
+            return
+        if run_content:
+            parts[run_start] = '<p>'
+            _resolve_breaks(parts, run_start + 1)
+            parts.append('</p>')
+            has_content = True
+        else:
+            del parts[run_start:]
+        run_start = -1
+        run_content = False
+
+    for child in tag.contents:
+        if isinstance(child, Tag) and child.name in _BLOCK_TAGS:
+            close_run()
+            has_content = _render(child, profile, parts, False) or has_content
+            continue
+        if isinstance(child, Tag):
+            if run_start < 0:
+                run_start = len(parts)
+                parts.append('')  # 段落开始标签的占位
+            run_content = _render(child, profile, parts, False, True) or run_content
+        elif type(child) is NavigableString:
+            text = _WHITESPACE_RE.sub(' ', str(child))
+            if run_start < 0:
+                if text == ' ':
+                    continue
+                run_start = len(parts)
+                parts.append('')
+            if text.strip():
+                run_content = True
+            parts.append(html.escape(text, quote=False))
+    close_run()
+    return has_content
+
+
+def _render_children(
+    tag: Tag, profile: SanitizeProfile, parts: List[str], preformatted: bool, inline: bool = False
+) -> bool:
+    """输出子节点，返回是否包含可见内容（非空白文字或图片）"""
+    has_content = False
+    structural = tag.name in _STRUCTURAL_TAGS and not inline
+    for child in tag.contents:
+        if isinstance(child, Tag):
+            has_content = _render(child, profile, parts, preformatted, inline) or has_content
+        elif type(child) is NavigableString:
+            text = str(child)
+            if not preformatted:
+                text = _WHITESPACE_RE.sub(' ', text)
+                if text == ' ' and structural:
+                    continue
+            if text.strip():
+                has_content = True
+            parts.append(html.escape(text, quote=False))
+        # 注释、CDATA、处理指令等直接丢弃
+    return has_content
+
+
+def _render(
+    tag: Tag, profile: SanitizeProfile, parts: List[str], preformatted: bool, inline: bool = False
+) -> bool:
+    """
+    输出一个元素，返回是否包含可见内容；没有可见内容的元素不输出
+
+    inline 表示已在段落或行内元素中：块级包装元素和 p 不再输出为段落（避免 <p> 嵌套），
+    只输出子节点，与前后内容之间以 <br> 分隔。
+    """
+    name = tag.name
+    if name in DROPPED_TAGS or HIDDEN_STYLE_RE.search(tag.get('style') or ''):
+        return False
+
+    if inline and (name in _BLOCK_WRAPPERS or name == 'p'):
+        parts.append(_BREAK)
+        has_content = _render_children(tag, profile, parts, preformatted, True)
+        parts.append(_BREAK)
+        return has_content
+
+    if name in _VOID_TAGS:
+        if name == 'img':
+            attrs = _attributes(tag, name, profile)
+            if not any(key == 'src' for key, _ in attrs):
+                return False
+            parts.append(_open_tag(name, attrs))
+            return True
+        parts.append(f"<{name}>")
+        return name == 'hr'
+
+    # 决定输出的标签名（None 表示展开，只输出子节点）
+    attrs: List[Tuple[str, str]] = []
+    if name in _BLOCK_WRAPPERS:
+        attrs = _attributes(tag, 'div', profile) if 'div' in profile.tags else []
+        if not preformatted and _has_block_child(tag):
+            if not attrs:
+                return _render_blocks(tag, profile, parts)
+            start = len(parts)
+            parts.append(_open_tag('div', attrs))
+            if not _render_blocks(tag, profile, parts):
+                del parts[start:]
+                return False
+            parts.append('</div>')
+            return True
+        # 只含文字和行内元素：输出为段落（保留段落边界）
+        output = 'div' if attrs else 'p'
+    elif name in _INLINE_WRAPPERS:
+        attrs = _attributes(tag, 'span', profile) if 'span' in profile.tags else []
+        output = 'span' if attrs else None
+    elif name in profile.tags:
+        output = name
+        attrs = _attributes(tag, name, profile)
+        if name == 'a' and not any(key == 'href' for key, _ in attrs):
+            output = None
+    else:
+        output = None
+
+    if output is None:
+        return _render_children(tag, profile, parts, preformatted, inline)
+
+    # 只含行内内容的包装元素（输出为 p 或 div）和段落、行内标签中，后代的块级元素按行内输出
+    child_inline = inline or name in _BLOCK_WRAPPERS or output in _INLINE_CONTEXT_TAGS
+    start = len(parts)
+    parts.append(_open_tag(output, attrs))
+    has_content = _render_children(tag, profile, parts, preformatted or output == 'pre', child_inline)
+    if not has_content:
+        # 空节点（包括只含 <br> 的段落）整体丢弃
+        del parts[start:]
+        return False
+    if child_inline and not inline:
+        _resolve_breaks(parts, start + 1)
+    parts.append(f"</{output}>")
+    return True
+
+
+def sanitize_html(content_div: Tag, profile: str) -> str:
+    """
+    按配置输出规范化后的正文 HTML
+
+    Args:
+        content_div: 正文容器元素（已移除 script / style / iframe）
+        profile: raw / clean / minimal
+
+    Returns:
+        正文 HTML；clean / minimal 以不带样式的 <div id="js_content"> 包裹
+    """
+    if profile not in PROFILES:
+        raise ValueError(f"Unknown CONTENT_HTML_PROFILE: {profile}. Expected one of {', '.join(PROFILES)}.")
+
+    stats = _sanitize_stats.setdefault(profile, {
+        "runs": 0, "output_chars": 0, "seconds": 0.0,
+        "sampled_runs": 0, "sampled_input_chars": 0, "sampled_output_chars": 0,
+    })
+
+    started = time.perf_counter()
+    if profile == "raw":
+        result = str(content_div)
+    else:
+        parts: List[str] = ['<div id="js_content">']
+        _render_blocks(content_div, _PROFILE_CONFIGS[profile], parts)
+        parts.append('</div>')
+        result = ''.join(parts)
+    elapsed = time.perf_counter() - started
+
+    stats["runs"] += 1
+    stats["output_chars"] += len(result)
+    stats["seconds"] += elapsed
+    observe_stage("sanitize", elapsed)
+
+    # 抽样统计输入大小和压缩比例（在计时之外序列化原始 HTML）
+    if (stats["runs"] - 1) % _INPUT_SAMPLE_EVERY == 0:
+        stats["sampled_runs"] += 1
+        stats["sampled_input_chars"] += len(result) if profile == "raw" else len(str(content_div))
+        stats["sampled_output_chars"] += len(result)
+    return result
+
+
+def get_sanitizer_stats() -> Dict[str, dict]:
+    """
+    规范化统计（按配置）
+
+    runs / output_chars / avg_ms 覆盖全部调用；输入大小每 _INPUT_SAMPLE_EVERY 次抽样一次，
+    reduction 为抽样调用中输出比输入减少的比例。
+    """
+    result = {}
+    for profile, stats in _sanitize_stats.items():
+        sampled_input = stats["sampled_input_chars"]
+        result[profile] = {
+            "runs": int(stats["runs"]),
+            "output_chars": int(stats["output_chars"]),
+            "avg_ms": round(stats["seconds"] / stats["runs"] * 1000, 2) if stats["runs"] else 0.0,
+            "sampled_runs": int(stats["sampled_runs"]),
+            "sampled_input_chars": int(sampled_input),
+            "sampled_output_chars": int(stats["sampled_output_chars"]),
+            "reduction": round(1 - stats["sampled_output_chars"] / sampled_input, 3) if sampled_input else None,
+        }
+    return result
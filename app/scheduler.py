@@ -0,0 +1,164 @@
+"""请求准入调度模块"""
+import asyncio
+import math
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Deque, Optional
+from app.config import settings
+from app.metrics import TIMEOUTS, observe_stage
+
+
+class AdmissionError(Exception):
+    """请求未被准入（调用方应返回 503 并带上 Retry-After）"""
+
+    def __init__(self, message: str, retry_after: int):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+class QueueFullError(AdmissionError):
+    """等待队列已满"""
+
+
+class QueueTimeoutError(AdmissionError):
+    """排队等待超时"""
+
+
+class AdmissionScheduler:
+    """
+    抓取请求准入调度器
+
+    同时执行的请求数不超过 max_concurrency，超出的请求进入 FIFO 等待队列；
+    队列满时立即拒绝，排队超过 max_wait 秒时超时拒绝。
+    """
+
+    # 平均耗时的指数滑动系数
+    EWMA_ALPHA = 0.2
+
+    def __init__(
+        self,
+        max_concurrency: Optional[int] = None,
+        max_queue: Optional[int] = None,
+        max_wait: Optional[float] = None
+    ):
+        self.max_concurrency = max(1, max_concurrency or settings.MAX_CONCURRENCY)
+        self.max_queue = max(0, max_queue if max_queue is not None else settings.MAX_QUEUE_SIZE)
+        self.max_wait = max_wait if max_wait is not None else settings.MAX_QUEUE_WAIT
+
+        self._active = 0
+        self._waiters: Deque[asyncio.Future] = deque()
+
+        # 统计
+        self.total_admitted = 0
+        self.total_rejected = 0
+        self.total_timed_out = 0
+        self.last_wait = 0.0
+        self.avg_wait = 0.0
+        self.max_wait_seen = 0.0
+        self.avg_service_time = 0.0
+
+    @property
+    def queue_depth(self) -> int:
+        """当前排队中的请求数"""
+        return sum(1 for fut in self._waiters if not fut.done())
+
+    def _retry_after(self) -> int:
+        """根据平均处理耗时估算客户端重试等待秒数"""
+        service_time = self.avg_service_time or 1.0
+        rounds = (self.queue_depth + 1) / self.max_concurrency
+        return max(1, math.ceil(service_time * rounds))
+
+    def _record_wait(self, waited: float):
+        observe_stage("queue_wait", waited)
+        self.last_wait = waited
+        self.max_wait_seen = max(self.max_wait_seen, waited)
+        self.avg_wait += self.EWMA_ALPHA * (waited - self.avg_wait)
+
+    async def acquire(self):
+        """获取执行名额（必要时排队等待）"""
+        start = time.monotonic()
+
+        if self._active < self.max_concurrency and not self.queue_depth:
+            self._active += 1
+            self.total_admitted += 1
+            self._record_wait(0.0)
+            return
+
+        if self.queue_depth >= self.max_queue:
+            self.total_rejected += 1
+            raise QueueFullError("Server is busy, request queue is full", self._retry_after())
+
+        fut = asyncio.get_running_loop().create_future()
+        self._waiters.append(fut)
+        try:
+            # asyncio.timeout 需要 Python 3.11，部署镜像为 3.10；wait_for 超时会取消 fut
+            await asyncio.wait_for(fut, self.max_wait)
+        except asyncio.TimeoutError:
+            if fut.done() and not fut.cancelled():
+                self.release()
+            self.total_timed_out += 1
+            TIMEOUTS.labels("queue").inc()
+            raise QueueTimeoutError(
+                f"Request waited more than {self.max_wait}s in queue",
+                self._retry_after()
+            )
+        except asyncio.CancelledError:
+            # 名额已移交给本请求但调用方取消了，需要把名额继续传下去
+            if fut.done() and not fut.cancelled():
+                self.release()
+            raise
+        finally:
+            if fut in self._waiters and fut.done():
+                self._waiters.remove(fut)
+
+        self.total_admitted += 1
+        self._record_wait(time.monotonic() - start)
+
+    def release(self):
+        """释放执行名额（优先直接移交给队首等待者）"""
+        while self._waiters:
+            fut = self._waiters.popleft()
+            if not fut.done():
+                fut.set_result(None)
+                return
+        self._active -= 1
+
+    @asynccontextmanager
+    async def slot(self):
+        """执行名额的上下文管理器"""
+        await self.acquire()
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self.avg_service_time += self.EWMA_ALPHA * (time.monotonic() - start - self.avg_service_time)
+            self.release()
+
+    def stats(self) -> dict:
+        """调度器统计信息（可用于自动扩缩容）"""
+        return {
+            "max_concurrency": self.max_concurrency,
+            "active": self._active,
+            "queue_depth": self.queue_depth,
+            "max_queue": self.max_queue,
+            "total_admitted": self.total_admitted,
+            "total_rejected": self.total_rejected,
+            "total_timed_out": self.total_timed_out,
+            "last_wait_ms": round(self.last_wait * 1000, 1),
+            "avg_wait_ms": round(self.avg_wait * 1000, 1),
+            "max_wait_ms": round(self.max_wait_seen * 1000, 1),
+            "avg_service_time_ms": round(self.avg_service_time * 1000, 1),
+        }
+
+
+# 全局调度器实例（单例模式）
+_scheduler_instance: Optional[AdmissionScheduler] = None
+
+
+def get_scheduler() -> AdmissionScheduler:
+    """获取调度器实例（单例）"""
+    global _scheduler_instance
+    if _scheduler_instance is None:
+        _scheduler_instance = AdmissionScheduler()
+    return _scheduler_instance
@@ -0,0 +1,558 @@
+"""文章解析服务（串联缓存、请求合并、准入调度、抓取与解析）"""
+import asyncio
+import time
+from datetime import datetime, timezone
+from typing import AsyncIterator, Callable, Collection, List, Optional, Tuple
+from app.article_store import ArticleStore, get_article_store, html_sha256
+from app.cache import STATS_FIELDS, ArticleCache, get_article_cache
+from app.config import settings
+from app.crawler import get_crawler
+from app.executors import run_in_parse_executor
+from app.http_fetcher import get_http_fetcher
+from app.job_queue import get_job_queue
+from app.metrics import CACHE_RESULTS, stage_timer
+from app.parser import BODY_FIELDS, CONTENT_FIELDS, PARSER_VERSION, ArticleParser
+from app.scheduler import get_scheduler, AdmissionError
+from app.singleflight import SingleFlight
+from app.utils import async_random_delay, validate_wechat_url, clean_article_url, upstream_url
+
+
+class FetchError(Exception):
+    """文章抓取失败"""
+
+
+def _utc_now() -> str:
+    """当前 UTC 时间（ISO 8601，Z 结尾）"""
+    return datetime.now(timezone.utc).replace(tzinfo=None).isoformat() + "Z"
+
+
+# 以清理后的 URL 为键合并并发的抓取与解析
+_article_flight = SingleFlight()
+
+# 抓取方式统计
+_fetch_stats = {
+    "http_complete": 0,
+    "http_incomplete": 0,
+    "browser": 0,
+    "html_unchanged": 0,
+}
+
+
+async def parse_article_url(
+    url: str,
+    cache_mode: str = "default",
+    fetch_mode: Optional[str] = None,
+    on_partial: Optional[Callable[[dict], None]] = None,
+    fields: Optional[Collection[str]] = None,
+    on_image: Optional[Callable[[int, int, str, Optional[str]], None]] = None,
+    output_format: str = "html",
+    on_metadata: Optional[Callable[[dict], None]] = None
+) -> Tuple[dict, str]:
+    """
+    获取文章解析结果
+
+    Args:
+        url: 清理后的文章 URL
+        cache_mode: 缓存策略（default / bypass / refresh）
+        fetch_mode: 抓取方式（auto / http / browser），默认 FETCH_MODE
+        on_partial: 需要 OCR 时在 OCR 开始前以不含 OCR 文本的文章字段调用
+            （仅本请求实际执行抓取时调用；合并到其他请求或 queue 模式下不调用）
+        fields: 调用方需要的字段，None 表示全部；缺少某个正文字段（正文格式字段或 content_text）时
+            缓存未命中的解析跳过该字段的计算（不需要 content_text 时也跳过 OCR），结果不写入缓存和文章库
+        on_image: 每张图片 OCR 完成时调用（见 ArticleParser.parse_async，调用条件同 on_partial）
+        output_format: 正文格式（html / markdown / blocks），非 html 格式以 BODY_FIELDS 中的字段代替 content_html，
+            按格式分别缓存；文章库只保存 html 格式，其他格式由保存的 HTML 生成
+        on_metadata: 解析出标题等元数据、构建正文之前调用（见 ArticleParser.parse_async，调用条件同 on_partial）
+
+    Returns:
+        (文章数据, 缓存状态)，缓存状态为 HIT、STATS-REFRESH、MISS 或 BYPASS
+    """
+    article_cache = get_article_cache() if cache_mode != "bypass" else None
+    variant = None if output_format == "html" else output_format
+
+    # 读取缓存：正文和统计字段都有效时直接返回
+    cached_content = None
+    if article_cache and cache_mode == "default":
+        cached_content, cached_stats = await article_cache.get(url, variant)
+        if cached_content and cached_stats:
+            CACHE_RESULTS.labels("HIT").inc()
+            return {**cached_content, **cached_stats}, "HIT"
+
+    # 缓存未命中时读取文章库：正文仍有效时不再抓取正文，统计字段过期时只刷新统计字段
+    if cached_content is None and cache_mode == "default":
+        stored_content, stored_stats = await _load_from_store(url, output_format)
+        if stored_content:
+            if article_cache:
+                await article_cache.set_content(url, stored_content, variant)
+            if stored_stats:
+                if article_cache:
+                    await article_cache.set_stats(url, stored_stats["read_count"], stored_stats["like_count"])
+                CACHE_RESULTS.labels("HIT").inc()
+                return {**stored_content, **stored_stats}, "HIT"
+            cached_content = stored_content
+
+    # 只计算需要的正文字段（None 表示完整解析）
+    body_fields = (BODY_FIELDS[output_format], "content_text")
+    content_fields = None
+    if fields is not None and not set(body_fields) <= set(fields):
+        content_fields = [name for name in body_fields if name in fields]
+
+    # 同一 URL 且执行方式相同（只刷新统计 / 完整抓取、是否写缓存、抓取方式、正文格式和字段）的并发请求只抓取一次：
+    # refresh / bypass 请求不会合并到只刷新统计字段的任务上拿到旧正文，bypass 任务不写缓存也不会被写缓存的请求等待
+    fetch_mode = fetch_mode or settings.FETCH_MODE
+    flight_key = _flight_key(url, cached_content is not None, article_cache is not None, fetch_mode, variant, content_fields)
+    article_data, cache_status = await _article_flight.do(
+        flight_key,
+        lambda: _fetch_and_parse(
+            url, cached_content, article_cache, fetch_mode, on_partial, content_fields, on_image, output_format,
+            on_metadata
+        )
+    )
+
+    if cache_mode == "bypass":
+        cache_status = "BYPASS"
+    CACHE_RESULTS.labels(cache_status).inc()
+    return dict(article_data), cache_status
+
+
+def _flight_key(
+    url: str,
+    stats_only: bool,
+    writes_cache: bool,
+    fetch_mode: str,
+    variant: Optional[str],
+    content_fields: Optional[List[str]]
+) -> str:
+    """请求合并键：只有执行方式完全相同的请求才共享同一次抓取与解析"""
+    key = f"{url}#{'stats' if stats_only else 'full'}#{'cache' if writes_cache else 'nocache'}#fetch={fetch_mode}"
+    if variant is not None:
+        key += f"#format={variant}"
+    if content_fields is not None:
+        key += f"#fields={','.join(content_fields)}"
+    return key
+
+
+async def _load_from_store(url: str, output_format: str = "html") -> Tuple[Optional[dict], Optional[dict]]:
+    """
+    从文章库读取文章
+
+    Returns:
+        (正文字段, 统计字段)：正文超过 ARTICLE_STORE_CONTENT_TTL 时均为 None；
+        统计字段超过 CACHE_STATS_TTL 时为 None。解析器版本过旧的记录先用保存的 HTML 重新解析，
+        非 html 格式的正文由保存的 HTML 生成。
+    """
+    store = get_article_store()
+    if store is None:
+        return None, None
+
+    try:
+        record = await store.aget(url)
+        if record is None or time.time() - record["fetched_at"] > settings.ARTICLE_STORE_CONTENT_TTL:
+            return None, None
+        if record["parser_version"] < PARSER_VERSION:
+            article = await reparse_stored_article(store, record)
+        else:
+            article = record["article"]
+        if output_format != "html":
+            article = await _format_stored_article(record["html"], article, output_format)
+    except Exception as e:
+        print(f"Error reading article store for {url}: {e}")
+        return None, None
+
+    content = {k: v for k, v in article.items() if k not in STATS_FIELDS}
+    if time.time() - record["stats_updated_at"] > settings.CACHE_STATS_TTL:
+        return content, None
+    return content, {k: article.get(k) for k in STATS_FIELDS}
+
+
+async def reparse_stored_article(store: ArticleStore, record: dict) -> dict:
+    """
+    用文章库中保存的 HTML 重新解析文章（不重新抓取），保留记录中的统计字段
+
+    只重新解析 HTML，不调用 OCR 也不探测图片：图片文章沿用保存的 content_text（含 OCR 文本）。
+    """
+    url = record["url"]
+    with stage_timer("reparse"):
+        article, images = await run_in_parse_executor(ArticleParser.parse_html, record["html"], url)
+    if ArticleParser.is_image_article(article["content_text"], images):
+        article["content_text"] = record["article"].get("content_text", article["content_text"])
+    article["parsed_at"] = _utc_now()
+    article.update({k: record["article"].get(k) for k in STATS_FIELDS})
+    await store.aupdate_article(url, article, PARSER_VERSION)
+    return article
+
+
+async def _format_stored_article(html: str, article: dict, output_format: str) -> dict:
+    """用文章库中保存的 HTML 生成其他格式的正文（只生成正文字段，沿用保存的 content_text，不重新 OCR）"""
+    body_field = BODY_FIELDS[output_format]
+    with stage_timer("parse"):
+        parsed, _ = await run_in_parse_executor(ArticleParser.parse_html, html, article["url"], [body_field], output_format)
+    formatted = {k: v for k, v in article.items() if k != "content_html"}
+    formatted[body_field] = parsed[body_field]
+    return formatted
+
+
+async def _save_to_store(url: str, article: dict, html: str):
+    store = get_article_store()
+    if store is None:
+        return
+    try:
+        await store.aput(url, article, html, PARSER_VERSION)
+    except Exception as e:
+        print(f"Error writing article store for {url}: {e}")
+
+
+async def _save_stats_to_store(url: str, read_count: Optional[int], like_count: Optional[int]):
+    store = get_article_store()
+    if store is None:
+        return
+    try:
+        await store.aupdate_stats(url, read_count, like_count)
+    except Exception as e:
+        print(f"Error writing article store stats for {url}: {e}")
+
+
+async def _fetch_html(url: str, fetch_mode: str) -> Optional[str]:
+    """
+    抓取文章 HTML
+
+    auto 模式先用 HTTP 直接抓取，页面不完整时再回退到浏览器渲染；
+    http 模式只用 HTTP；browser 模式只用浏览器。
+    """
+    # 随机延迟（反爬虫）
+    await async_random_delay(settings.MIN_DELAY, settings.MAX_DELAY)
+
+    fetch_url = upstream_url(url, settings.WECHAT_UPSTREAM_BASE)
+
+    if fetch_mode in ("auto", "http"):
+        with stage_timer("http_fetch"):
+            html = await get_http_fetcher().fetch_article(fetch_url)
+        if ArticleParser.is_complete(html):
+            _fetch_stats["http_complete"] += 1
+            return html
+        _fetch_stats["http_incomplete"] += 1
+        if fetch_mode == "http":
+            return html
+
+    _fetch_stats["browser"] += 1
+
+    # 获取执行名额后再使用浏览器（超出并发上限的请求排队或被拒绝）
+    async with get_scheduler().slot():
+        # 获取爬虫实例
+        crawler = await get_crawler()
+
+        # 抓取文章HTML
+        return await crawler.fetch_article(fetch_url)
+
+
+async def _fetch_and_parse(
+    url: str,
+    cached_content: Optional[dict],
+    article_cache: Optional[ArticleCache],
+    fetch_mode: str,
+    on_partial: Optional[Callable[[dict], None]] = None,
+    content_fields: Optional[List[str]] = None,
+    on_image: Optional[Callable[[int, int, str, Optional[str]], None]] = None,
+    output_format: str = "html",
+    on_metadata: Optional[Callable[[dict], None]] = None
+) -> Tuple[dict, str]:
+    """抓取并解析文章（queue 模式下交给工作进程），完整解析的结果写入缓存"""
+    stats_only = bool(cached_content)
+    if settings.EXECUTION_MODE == "queue":
+        with stage_timer("queue_job"):
+            result = await get_job_queue().submit(
+                {"url": url, "fetch_mode": fetch_mode, "stats_only": stats_only, "content_fields": content_fields,
+                 "output_format": output_format},
+                settings.QUEUE_RESULT_TIMEOUT
+            )
+        data = unwrap_job_result(result)
+    else:
+        data = await run_parse_job(
+            url, fetch_mode, stats_only, on_partial, content_fields, on_image, output_format, on_metadata
+        )
+
+    if cached_content:
+        if article_cache:
+            await article_cache.set_stats(url, data["read_count"], data["like_count"])
+        return {**cached_content, **data}, "STATS-REFRESH"
+
+    if article_cache and content_fields is None:
+        await article_cache.set(url, data, None if output_format == "html" else output_format)
+    return data, "MISS"
+
+
+async def run_parse_job(
+    url: str,
+    fetch_mode: str,
+    stats_only: bool = False,
+    on_partial: Optional[Callable[[dict], None]] = None,
+    content_fields: Optional[List[str]] = None,
+    on_image: Optional[Callable[[int, int, str, Optional[str]], None]] = None,
+    output_format: str = "html",
+    on_metadata: Optional[Callable[[dict], None]] = None
+) -> dict:
+    """
+    抓取并解析文章（不读写缓存，API 进程和工作进程共用）
+
+    Args:
+        url: 清理后的文章 URL
+        fetch_mode: 抓取方式（auto / http / browser）
+        stats_only: 只解析阅读量和点赞数（正文缓存仍有效时）
+        on_partial: 需要 OCR 时在 OCR 开始前调用（见 ArticleParser.parse_async）
+        content_fields: 需要计算的正文字段，None 表示完整解析（只有 html 格式的完整解析结果写入文章库）
+        on_image: 每张图片 OCR 完成时调用（见 ArticleParser.parse_async）
+        output_format: 正文格式（html / markdown / blocks）
+        on_metadata: 解析出元数据、构建正文之前调用（见 ArticleParser.parse_async）
+
+    Returns:
+        文章数据；stats_only 时只有 read_count 和 like_count
+    """
+    html = await _fetch_html(url, fetch_mode)
+
+    if not html:
+        raise FetchError("Failed to fetch article content")
+
+    if stats_only:
+        # 正文缓存仍有效，只刷新阅读量和点赞数（跳过正文解析和 OCR）
+        with stage_timer("parse_stats"):
+            read_count, like_count = await run_in_parse_executor(ArticleParser.parse_stats, html)
+        await _save_stats_to_store(url, read_count, like_count)
+        return {"read_count": read_count, "like_count": like_count}
+
+    # 页面与文章库中保存的一致时沿用保存的解析结果（跳过正文解析和 OCR）
+    if content_fields is None:
+        unchanged = await _load_unchanged(url, html, output_format)
+        if unchanged is not None:
+            return unchanged
+
+    # 解析文章内容（解析和 OCR 在执行器中运行，不阻塞事件循环）
+    article_data = await ArticleParser.parse_async(
+        html, url, on_partial, content_fields, on_image, output_format, on_metadata
+    )
+
+    # 添加解析时间
+    article_data["parsed_at"] = _utc_now()
+
+    # 保存解析结果和原始 HTML（解析器升级后可离线重新解析）
+    if content_fields is None and output_format == "html":
+        await _save_to_store(url, article_data, html)
+    return article_data
+
+
+async def _load_unchanged(url: str, html: str, output_format: str) -> Optional[dict]:
+    """
+    重新抓取的 HTML 与文章库中保存的相同（SHA-256 一致）且解析器版本未变时，返回保存的解析结果
+
+    只解析阅读量和点赞数并更新文章库的抓取时间；非 html 格式的正文由保存的 HTML 生成。
+    """
+    store = get_article_store()
+    if store is None:
+        return None
+    try:
+        record = await store.aget_unchanged(url, html_sha256(html))
+        if record is None or record["parser_version"] < PARSER_VERSION:
+            return None
+        with stage_timer("parse_stats"):
+            read_count, like_count = await run_in_parse_executor(ArticleParser.parse_stats, html)
+        article = {**record["article"], "read_count": read_count, "like_count": like_count}
+        if output_format != "html":
+            article = await _format_stored_article(html, article, output_format)
+        await store.amark_refetched(url, read_count, like_count)
+    except Exception as e:
+        print(f"Error checking article store for {url}: {e}")
+        return None
+    _fetch_stats["html_unchanged"] += 1
+    return article
+
+
+def job_result(job_id: str, data: Optional[dict] = None, error: Optional[Exception] = None) -> dict:
+    """构造任务结果（可 JSON 序列化，经队列返回 API 进程）"""
+    if error is None:
+        return {"job_id": job_id, "ok": True, "data": data}
+    return {
+        "job_id": job_id,
+        "ok": False,
+        "error": {
+            "type": type(error).__name__,
+            "message": str(error),
+            "retry_after": getattr(error, "retry_after", None),
+        },
+    }
+
+
+def unwrap_job_result(result: dict) -> dict:
+    """取出任务结果中的文章数据，失败时按原异常类型重新抛出（FetchError / AdmissionError）"""
+    if result["ok"]:
+        return result["data"]
+    error = result["error"]
+    if error["type"] == "FetchError":
+        raise FetchError(error["message"])
+    if error.get("retry_after") is not None:
+        raise AdmissionError(error["message"], error["retry_after"])
+    raise RuntimeError(f"{error['type']}: {error['message']}")
+
+
+async def parse_article_batch(
+    urls: List[str],
+    cache_mode: str = "default",
+    concurrency: Optional[int] = None,
+    fetch_mode: Optional[str] = None
+) -> AsyncIterator[dict]:
+    """
+    批量解析文章，按完成顺序逐条产出结果
+
+    无效 URL 立即产出 invalid 结果；有效 URL 按清理后的地址去重，
+    并以不超过 concurrency 的并行度抓取（仍受全局准入调度限制）。
+
+    Args:
+        urls: 文章 URL 列表
+        cache_mode: 缓存策略（default / bypass / refresh）
+        concurrency: 本批次最大并行数，默认 BATCH_CONCURRENCY
+        fetch_mode: 抓取方式（auto / http / browser），默认 FETCH_MODE
+
+    Yields:
+        {"url", "status", "data", "error"}，status 为 ok、invalid 或 error
+    """
+    unique_urls: List[str] = []
+    seen = set()
+    for raw_url in urls:
+        if not validate_wechat_url(raw_url):
+            yield {
+                "url": raw_url,
+                "status": "invalid",
+                "data": None,
+                "error": "Invalid WeChat article URL. URL must be from mp.weixin.qq.com"
+            }
+            continue
+        url = clean_article_url(raw_url)
+        if url not in seen:
+            seen.add(url)
+            unique_urls.append(url)
+
+    semaphore = asyncio.Semaphore(max(1, concurrency or settings.BATCH_CONCURRENCY))
+
+    async def run(url: str) -> dict:
+        async with semaphore:
+            try:
+                article_data, _ = await parse_article_url(url, cache_mode, fetch_mode)
+                return {"url": url, "status": "ok", "data": article_data, "error": None}
+            except (FetchError, AdmissionError) as e:
+                return {"url": url, "status": "error", "data": None, "error": str(e)}
+            except Exception as e:
+                print(f"Error parsing article {url} in batch: {e}")
+                return {"url": url, "status": "error", "data": None, "error": f"Internal server error: {str(e)}"}
+
+    tasks = [asyncio.create_task(run(url)) for url in unique_urls]
+    try:
+        for next_done in asyncio.as_completed(tasks):
+            yield await next_done
+    finally:
+        # 客户端提前断开时取消尚未完成的任务（已在进行中的共享抓取不受影响）
+        for task in tasks:
+            task.cancel()
+
+
+# 流式解析中的元数据字段（HTML 到达即可提取）和正文字段
+STREAM_METADATA_FIELDS = ("title", "author", "publish_time", "cover", "read_count", "like_count", "url")
+
+
+async def stream_article_events(
+    url: str,
+    cache_mode: str = "default",
+    fetch_mode: Optional[str] = None
+) -> AsyncIterator[Tuple[str, dict]]:
+    """
+    流式解析文章，按可用顺序产出事件
+
+    - metadata：标题、作者、发布时间、封面、阅读量、点赞数（同一次解析中先于正文产出）
+    - content：content_html 和 content_text（需要 OCR 时不含 OCR 文本）
+    - ocr_image：每张图片识别完成时产出（index、total、image_url、text），按完成顺序
+    - done：最终的 content_text（含 OCR 文本）、parsed_at 和缓存状态
+    - error：抓取或解析失败（status、detail），之后不再产出事件
+
+    缓存命中或合并到其他请求时没有 ocr_image 事件，metadata 和 content 随最终结果一起产出。
+
+    Args:
+        url: 清理后的文章 URL
+        cache_mode: 缓存策略（default / bypass / refresh）
+        fetch_mode: 抓取方式（auto / http / browser），默认 FETCH_MODE
+
+    Yields:
+        (事件名, 数据)
+    """
+    events: asyncio.Queue = asyncio.Queue()
+
+    def on_metadata(article: dict):
+        events.put_nowait(("metadata", article))
+
+    def on_partial(article: dict):
+        events.put_nowait(("partial", article))
+
+    def on_image(index: int, total: int, image_url: str, text: Optional[str]):
+        events.put_nowait(("ocr_image", {"index": index, "total": total, "image_url": image_url, "text": text}))
+
+    task = asyncio.create_task(
+        parse_article_url(url, cache_mode, fetch_mode, on_partial=on_partial, on_image=on_image, on_metadata=on_metadata)
+    )
+    task.add_done_callback(lambda _: events.put_nowait(("finished", None)))
+
+    def metadata(article: dict) -> Tuple[str, dict]:
+        return "metadata", {name: article.get(name) for name in STREAM_METADATA_FIELDS}
+
+    def content(article: dict) -> Tuple[str, dict]:
+        return "content", {name: article.get(name) for name in CONTENT_FIELDS}
+
+    sent_metadata = False
+    sent_content = False
+    try:
+        while True:
+            name, data = await events.get()
+            if name == "metadata":
+                if not sent_metadata:
+                    sent_metadata = True
+                    yield metadata(data)
+            elif name == "partial":
+                if not sent_metadata:
+                    sent_metadata = True
+                    yield metadata(data)
+                sent_content = True
+                yield content(data)
+            elif name == "ocr_image":
+                yield name, data
+            else:
+                break
+
+        try:
+            article_data, cache_status = task.result()
+        except FetchError as e:
+            yield "error", {"status": 500, "detail": str(e)}
+            return
+        except AdmissionError as e:
+            yield "error", {"status": 503, "detail": str(e), "retry_after": e.retry_after}
+            return
+        except Exception as e:
+            print(f"Error streaming article {url}: {e}")
+            yield "error", {"status": 500, "detail": f"Internal server error: {str(e)}"}
+            return
+
+        if not sent_metadata:
+            yield metadata(article_data)
+        if not sent_content:
+            yield content(article_data)
+        yield "done", {
+            "content_text": article_data.get("content_text"),
+            "parsed_at": article_data.get("parsed_at"),
+            "cache_status": cache_status,
+        }
+    finally:
+        # 客户端提前断开时取消本请求（共享的抓取任务不受影响）
+        task.cancel()
+
+
+def get_service_stats() -> dict:
+    """解析服务统计信息"""
+    return {
+        "singleflight": _article_flight.stats(),
+        "fetch": dict(_fetch_stats),
+        "queue": get_job_queue().stats() if settings.EXECUTION_MODE == "queue" else None
+    }
@@ -0,0 +1,56 @@
+"""请求合并模块（同一个键同时只执行一次）"""
+import asyncio
+from typing import Any, Awaitable, Callable, Dict
+
+
+class SingleFlight:
+    """
+    进行中请求去重
+
+    同一个键的并发调用共享同一个任务：第一个调用者启动任务，其余调用者等待同一结果。
+    调用方被取消（例如客户端断开）时只取消自己的等待，共享任务会继续执行完成。
+    """
+
+    def __init__(self):
+        self._inflight: Dict[str, asyncio.Task] = {}
+
+        # 统计
+        self.leaders = 0
+        self.followers = 0
+
+    async def do(self, key: str, func: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        执行或加入键为 key 的任务
+
+        Args:
+            key: 去重键
+            func: 返回协程的函数，仅在没有进行中的任务时调用
+
+        Returns:
+            任务结果（异常会传播给所有等待者）
+        """
+        task = self._inflight.get(key)
+        if task is None:
+            task = asyncio.ensure_future(func())
+            self._inflight[key] = task
+            task.add_done_callback(lambda t: self._forget(key, t))
+            self.leaders += 1
+        else:
+            self.followers += 1
+
+        return await asyncio.shield(task)
+
+    def _forget(self, key: str, task: asyncio.Task):
+        if self._inflight.get(key) is task:
+            del self._inflight[key]
+        # 所有等待者都已取消时，避免出现 "exception was never retrieved" 警告
+        if not task.cancelled():
+            task.exception()
+
+    def stats(self) -> dict:
+        """请求合并统计信息"""
+        return {
+            "inflight": len(self._inflight),
+            "leaders": self.leaders,
+            "followers": self.followers,
+        }
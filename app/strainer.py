@@ -0,0 +1,108 @@
+"""受限解析模块（只为解析器用到的元素构建 BeautifulSoup 节点）"""
+from typing import Dict, Iterable, Optional, Set
+from bs4 import SoupStrainer
+
+
+class FieldStrainer(SoupStrainer):
+    """
+    按标签名、class、id 和 meta property 选择需要保留的元素
+
+    作为 BeautifulSoup 的 parse_only 使用：lxml 仍然完整扫描文档，
+    但只有命中规则的元素（连同其全部子节点）会被构建为节点，
+    其余元素（页面脚本、样式、推荐阅读等）直接丢弃。
+    命中元素的子树与完整解析时完全一致，因此现有的提取逻辑可以原样复用。
+    """
+
+    def __init__(
+        self,
+        tags: Iterable[str] = (),
+        classes: Optional[Dict[str, Iterable[str]]] = None,
+        ids: Iterable[str] = (),
+        meta_properties: Iterable[str] = (),
+    ):
+        super().__init__()
+        self.keep_tags: Set[str] = set(tags)
+        self.keep_classes: Dict[str, Set[str]] = {name: set(values) for name, values in (classes or {}).items()}
+        self.keep_ids: Set[str] = set(ids)
+        self.keep_meta_properties: Set[str] = set(meta_properties)
+
+    def keep(self, name: str, attrs: Optional[dict]) -> bool:
+        """判断元素是否保留"""
+        if name in self.keep_tags:
+            return True
+
+        attrs = attrs or {}
+        if attrs.get('id') in self.keep_ids:
+            return True
+
+        if name == 'meta':
+            return attrs.get('property') in self.keep_meta_properties
+
+        wanted = self.keep_classes.get(name)
+        if wanted:
+            value = attrs.get('class')
+            if value:
+                values = value.split() if isinstance(value, str) else value
+                return not wanted.isdisjoint(values)
+
+        return False
+
+    # beautifulsoup4 >= 4.13
+    def allow_tag_creation(self, nsprefix: Optional[str], name: str, attrs: Optional[dict]) -> bool:
+        return self.keep(name, attrs)
+
+    def allow_string_creation(self, string: str) -> bool:
+        # 顶层文本（不在任何保留元素内）全部丢弃
+        return False
+
+    @property
+    def excludes_everything(self) -> bool:
+        return False
+
+    @property
+    def includes_everything(self) -> bool:
+        return False
+
+    # beautifulsoup4 < 4.13
+    def search_tag(self, markup_name=None, markup_attrs={}):
+        return self.keep(markup_name, markup_attrs)
+
+
+# 文章解析用到的元素（与 ArticleParser 的各个 _extract_* 方法一一对应）
+ARTICLE_STRAINER = FieldStrainer(
+    tags=['title'],
+    classes={
+        'h1': ['rich_media_title'],
+        'h2': ['rich_media_title'],
+        'strong': ['profile_nickname'],
+        'a': ['rich_media_meta_link'],
+        'em': ['rich_media_meta_text'],
+        'img': ['rich_media_cover_img'],
+        'div': ['rich_media_content'],
+        'span': ['read_num', 'like_num'],
+    },
+    ids=['js_content', 'publish_time', 'readNum', 'likeNum'],
+    meta_properties=['og:title', 'og:article:author', 'og:article:published_time', 'og:image'],
+)
+
+# 不需要正文时只解析标题、作者、时间、封面和统计数据（跳过正文容器的整个子树）
+METADATA_STRAINER = FieldStrainer(
+    tags=['title'],
+    classes={
+        'h1': ['rich_media_title'],
+        'h2': ['rich_media_title'],
+        'strong': ['profile_nickname'],
+        'a': ['rich_media_meta_link'],
+        'em': ['rich_media_meta_text'],
+        'img': ['rich_media_cover_img'],
+        'span': ['read_num', 'like_num'],
+    },
+    ids=['publish_time', 'readNum', 'likeNum'],
+    meta_properties=['og:title', 'og:article:author', 'og:article:published_time', 'og:image'],
+)
+
+# 只解析阅读量和点赞数
+STATS_STRAINER = FieldStrainer(
+    classes={'span': ['read_num', 'like_num']},
+    ids=['readNum', 'likeNum'],
+)
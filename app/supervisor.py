@@ -0,0 +1,148 @@
+"""浏览器监管模块（启动预热、健康检查、崩溃恢复和按阈值轮换）"""
+import asyncio
+import time
+from typing import Dict, Optional
+from app.config import settings
+from app.crawler import WeChatCrawler, get_crawler, peek_crawler, replace_crawler
+from app.metrics import BROWSER_RESTARTS, child_process_rss
+
+
+class BrowserSupervisor:
+    """
+    浏览器监管
+
+    定期检查浏览器进程内存、打开页面数、最近抓取失败率和运行时长，
+    超过阈值或浏览器崩溃时先启动新浏览器接收新请求，再排空并关闭旧浏览器。
+    """
+
+    def __init__(self):
+        self._task: Optional[asyncio.Task] = None
+
+        # 统计
+        self.restarts: Dict[str, int] = {}
+        self.failed_restarts = 0
+        self.last_restart_reason: Optional[str] = None
+        self.last_restart_at: Optional[float] = None
+        self.last_check: dict = {}
+
+    async def start(self):
+        """预热浏览器并启动健康检查任务"""
+        if settings.BROWSER_PREWARM and settings.FETCH_MODE != "http":
+            await self.prewarm()
+
+        if settings.BROWSER_HEALTH_INTERVAL > 0 and self._task is None:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        """停止健康检查任务"""
+        if self._task:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+
+    async def prewarm(self):
+        """启动浏览器并预先创建页面（失败时只记录日志，首个请求会再次尝试启动）"""
+        started = time.monotonic()
+        try:
+            crawler = await get_crawler()
+            await crawler.pool.prewarm(settings.BROWSER_PREWARM_PAGES)
+        except Exception as e:
+            print(f"Browser prewarm failed: {e}")
+            return
+        print(f"Browser prewarmed in {time.monotonic() - started:.2f}s")
+
+    def check(self, crawler: WeChatCrawler) -> Optional[str]:
+        """
+        检查浏览器健康状态
+
+        Returns:
+            需要轮换的原因（crashed / memory / page_leak / error_rate / max_age），健康时返回 None
+        """
+        browser_rss_mb = child_process_rss().get("browser", 0) / (1024 * 1024)
+        open_pages = crawler.open_pages()
+        max_open_pages = settings.BROWSER_MAX_OPEN_PAGES or crawler.pool.size * 2
+        window_full = len(crawler.recent_results) >= crawler.recent_results.maxlen
+        age = time.monotonic() - crawler.started_at if crawler.started_at else 0.0
+
+        self.last_check = {
+            "browser_rss_mb": round(browser_rss_mb, 1),
+            "open_pages": open_pages,
+            "error_rate": round(crawler.error_rate, 3),
+            "age_s": round(age, 1),
+        }
+
+        if crawler.disconnected:
+            return "crashed"
+        if settings.BROWSER_MAX_RSS_MB and browser_rss_mb > settings.BROWSER_MAX_RSS_MB:
+            return "memory"
+        if open_pages > max_open_pages:
+            return "page_leak"
+        if window_full and crawler.error_rate >= settings.BROWSER_MAX_ERROR_RATE:
+            return "error_rate"
+        if settings.BROWSER_MAX_AGE and age > settings.BROWSER_MAX_AGE:
+            return "max_age"
+        return None
+
+    async def restart(self, reason: str) -> bool:
+        """轮换浏览器（先启动新浏览器，再排空并关闭旧浏览器）"""
+        print(f"Restarting browser (reason: {reason}, last check: {self.last_check})")
+        if not await replace_crawler(settings.BROWSER_DRAIN_TIMEOUT):
+            self.failed_restarts += 1
+            return False
+
+        self.restarts[reason] = self.restarts.get(reason, 0) + 1
+        self.last_restart_reason = reason
+        self.last_restart_at = time.time()
+        BROWSER_RESTARTS.labels(reason).inc()
+        return True
+
+    async def _run(self):
+        """健康检查循环：按间隔检查，浏览器断开时立即处理"""
+        while True:
+            crawler = peek_crawler()
+            try:
+                if crawler and crawler.browser:
+                    await asyncio.wait_for(crawler.disconnected_event.wait(), settings.BROWSER_HEALTH_INTERVAL)
+                else:
+                    await asyncio.sleep(settings.BROWSER_HEALTH_INTERVAL)
+            except asyncio.TimeoutError:
+                pass
+
+            # 等待期间可能已被替换，始终检查当前实例
+            crawler = peek_crawler()
+            if not crawler or not crawler.browser:
+                continue
+
+            try:
+                reason = self.check(crawler)
+                if reason and not await self.restart(reason):
+                    # 新浏览器启动失败，等待一个间隔后再试（避免崩溃状态下连续重试）
+                    await asyncio.sleep(settings.BROWSER_HEALTH_INTERVAL)
+            except Exception as e:
+                print(f"Browser health check failed: {e}")
+
+    def stats(self) -> dict:
+        """监管统计信息"""
+        return {
+            "running": self._task is not None and not self._task.done(),
+            "restarts": dict(self.restarts),
+            "failed_restarts": self.failed_restarts,
+            "last_restart_reason": self.last_restart_reason,
+            "last_restart_at": self.last_restart_at,
+            "last_check": dict(self.last_check),
+        }
+
+
+# 全局监管实例（单例模式）
+_supervisor_instance: Optional[BrowserSupervisor] = None
+
+
+def get_supervisor() -> BrowserSupervisor:
+    """获取浏览器监管实例（单例）"""
+    global _supervisor_instance
+    if _supervisor_instance is None:
+        _supervisor_instance = BrowserSupervisor()
+    return _supervisor_instance
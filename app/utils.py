@@ -2,9 +2,10 @@
 import re
 import random
 import time
+import asyncio
 from typing import Optional, List
 from urllib.parse import urlparse
-from bs4 import BeautifulSoup, Tag
+from bs4 import BeautifulSoup, Tag, NavigableString, CData
 
 
 def clean_article_url(url: str) -> str:
@@ -37,12 +38,32 @@ def validate_wechat_url(url: str) -> bool:
     return True
 
 
+def upstream_url(url: str, upstream_base: Optional[str] = None) -> str:
+    """
+    得到实际抓取的地址
+    
+    配置了上游地址（如本地模拟服务器）时，把文章 URL 的协议和域名替换为该地址，路径保持不变。
+    """
+    if not upstream_base:
+        return url
+    parsed = urlparse(url)
+    if parsed.netloc not in ["mp.weixin.qq.com", "weixin.qq.com"]:
+        return url
+    return upstream_base.rstrip('/') + url[len(f"{parsed.scheme}://{parsed.netloc}"):]
+
+
 def random_delay(min_seconds: float = 1.0, max_seconds: float = 3.0) -> None:
     """随机延迟，用于反爬虫"""
     delay = random.uniform(min_seconds, max_seconds)
     time.sleep(delay)
 
 
+async def async_random_delay(min_seconds: float = 1.0, max_seconds: float = 3.0) -> None:
+    """随机延迟（异步版本，不阻塞事件循环）"""
+    delay = random.uniform(min_seconds, max_seconds)
+    await asyncio.sleep(delay)
+
+
 def clean_text(text: str) -> str:
     """清理文本内容"""
     if not text:
@@ -76,51 +97,157 @@ def extract_image_urls(soup: BeautifulSoup, content_div: Optional[Tag] = None) -
     Returns:
         图片 URL 列表
     """
-    image_urls = []
+    return [image["url"] for image in extract_images(soup, content_div)]
+
+
+def _parse_number(value: Optional[str]) -> Optional[float]:
+    """解析数值属性（如 data-w="1080"、data-ratio="0.5625"），无效时返回 None"""
+    if not value:
+        return None
+    try:
+        number = float(str(value).strip().rstrip('px'))
+    except ValueError:
+        return None
+    return number if number > 0 else None
+
+
+# 正文中需要移除的标签
+_REMOVED_TAGS = frozenset(['script', 'style', 'iframe'])
+
+
+def _image_info(img: Tag) -> Optional[dict]:
+    """从 img 标签提取图片信息，无有效 URL 时返回 None"""
+    # 跳过封面图（已经在 cover 字段中）
+    if img.get('class') and 'rich_media_cover_img' in img.get('class', []):
+        return None
     
+    # 优先使用 src（实际加载的图片），然后是 data-src（懒加载占位符）
+    # 微信图片通常 src 是实际加载的图片，data-src 是懒加载的原始图片
+    image_url = (
+        img.get('src') or  # 优先使用 src（实际加载的图片）
+        img.get('data-src') or  # 然后是 data-src（懒加载）
+        img.get('data-original') or
+        img.get('data-lazy-src') or
+        img.get('data-lazy')
+    )
+    image_url = _clean_image_url(image_url)
+    if not image_url:
+        return None
+    
+    return {
+        "url": image_url,
+        "width": _parse_number(img.get('data-w')),
+        "ratio": _parse_number(img.get('data-ratio')),
+        "type": (img.get('data-type') or '').lower() or None,
+        "alt": img.get('alt') or None,
+    }
+
+
+def _clean_image_url(image_url: Optional[str]) -> Optional[str]:
+    """清理图片 URL（移除锚点），只保留完整的 HTTP/HTTPS URL，忽略相对路径"""
+    if not image_url:
+        return None
+    image_url = image_url.split('#')[0].strip()
+    if image_url.startswith(('http://', 'https://')):
+        return image_url
+    return None
+
+
+def _merge_images(img_images: List[dict], link_urls: List[str]) -> List[dict]:
+    """按 img 标签在前、a[imgurl] 在后的顺序合并并去重"""
+    images = []
+    seen = set()
+    
+    for image in img_images:
+        if image["url"] not in seen:
+            seen.add(image["url"])
+            images.append(image)
+    
+    for url in link_urls:
+        if url not in seen:
+            seen.add(url)
+            images.append({"url": url, "width": None, "ratio": None, "type": None, "alt": None})
+    
+    return images
+
+
+def extract_images(soup: BeautifulSoup, content_div: Optional[Tag] = None) -> List[dict]:
+    """
+    从 BeautifulSoup 对象中提取所有图片及其尺寸属性
+    
+    Args:
+        soup: BeautifulSoup 对象
+        content_div: 可选的正文容器元素，如果提供则只从此元素中提取
+        
+    Returns:
+        图片信息列表，每项包含 url、width（data-w）、ratio（data-ratio，高/宽）、type（data-type）、alt
+    """
     # 确定搜索范围
     search_area = content_div if content_div else soup
     
-    # 1. 查找所有 img 标签
-    img_tags = search_area.find_all('img')
+    img_images = []
+    link_urls = []
+    # 一次遍历同时查找 img 标签和带 imgurl 属性的 a 标签（微信文章中的图片链接）
+    for tag in search_area.find_all(['img', 'a']):
+        if tag.name == 'img':
+            image = _image_info(tag)
+            if image:
+                img_images.append(image)
+        else:
+            url = _clean_image_url(tag.get('imgurl'))
+            if url:
+                link_urls.append(url)
     
-    for img in img_tags:
-        # 跳过封面图（已经在 cover 字段中）
-        if img.get('class') and 'rich_media_cover_img' in img.get('class', []):
-            continue
-        
-        # 优先使用 src（实际加载的图片），然后是 data-src（懒加载占位符）
-        # 微信图片通常 src 是实际加载的图片，data-src 是懒加载的原始图片
-        image_url = (
-            img.get('src') or  # 优先使用 src（实际加载的图片）
-            img.get('data-src') or  # 然后是 data-src（懒加载）
-            img.get('data-original') or
-            img.get('data-lazy-src') or
-            img.get('data-lazy')
-        )
+    return _merge_images(img_images, link_urls)
+
+
+def extract_content_parts(content_div: Tag, include_html: bool = True) -> tuple[str, str, List[dict]]:
+    """
+    一次遍历正文容器，得到正文 HTML、纯文本和图片信息
+    
+    遍历时跳过 script / style / iframe 的子树（遍历结束后将其移除），
+    同时收集文本片段和图片，结果与先移除标签再分别调用 get_text / extract_images 一致。
+    
+    Args:
+        content_div: 正文容器元素（会被原地修改）
+        include_html: 是否序列化正文 HTML（不需要时跳过，返回空字符串）
         
-        if image_url:
-            # 清理 URL（移除可能的锚点）
-            image_url = image_url.split('#')[0].strip()
-            
-            # 只保留完整的 HTTP/HTTPS URL，忽略相对路径
-            if image_url.startswith(('http://', 'https://')):
-                # 避免重复
-                if image_url not in image_urls:
-                    image_urls.append(image_url)
-    
-    # 2. 查找所有 a 标签中的 imgurl 属性（微信文章中的图片链接）
-    a_tags = search_area.find_all('a', attrs={'imgurl': True})
-    for a_tag in a_tags:
-        imgurl = a_tag.get('imgurl')
-        if imgurl:
-            # 清理 URL（移除可能的锚点）
-            imgurl = imgurl.split('#')[0].strip()
-            
-            # 只保留完整的 HTTP/HTTPS URL，忽略相对路径
-            if imgurl.startswith(('http://', 'https://')):
-                # 避免重复
-                if imgurl not in image_urls:
-                    image_urls.append(imgurl)
-    
-    return image_urls
+    Returns:
+        (正文 HTML, 清理后的纯文本, 图片信息列表)
+    """
+    # 与 get_text() 相同的文本类型（默认只取 NavigableString 和 CData，不含注释等）
+    text_types = content_div.interesting_string_types or (NavigableString, CData)
+    if isinstance(text_types, type):
+        text_types = (text_types,)
+    strings = []
+    img_images = []
+    link_urls = []
+    removed = []
+    
+    stack = list(reversed(content_div.contents))
+    while stack:
+        node = stack.pop()
+        if isinstance(node, Tag):
+            name = node.name
+            if name in _REMOVED_TAGS:
+                removed.append(node)
+                continue
+            if name == 'img':
+                image = _image_info(node)
+                if image:
+                    img_images.append(image)
+            elif name == 'a':
+                url = _clean_image_url(node.get('imgurl'))
+                if url:
+                    link_urls.append(url)
+            if node.contents:
+                stack.extend(reversed(node.contents))
+        elif type(node) in text_types:
+            strings.append(node)
+    
+    for tag in removed:
+        tag.decompose()
+    
+    content_html = str(content_div) if include_html else ""
+    content_text = clean_text(''.join(strings))
+    return content_html, content_text, _merge_images(img_images, link_urls)
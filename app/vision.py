@@ -1,9 +1,104 @@
 """图片 OCR 模块 - 使用 DashScope qwen3-vl-plus 模型"""
+import asyncio
+import random
 import time
-from typing import List, Optional
+from typing import Callable, List, Optional, Tuple
 import dashscope
 from dashscope import MultiModalConversation
 from app.config import settings
+from app.executors import run_in_ocr_executor
+from app.http_fetcher import get_http_fetcher
+from app.metrics import observe_stage
+from app.ocr_cache import get_ocr_cache, normalize_image_url, content_key
+from app.ocr_planner import BATCH_PROMPT, plan_chunks, split_batch_output
+from app.ratelimit import RedisTokenBucket, TokenBucket
+
+
+# 可重试的 HTTP 状态码（限流和服务端错误）
+_RETRYABLE_STATUS_CODES = {429, 500, 502, 503, 504}
+
+
+def _configure_dashscope():
+    """设置 DashScope API Key 和接口地址（进程执行器中的子进程也需要调用）"""
+    dashscope.api_key = settings.DASHSCOPE_API_KEY
+    if settings.DASHSCOPE_BASE_URL:
+        dashscope.base_http_api_url = settings.DASHSCOPE_BASE_URL
+
+
+def _call_model(messages: list):
+    """同步调用 qwen3-vl-plus 模型（在 OCR 执行器中运行）"""
+    _configure_dashscope()
+    return MultiModalConversation.call(
+        model="qwen3-vl-plus",
+        messages=messages,
+        result_format='message',
+        stream=False
+    )
+
+
+# OCR 请求统计
+_ocr_stats = {
+    "single_requests": 0,
+    "batch_requests": 0,
+    "batched_images": 0,
+    "batch_fallbacks": 0,
+}
+
+
+# 全局 OCR 限流器（按 DashScope QPS 配额）
+_rate_limiter = None
+
+# 本机分摊同一配额的进程数（进程内令牌桶按此均分 OCR_QPS 和 OCR_BURST）
+_rate_limit_processes = 1
+
+
+def set_ocr_rate_limit_processes(processes: int):
+    """设置本机分摊 OCR 配额的进程数（工作进程启动时、首次 OCR 之前调用）"""
+    global _rate_limit_processes
+    _rate_limit_processes = max(1, processes)
+
+
+def get_ocr_rate_limiter():
+    """
+    获取 OCR 限流器（单例）
+
+    OCR_RATE_LIMIT_BACKEND 为 redis（auto 且 QUEUE_BACKEND=redis 时）时所有工作进程共享 Redis 中的令牌桶；
+    否则使用进程内令牌桶，按本机进程数均分配额。
+    """
+    global _rate_limiter
+    if _rate_limiter is None:
+        local = TokenBucket(settings.OCR_QPS / _rate_limit_processes, settings.OCR_BURST / _rate_limit_processes)
+        backend = settings.OCR_RATE_LIMIT_BACKEND.lower()
+        if backend == "auto":
+            backend = "redis" if settings.QUEUE_BACKEND.lower() == "redis" else "local"
+        if backend == "redis":
+            import redis.asyncio as aioredis
+
+            client = aioredis.from_url(settings.REDIS_URL)
+            _rate_limiter = RedisTokenBucket(
+                client, settings.OCR_RATE_LIMIT_KEY, settings.OCR_QPS, settings.OCR_BURST, fallback=local
+            )
+        elif backend == "local":
+            _rate_limiter = local
+        else:
+            raise ValueError(f"Unknown OCR_RATE_LIMIT_BACKEND: {backend}. Expected 'auto', 'local' or 'redis'.")
+    return _rate_limiter
+
+
+async def close_ocr_rate_limiter():
+    """关闭 OCR 限流器（Redis 令牌桶需要关闭连接）"""
+    global _rate_limiter
+    if isinstance(_rate_limiter, RedisTokenBucket):
+        await _rate_limiter.close()
+    _rate_limiter = None
+
+
+def get_ocr_stats() -> dict:
+    """OCR 请求与限流统计信息"""
+    return {
+        **_ocr_stats,
+        "rate_limiter": _rate_limiter.stats() if _rate_limiter else None,
+    }
 
 
 class VisionOCR:
@@ -14,149 +109,229 @@ class VisionOCR:
         if not settings.DASHSCOPE_API_KEY:
             raise ValueError("DASHSCOPE_API_KEY is not configured. Please set it in environment variables.")
         
-        dashscope.api_key = settings.DASHSCOPE_API_KEY
+        _configure_dashscope()
     
-    def extract_text_from_images(self, image_urls: List[str]) -> str:
+    async def extract_text_from_images_async(
+        self,
+        image_urls: List[str],
+        on_result: Optional[Callable[[int, Optional[str]], None]] = None
+    ) -> str:
         """
-        从多张图片中提取文字内容
+        从多张图片中提取文字内容（异步并发版本）
         
         Args:
             image_urls: 图片 URL 列表
+            on_result: 每张图片得到结果时调用（见 extract_texts_async）
             
         Returns:
-            提取的文字内容（合并后的文本）
+            提取的文字内容（按图片原顺序合并）
         """
-        if not image_urls:
-            return ""
-        
-        extracted_texts = []
-        
-        # 逐张处理图片（避免单次请求过大）
-        for idx, image_url in enumerate(image_urls, 1):
-            try:
-                text = self._extract_text_from_single_image(image_url, idx, len(image_urls))
-                if text:
-                    extracted_texts.append(text)
-                
-                # 添加延迟避免限流
-                if idx < len(image_urls):
-                    time.sleep(0.5)
-                    
-            except Exception as e:
-                print(f"Error extracting text from image {idx} ({image_url}): {e}")
-                continue
-        
-        # 合并所有提取的文字
+        texts = await self.extract_texts_async(image_urls, on_result)
+        extracted_texts = [text for text in texts if text]
         return "\n\n".join(extracted_texts) if extracted_texts else ""
     
-    def _extract_text_from_single_image(self, image_url: str, image_index: int, total_images: int) -> Optional[str]:
+    async def extract_texts_async(
+        self,
+        image_urls: List[str],
+        on_result: Optional[Callable[[int, Optional[str]], None]] = None
+    ) -> List[Optional[str]]:
         """
-        从单张图片中提取文字
+        并发识别多张图片
+        
+        先查 OCR 缓存；未命中的图片由 OCR 规划器决定逐张识别或按块合并识别（合并失败时回退逐张）。
+        并行请求数受 OCR_CONCURRENCY 限制，请求速率受全局令牌桶（OCR_QPS）限制。
         
         Args:
-            image_url: 图片 URL
-            image_index: 当前图片索引（从1开始）
-            total_images: 总图片数
+            image_urls: 图片 URL 列表
+            on_result: 每张图片得到结果时以 (位置, 文字) 调用（按完成顺序；缓存命中的图片最先）
             
         Returns:
-            提取的文字内容
+            与 image_urls 顺序一致的文字列表，识别失败或没有文字的位置为 None
         """
-        # 构建消息内容
+        if not image_urls:
+            return []
+        
+        total = len(image_urls)
+        results: List[Optional[str]] = [None] * total
+        
+        # 查缓存
+        lookups = await asyncio.gather(*(self._cache_lookup(url) for url in image_urls))
+        pending = []  # (原位置, 缓存键)
+        for position, (cached, keys) in enumerate(lookups):
+            if cached is not None:
+                results[position] = cached
+                if on_result:
+                    on_result(position, cached or None)
+            else:
+                pending.append((position, keys))
+        
+        semaphore = asyncio.Semaphore(max(1, settings.OCR_CONCURRENCY))
+        
+        async def run_single(position: int) -> Optional[str]:
+            try:
+                return await self._ocr_single(image_urls[position], position + 1, total)
+            except Exception as e:
+                print(f"Error extracting text from image {position + 1} ({image_urls[position]}): {e}")
+                return None
+        
+        async def run_unit(unit: List[int]):
+            positions = [pending[i][0] for i in unit]
+            async with semaphore:
+                started = time.monotonic()
+                if len(positions) == 1:
+                    texts = [await run_single(positions[0])]
+                else:
+                    texts = await self._ocr_chunk([image_urls[p] for p in positions])
+                    if texts is None:
+                        # 合并请求失败或无法拆分，回退为逐张识别
+                        _ocr_stats["batch_fallbacks"] += 1
+                        texts = [await run_single(p) for p in positions]
+                # 合并请求按图片数均摊耗时
+                elapsed = (time.monotonic() - started) / len(positions)
+                for _ in positions:
+                    observe_stage("ocr_image", elapsed)
+            
+            for i, text in zip(unit, texts):
+                position, keys = pending[i]
+                results[position] = text
+                if on_result:
+                    on_result(position, text or None)
+                await self._cache_store(keys, text)
+        
+        await asyncio.gather(*(run_unit(unit) for unit in plan_chunks(len(pending))))
+        return [text or None for text in results]
+    
+    async def _ocr_single(self, image_url: str, image_index: int, total_images: int) -> Optional[str]:
+        """单图请求（没有文字时返回空字符串，失败时返回 None）"""
         content = [
             {"image": image_url},
             {"text": f"请提取这张图片中的所有文字内容。如果图片中有多段文字，请按顺序提取并保持段落结构。图片 {image_index}/{total_images}"}
         ]
+        messages = [{"role": "user", "content": content}]
+        _ocr_stats["single_requests"] += 1
+        return await self._call_with_retry(messages)
+    
+    async def _ocr_chunk(self, image_urls: List[str]) -> Optional[List[str]]:
+        """
+        多图合并请求
         
+        Returns:
+            每张图片的文字，请求失败或输出无法按序号拆分时返回 None
+        """
+        content = [{"text": BATCH_PROMPT.format(count=len(image_urls))}]
+        content.extend({"image": url} for url in image_urls)
         messages = [{"role": "user", "content": content}]
         
+        _ocr_stats["batch_requests"] += 1
+        _ocr_stats["batched_images"] += len(image_urls)
+        text = await self._call_with_retry(messages)
+        if text is None:
+            return None
+        return split_batch_output(text, len(image_urls))
+    
+    async def _cache_lookup(self, image_url: str) -> Tuple[Optional[str], List[str]]:
+        """
+        查询 OCR 缓存
+        
+        Returns:
+            (缓存的文字或 None, 识别成功后需要写入的缓存键)
+        """
+        cache = get_ocr_cache()
+        if not cache:
+            return None, []
+        
+        url_key = normalize_image_url(image_url)
+        cached = await cache.aget(url_key)
+        if cached is not None:
+            return cached, []
+        
+        keys = [url_key]
+        # 可选：按图片内容哈希查找（同一图片换了地址时仍可命中）
+        if settings.OCR_CACHE_HASH_CONTENT:
+            hash_key = await self._content_cache_key(image_url)
+            if hash_key:
+                cached = await cache.aget(hash_key)
+                if cached is not None:
+                    await cache.aset(url_key, cached)
+                    return cached, []
+                keys.append(hash_key)
+        return None, keys
+    
+    @staticmethod
+    async def _cache_store(keys: List[str], text: Optional[str]):
+        """只缓存成功的识别结果（没有文字的图片缓存为空字符串）"""
+        cache = get_ocr_cache()
+        if not cache or text is None:
+            return
+        for key in keys:
+            await cache.aset(key, text)
+    
+    @staticmethod
+    async def _content_cache_key(image_url: str) -> Optional[str]:
+        """下载图片并计算内容哈希键，失败时返回 None"""
         try:
-            # 调用 qwen3-vl-plus 模型
-            response = MultiModalConversation.call(
-                model="qwen3-vl-plus",
-                messages=messages,
-                result_format='message',
-                stream=False
-            )
-            
-            # 检查响应状态
-            if response.status_code == 200:
-                # 提取返回的文字内容
-                output_content = response.output.choices[0].message.content
-                
-                # 处理返回内容（可能是列表或字符串）
-                if isinstance(output_content, list):
-                    # 查找文本内容
-                    text_content = ""
-                    for item in output_content:
-                        if isinstance(item, dict) and 'text' in item:
-                            text_content = item['text']
-                            break
-                    return text_content if text_content else None
-                elif isinstance(output_content, str):
-                    return output_content
-                else:
-                    # 尝试直接获取文本
-                    return str(output_content)
-            else:
-                print(f"API call failed: status_code={response.status_code}, code={response.code}, message={response.message}")
+            response = await get_http_fetcher().client.get(image_url)
+            if response.status_code != 200:
                 return None
-                
+            return content_key(response.content)
         except Exception as e:
-            print(f"Exception when calling DashScope API: {e}")
+            print(f"Error downloading image for content hash ({image_url}): {e}")
             return None
     
-    def extract_text_from_images_batch(self, image_urls: List[str]) -> str:
+    async def _call_with_retry(self, messages: list) -> Optional[str]:
         """
-        批量处理多张图片（一次性发送所有图片）
+        调用模型，限流或服务端错误时指数退避重试
         
         Args:
-            image_urls: 图片 URL 列表
+            messages: 请求消息
             
         Returns:
-            提取的文字内容
+            返回的文字内容（没有文字时为空字符串），失败时返回 None
         """
-        if not image_urls:
-            return ""
-        
-        # 构建消息内容
-        content = [
-            {"text": "请提取以下所有图片中的文字内容。如果有多张图片，请按顺序提取每张图片的文字，并在每张图片的文字前标注图片序号。"}
-        ]
+        limiter = get_ocr_rate_limiter()
         
-        # 添加所有图片
-        for idx, image_url in enumerate(image_urls, 1):
-            content.append({"image": image_url})
+        for attempt in range(settings.OCR_MAX_RETRIES + 1):
+            await limiter.acquire()
+            try:
+                response = await run_in_ocr_executor(_call_model, messages)
+            except Exception as e:
+                error = f"Exception when calling DashScope API: {e}"
+                retryable = True
+            else:
+                if response.status_code == 200:
+                    return self._parse_output_text(response) or ""
+                error = f"API call failed: status_code={response.status_code}, code={response.code}, message={response.message}"
+                retryable = self._is_retryable(response)
+            
+            if not retryable or attempt >= settings.OCR_MAX_RETRIES:
+                print(error)
+                return None
+            
+            # 指数退避（带随机抖动）
+            delay = settings.OCR_RETRY_BASE_DELAY * (2 ** attempt) * random.uniform(0.5, 1.5)
+            print(f"{error}. Retrying in {delay:.2f}s ({attempt + 1}/{settings.OCR_MAX_RETRIES})")
+            await asyncio.sleep(delay)
         
-        messages = [{"role": "user", "content": content}]
+        return None
+    
+    @staticmethod
+    def _is_retryable(response) -> bool:
+        """判断失败的响应是否值得重试（限流或服务端错误）"""
+        code = str(getattr(response, "code", "") or "")
+        return response.status_code in _RETRYABLE_STATUS_CODES or code.startswith("Throttling")
+    
+    @staticmethod
+    def _parse_output_text(response) -> Optional[str]:
+        """从模型响应中取出文字内容"""
+        output_content = response.output.choices[0].message.content
         
-        try:
-            # 调用 qwen3-vl-plus 模型
-            response = MultiModalConversation.call(
-                model="qwen3-vl-plus",
-                messages=messages,
-                result_format='message',
-                stream=False
-            )
-            
-            if response.status_code == 200:
-                output_content = response.output.choices[0].message.content
-                
-                if isinstance(output_content, list):
-                    text_content = ""
-                    for item in output_content:
-                        if isinstance(item, dict) and 'text' in item:
-                            text_content = item['text']
-                            break
-                    return text_content if text_content else ""
-                elif isinstance(output_content, str):
-                    return output_content
-                else:
-                    return str(output_content)
-            else:
-                print(f"Batch API call failed: status_code={response.status_code}, code={response.code}, message={response.message}")
-                return ""
-                
-        except Exception as e:
-            print(f"Exception when calling DashScope API (batch): {e}")
-            return ""
-
+        # 处理返回内容（可能是列表或字符串）
+        if isinstance(output_content, list):
+            for item in output_content:
+                if isinstance(item, dict) and 'text' in item:
+                    return item['text'] or None
+            return None
+        elif isinstance(output_content, str):
+            return output_content
+        else:
+            return str(output_content)
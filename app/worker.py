@@ -0,0 +1,253 @@
+"""
+爬虫工作进程（queue 模式）
+
+每个工作进程拥有自己的浏览器（WeChatCrawler）、HTTP 客户端和执行器，从任务队列领取解析任务，
+抓取并解析后把结果写回结果存储。缓存和请求合并仍在 API 进程中完成。
+
+- multiprocessing 后端：工作进程由 API 进程启动（QUEUE_WORKERS），经管道收发任务，意外退出后由 API 进程重启
+- redis 后端：在任意机器上运行（在项目根目录）：
+    python -m app.worker --processes 4
+"""
+import argparse
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import socket
+import time
+from multiprocessing.connection import Connection
+from typing import Optional, Set
+from app.article_store import close_article_store
+from app.config import settings
+from app.crawler import close_crawler
+from app.executors import shutdown_executors
+from app.http_fetcher import close_http_fetcher
+from app.ocr_cache import close_ocr_cache
+from app.service import job_result, run_parse_job
+from app.supervisor import get_supervisor
+from app.vision import close_ocr_rate_limiter, set_ocr_rate_limit_processes
+
+
+async def handle_job(job: dict) -> dict:
+    """执行一个解析任务，返回任务结果（异常写入结果，由 API 进程重新抛出）"""
+    try:
+        data = await run_parse_job(
+            job["url"], job["fetch_mode"], job.get("stats_only", False), content_fields=job.get("content_fields"),
+            output_format=job.get("output_format", "html")
+        )
+        return job_result(job["job_id"], data=data)
+    except Exception as e:
+        print(f"Job {job['job_id']} failed for {job['url']}: {e}")
+        return job_result(job["job_id"], error=e)
+
+
+def _expired(job: dict) -> bool:
+    # API 进程已不再等待结果的任务直接跳过
+    return time.time() > job["deadline"]
+
+
+async def _startup():
+    # 预热浏览器并启动健康检查
+    await get_supervisor().start()
+
+
+async def _shutdown():
+    await get_supervisor().stop()
+    await close_crawler()
+    await close_http_fetcher()
+    close_article_store()
+    close_ocr_cache()
+    await close_ocr_rate_limiter()
+    shutdown_executors()
+
+
+def run_process_worker(jobs: Connection, results: Connection, index: int, workers: int = 1):
+    """multiprocessing 后端的工作进程入口（本机 workers 个进程均分 OCR 配额）"""
+    # 停止信号由 API 进程通过任务管道中的 None 发出，忽略终端的 Ctrl+C
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    set_ocr_rate_limit_processes(workers)
+    asyncio.run(_process_worker_main(jobs, results, index))
+
+
+async def _recv_job(jobs: Connection) -> Optional[dict]:
+    """等待任务管道可读后再读取（与 API 进程读取结果管道相同，不长期占用默认执行器的线程）"""
+    loop = asyncio.get_running_loop()
+    readable = loop.create_future()
+    loop.add_reader(jobs.fileno(), lambda: readable.done() or readable.set_result(None))
+    try:
+        await readable
+    finally:
+        loop.remove_reader(jobs.fileno())
+    return jobs.recv()
+
+
+async def _process_worker_main(jobs: Connection, results: Connection, index: int):
+    print(f"Crawler worker {index} started (pid {os.getpid()})")
+    await _startup()
+
+    tasks: Set[asyncio.Task] = set()
+
+    async def run(job: dict):
+        results.send(await handle_job(job))
+
+    while True:
+        # 并发数由 API 进程分配任务时控制，收到的任务直接开始处理
+        try:
+            job = await _recv_job(jobs)
+        except EOFError:
+            # API 进程已退出
+            break
+        if job is None:
+            break
+        if _expired(job):
+            # 仍需回复结果，API 进程据此释放该进程的名额
+            results.send(job_result(job["job_id"], error=TimeoutError("Job deadline passed before it started")))
+            continue
+        task = asyncio.create_task(run(job))
+        tasks.add(task)
+        task.add_done_callback(tasks.discard)
+
+    if tasks:
+        await asyncio.gather(*tasks, return_exceptions=True)
+    await _shutdown()
+    print(f"Crawler worker {index} stopped")
+
+
+class RedisWorker:
+    """Redis Streams 消费者：以消费者组领取任务，完成后写入结果并确认"""
+
+    def __init__(self, consumer: str, concurrency: int):
+        import redis.asyncio as aioredis
+
+        self.consumer = consumer
+        self.concurrency = max(1, concurrency)
+        self._client = aioredis.from_url(settings.REDIS_URL, decode_responses=True)
+        self._tasks: Set[asyncio.Task] = set()
+        self._stopping = asyncio.Event()
+        self._last_claim = 0.0
+
+    def stop(self):
+        self._stopping.set()
+
+    async def _ensure_group(self):
+        from redis.exceptions import ResponseError
+
+        try:
+            await self._client.xgroup_create(settings.QUEUE_STREAM, settings.QUEUE_GROUP, id="0", mkstream=True)
+        except ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+
+    async def _process(self, message_id: str, fields: dict):
+        from app.job_queue import result_key
+
+        job = json.loads(fields["job"])
+        if not _expired(job):
+            result = await handle_job(job)
+            key = result_key(job["job_id"])
+            async with self._client.pipeline(transaction=True) as pipe:
+                pipe.rpush(key, json.dumps(result))
+                pipe.expire(key, settings.QUEUE_RESULT_TTL)
+                await pipe.execute()
+        await self._client.xack(settings.QUEUE_STREAM, settings.QUEUE_GROUP, message_id)
+        await self._client.xdel(settings.QUEUE_STREAM, message_id)
+
+    def _spawn(self, messages):
+        for message_id, fields in messages:
+            task = asyncio.create_task(self._process(message_id, fields))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+
+    async def _claim_stale(self, count: int):
+        """接管其他消费者领取后长时间未确认的任务（消费者崩溃时）"""
+        if time.monotonic() - self._last_claim < settings.QUEUE_CLAIM_IDLE / 2:
+            return
+        self._last_claim = time.monotonic()
+        reply = await self._client.xautoclaim(
+            settings.QUEUE_STREAM, settings.QUEUE_GROUP, self.consumer,
+            min_idle_time=int(settings.QUEUE_CLAIM_IDLE * 1000), start_id="0-0", count=count,
+        )
+        claimed = reply[1]
+        if claimed:
+            print(f"Worker {self.consumer} claimed {len(claimed)} stale jobs")
+            self._spawn(claimed)
+
+    async def run(self):
+        await self._ensure_group()
+        await _startup()
+        print(f"Redis worker {self.consumer} consuming {settings.QUEUE_STREAM} (group {settings.QUEUE_GROUP})")
+
+        try:
+            while not self._stopping.is_set():
+                free = self.concurrency - len(self._tasks)
+                if free <= 0:
+                    await asyncio.wait(self._tasks, return_when=asyncio.FIRST_COMPLETED)
+                    continue
+                try:
+                    await self._claim_stale(free)
+                    free = self.concurrency - len(self._tasks)
+                    if free <= 0:
+                        continue
+                    reply = await self._client.xreadgroup(
+                        settings.QUEUE_GROUP, self.consumer, {settings.QUEUE_STREAM: ">"}, count=free, block=5000
+                    )
+                except Exception as e:
+                    print(f"Worker {self.consumer} failed to read jobs: {e}")
+                    await asyncio.sleep(1)
+                    continue
+                for _stream, messages in reply or []:
+                    self._spawn(messages)
+        finally:
+            # 处理完已领取的任务再退出（未完成的任务由其他消费者接管）
+            if self._tasks:
+                await asyncio.gather(*self._tasks, return_exceptions=True)
+            await _shutdown()
+            await self._client.aclose()
+            print(f"Redis worker {self.consumer} stopped")
+
+
+async def _redis_worker_main(consumer: str, concurrency: int):
+    worker = RedisWorker(consumer, concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        loop.add_signal_handler(sig, worker.stop)
+    await worker.run()
+
+
+def run_redis_worker(consumer: str, concurrency: int, processes: int = 1):
+    """redis 后端的工作进程入口（OCR_RATE_LIMIT_BACKEND=local 时本机 processes 个进程均分 OCR 配额）"""
+    set_ocr_rate_limit_processes(processes)
+    asyncio.run(_redis_worker_main(consumer, concurrency))
+
+
+def main(argv: Optional[list] = None):
+    parser = argparse.ArgumentParser(description="WeChat article crawler worker (Redis Streams)")
+    parser.add_argument("--processes", type=int, default=1, help="启动的工作进程数（每个进程一个浏览器）")
+    parser.add_argument("--concurrency", type=int, default=settings.WORKER_CONCURRENCY, help="每个进程同时处理的任务数")
+    parser.add_argument("--name", default=f"{socket.gethostname()}-{os.getpid()}", help="消费者名称前缀")
+    args = parser.parse_args(argv)
+
+    if settings.QUEUE_BACKEND.lower() != "redis":
+        parser.error("standalone workers require QUEUE_BACKEND=redis (multiprocessing workers are started by the API process)")
+
+    if args.processes <= 1:
+        run_redis_worker(args.name, args.concurrency)
+        return
+
+    context = multiprocessing.get_context("spawn")
+    processes = [
+        context.Process(target=run_redis_worker, args=(f"{args.name}-{index}", args.concurrency, args.processes))
+        for index in range(args.processes)
+    ]
+    for process in processes:
+        process.start()
+    # 终端的 Ctrl+C 会同时发给子进程，这里只等待它们处理完退出
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, lambda *_: [process.terminate() for process in processes])
+    for process in processes:
+        process.join()
+
+
+if __name__ == "__main__":
+    main()
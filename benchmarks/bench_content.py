@@ -0,0 +1,78 @@
+"""
+正文提取基准测试
+
+生成包含大量图片的合成文章，测量构建文档树和正文提取（HTML、纯文本、图片列表）的耗时。
+
+用法（在项目根目录运行）：
+    python -m benchmarks.bench_content --images 1000 --rounds 20
+"""
+import argparse
+from bs4 import BeautifulSoup
+from app.parser import ArticleParser
+from app.utils import extract_image_urls
+from benchmarks.common import measure
+
+
+def synthetic_article(image_count: int, duplicate_ratio: float = 0.1) -> str:
+    """
+    生成合成文章 HTML
+
+    每张图片配一段文字和一个 a[imgurl] 链接，按 duplicate_ratio 混入重复图片，
+    并夹带 script / style / iframe 等需要移除的元素。
+    """
+    unique = max(1, int(image_count * (1 - duplicate_ratio)))
+    parts = ['<html><head><meta property="og:title" content="合成文章"></head><body>',
+             '<div class="rich_media_content" id="js_content">']
+    for i in range(image_count):
+        image_id = i % unique
+        parts.append(
+            f'<section><p>第 {i} 段文字，<strong>加粗</strong> &amp; 说明。</p>'
+            f'<img data-src="https://mmbiz.qpic.cn/mmbiz_png/{image_id}/640?wx_fmt=png" '
+            f'data-w="1080" data-ratio="0.75" data-type="png">'
+            f'<a imgurl="https://mmbiz.qpic.cn/mmbiz_png/{image_id}/0">查看原图</a></section>'
+        )
+        if i % 50 == 0:
+            parts.append('<script>var x = 1;</script><style>p{}</style><iframe src="https://v.qq.com"></iframe>')
+    parts.append('</div></body></html>')
+    return "".join(parts)
+
+
+def run(image_count: int, rounds: int) -> dict:
+    """运行一组基准测试，返回各阶段耗时"""
+    html = synthetic_article(image_count)
+
+    def build():
+        return BeautifulSoup(html, 'lxml')
+
+    def extract_content():
+        ArticleParser._extract_content(build())
+
+    soup = build()
+    content_div = soup.find('div', id='js_content')
+
+    return {
+        "images": image_count,
+        "html_bytes": len(html.encode("utf-8")),
+        "build_soup": measure(build, rounds),
+        "build_and_extract_content": measure(extract_content, rounds),
+        "extract_image_urls": measure(lambda: extract_image_urls(soup, content_div), rounds),
+        "parse_html": measure(lambda: ArticleParser.parse_html(html, "https://mp.weixin.qq.com/s/bench"), rounds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content extraction benchmark")
+    parser.add_argument("--images", type=int, nargs="+", default=[100, 1000], help="每篇文章的图片数")
+    parser.add_argument("--rounds", type=int, default=10, help="每项测量的重复次数")
+    args = parser.parse_args()
+
+    for image_count in args.images:
+        result = run(image_count, args.rounds)
+        print(f"== {result['images']} images, {result['html_bytes']} bytes ==")
+        for name, timing in result.items():
+            if isinstance(timing, dict):
+                print(f"  {name:28s} mean {timing['mean_ms']:8.2f} ms  p50 {timing['p50_ms']:8.2f} ms  p95 {timing['p95_ms']:8.2f} ms")
+
+
+if __name__ == "__main__":
+    main()
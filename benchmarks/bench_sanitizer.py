@@ -0,0 +1,110 @@
+"""
+正文 HTML 规范化基准测试
+
+对语料中的每篇文章，比较各 CONTENT_HTML_PROFILE 下 content_html 的大小和规范化耗时，
+并检查按段落（块级元素）切分的文本是否与 raw 一致（段落合并或拆分都会被发现）。
+
+用法（在项目根目录运行）：
+    python -m benchmarks.bench_sanitizer --rounds 20
+"""
+import argparse
+from typing import List
+from bs4 import BeautifulSoup, NavigableString, Tag
+from app.sanitizer import PROFILES, sanitize_html
+from app.utils import extract_content_parts
+from benchmarks.common import measure
+from benchmarks.corpus import load_corpus
+
+
+def _content_div(html: str):
+    soup = BeautifulSoup(html, 'lxml')
+    content_div = soup.find('div', class_='rich_media_content') or soup.find('div', id='js_content')
+    if content_div is not None:
+        # 与解析器相同：先移除 script / style / iframe
+        extract_content_parts(content_div, include_html=False)
+    return content_div
+
+
+# 段落边界：进入或离开这些元素时结束当前段落
+_BLOCK_TAGS = frozenset({
+    'p', 'div', 'section', 'article', 'header', 'footer', 'center', 'main', 'aside', 'figure', 'figcaption',
+    'h1', 'h2', 'h3', 'h4', 'h5', 'h6', 'ul', 'ol', 'li', 'blockquote', 'pre', 'table', 'tr', 'td', 'th', 'hr',
+})
+
+
+def _block_texts(content_html: str) -> List[str]:
+    """按块级元素切分正文文本，每段去掉空白后返回（只比较段落划分和文字，不比较段内空白）"""
+    blocks: List[str] = []
+    current: List[str] = []
+
+    def flush():
+        text = "".join("".join(current).split())
+        if text:
+            blocks.append(text)
+        current.clear()
+
+    def walk(node: Tag):
+        for child in node.children:
+            if isinstance(child, Tag):
+                if child.name in ('script', 'style'):
+                    continue
+                if child.name in _BLOCK_TAGS:
+                    flush()
+                    walk(child)
+                    flush()
+                else:
+                    walk(child)
+            elif type(child) is NavigableString:
+                current.append(str(child))
+
+    walk(BeautifulSoup(content_html, 'lxml'))
+    flush()
+    return blocks
+
+
+def run(html: str, rounds: int) -> dict:
+    """运行一篇文章的基准测试，返回各配置的输出大小和耗时"""
+    content_div = _content_div(html)
+    if content_div is None:
+        return {}
+
+    results = {}
+    raw_text = None
+    raw_bytes = None
+    for profile in PROFILES:
+        content_html = sanitize_html(content_div, profile)
+        size = len(content_html.encode("utf-8"))
+        text = _block_texts(content_html)
+        if profile == "raw":
+            raw_text, raw_bytes = text, size
+        results[profile] = {
+            "bytes": size,
+            "ratio": round(size / raw_bytes, 3) if raw_bytes else None,
+            "text_preserved": text == raw_text,
+            "timing": measure(lambda: sanitize_html(content_div, profile), rounds),
+        }
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content HTML sanitizer benchmark")
+    parser.add_argument("--rounds", type=int, default=10, help="每项测量的重复次数")
+    args = parser.parse_args()
+
+    for name, html in load_corpus().items():
+        results = run(html, args.rounds)
+        if not results:
+            print(f"== {name}: no content container ==")
+            continue
+        print(f"== {name} ==")
+        for profile, result in results.items():
+            timing = result["timing"]
+            print(
+                f"  {profile:8s} {result['bytes']:9d} bytes  ratio {result['ratio']:6.3f}  "
+                f"text {'ok' if result['text_preserved'] else 'CHANGED'}  "
+                f"mean {timing['mean_ms']:8.2f} ms  p95 {timing['p95_ms']:8.2f} ms"
+            )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,54 @@
+"""基准测试公共函数（计时、分位数、进程内存）"""
+import math
+import os
+import statistics
+import time
+from typing import Callable, List, Optional
+
+
+def percentile(samples: List[float], p: float) -> float:
+    """最近秩法分位数（p 取 0~100）"""
+    if not samples:
+        return 0.0
+    ordered = sorted(samples)
+    rank = max(1, math.ceil(p / 100 * len(ordered)))
+    return ordered[rank - 1]
+
+
+def summarize(samples_ms: List[float]) -> dict:
+    """耗时样本（毫秒）的统计摘要"""
+    if not samples_ms:
+        return {"count": 0}
+    return {
+        "count": len(samples_ms),
+        "mean_ms": round(statistics.mean(samples_ms), 3),
+        "p50_ms": round(percentile(samples_ms, 50), 3),
+        "p95_ms": round(percentile(samples_ms, 95), 3),
+        "p99_ms": round(percentile(samples_ms, 99), 3),
+        "max_ms": round(max(samples_ms), 3),
+    }
+
+
+def measure(func: Callable[[], object], rounds: int, warmup: int = 1) -> dict:
+    """重复执行 func 并统计耗时"""
+    for _ in range(warmup):
+        func()
+    samples = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        func()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+def rss_mb(pid: Optional[int] = None) -> Optional[float]:
+    """进程当前常驻内存（MB，读取 /proc，非 Linux 返回 None）"""
+    path = f"/proc/{pid or os.getpid()}/status"
+    try:
+        with open(path) as f:
+            for line in f:
+                if line.startswith("VmRSS:"):
+                    return round(int(line.split()[1]) / 1024, 1)
+    except OSError:
+        return None
+    return None
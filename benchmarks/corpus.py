@@ -0,0 +1,39 @@
+"""
+基准测试语料
+
+corpus/ 目录下保存按微信文章页面结构整理的 HTML：
+- text.html: 普通文字文章（含页面脚本、样式、推荐阅读）
+- image_only.html: 纯图片文章（含分隔线、表情、二维码）
+- malformed.html: 缺少 meta、标签未闭合、嵌套错误的页面
+
+huge 由 text.html 的正文重复扩充到约 2 MB，运行时生成，不单独保存。
+"""
+import os
+from typing import Dict
+
+
+CORPUS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "corpus")
+
+# huge 页面的正文重复次数
+HUGE_REPEAT = 80
+
+_CONTENT_OPEN = 'id="js_content" style="visibility: hidden;">\n'
+_CONTENT_END = '<script>console.log("inline");</script>'
+
+
+def make_huge(text_html: str, repeat: int = HUGE_REPEAT) -> str:
+    """把文字文章的正文重复 repeat 次，得到超大页面"""
+    start = text_html.index(_CONTENT_OPEN) + len(_CONTENT_OPEN)
+    end = text_html.index(_CONTENT_END, start)
+    return text_html[:start] + text_html[start:end] * repeat + text_html[end:]
+
+
+def load_corpus() -> Dict[str, str]:
+    """读取全部语料，返回 {名称: HTML}"""
+    corpus = {}
+    for filename in sorted(os.listdir(CORPUS_DIR)):
+        if filename.endswith(".html"):
+            with open(os.path.join(CORPUS_DIR, filename), encoding="utf-8") as f:
+                corpus[filename[:-len(".html")]] = f.read()
+    corpus["huge"] = make_huge(corpus["text"])
+    return corpus
@@ -0,0 +1,186 @@
+"""
+端到端压测
+
+并发请求 /api/parse，统计延迟 p50/p95/p99、吞吐量、状态码分布和服务进程内存（RSS）。
+
+用法（在项目根目录运行）：
+    # 自动启动模拟服务器和 API 服务（HTTP 抓取、关闭缓存和随机延迟）
+    python -m benchmarks.load --spawn --requests 200 --concurrency 10
+
+    # 压测已运行的服务（提供 --server-pid 时采样其内存）
+    python -m benchmarks.load --base-url http://127.0.0.1:8000 --server-pid 12345
+"""
+import argparse
+import asyncio
+import json
+import os
+import subprocess
+import sys
+import time
+from collections import Counter
+from contextlib import contextmanager
+from typing import Iterator, List, Optional
+import httpx
+from benchmarks.common import rss_mb, summarize
+
+
+DEFAULT_PAGES = ["text", "image_only", "malformed", "huge"]
+
+
+def _wait_for(url: str, process: subprocess.Popen, timeout: float = 30.0):
+    """等待服务可访问（进程提前退出时立即报错）"""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f"Process exited with code {process.returncode} before {url} became ready")
+        try:
+            httpx.get(url, timeout=1.0)
+            return
+        except httpx.HTTPError:
+            time.sleep(0.2)
+    raise RuntimeError(f"Service did not become ready: {url}")
+
+
+@contextmanager
+def spawn_stack(api_port: int = 8765, mock_port: int = 8090, mock_latency: float = 0.05, env: Optional[dict] = None) -> Iterator[subprocess.Popen]:
+    """启动模拟服务器和 API 服务，退出时关闭，产出 API 服务进程"""
+    root = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+    mock = subprocess.Popen(
+        [sys.executable, "-m", "benchmarks.mock_server", "--port", str(mock_port), "--latency", str(mock_latency)],
+        cwd=root, stdout=subprocess.DEVNULL
+    )
+    api_env = {
+        **os.environ,
+        "WECHAT_UPSTREAM_BASE": f"http://127.0.0.1:{mock_port}",
+        "FETCH_MODE": "http",
+        "CACHE_BACKEND": "none",
+        "MIN_DELAY": "0",
+        "MAX_DELAY": "0",
+        "OCR_IMAGE_PROBE": "false",
+        "DASHSCOPE_API_KEY": "",
+        **(env or {}),
+    }
+    api = subprocess.Popen(
+        [sys.executable, "-m", "uvicorn", "app.main:app", "--port", str(api_port), "--log-level", "warning"],
+        cwd=root, env=api_env, stdout=subprocess.DEVNULL
+    )
+    try:
+        _wait_for(f"http://127.0.0.1:{mock_port}/_stats", mock)
+        _wait_for(f"http://127.0.0.1:{api_port}/api/health", api)
+        yield api
+    finally:
+        for process in (api, mock):
+            process.terminate()
+            try:
+                process.wait(timeout=10)
+            except subprocess.TimeoutExpired:
+                process.kill()
+
+
+async def run_load(
+    base_url: str,
+    pages: List[str],
+    requests: int,
+    concurrency: int,
+    cache: str = "bypass",
+    server_pid: Optional[int] = None,
+    unique: bool = False,
+) -> dict:
+    """
+    并发请求 /api/parse
+
+    Args:
+        base_url: API 服务地址
+        pages: 轮流请求的语料名
+        requests: 请求总数
+        concurrency: 并发数
+        cache: cache 参数（default / bypass / refresh）
+        server_pid: API 服务进程号（用于采样 RSS）
+        unique: 是否给每个请求生成不同的文章 URL（绕开请求合并）
+
+    Returns:
+        压测结果
+    """
+    latencies: List[float] = []
+    statuses: Counter = Counter()
+    rss_samples: List[float] = []
+    queue: asyncio.Queue = asyncio.Queue()
+    for i in range(requests):
+        name = pages[i % len(pages)]
+        queue.put_nowait(f"{name}-{i}" if unique else name)
+
+    async def worker(client: httpx.AsyncClient):
+        while True:
+            try:
+                article_id = queue.get_nowait()
+            except asyncio.QueueEmpty:
+                return
+            params = {"url": f"https://mp.weixin.qq.com/s/{article_id}", "cache": cache}
+            started = time.perf_counter()
+            try:
+                response = await client.get("/api/parse", params=params)
+                statuses[str(response.status_code)] += 1
+            except httpx.HTTPError as e:
+                statuses[type(e).__name__] += 1
+            latencies.append((time.perf_counter() - started) * 1000)
+
+    async def sample_rss(stop: asyncio.Event):
+        while not stop.is_set():
+            value = rss_mb(server_pid)
+            if value is not None:
+                rss_samples.append(value)
+            try:
+                await asyncio.wait_for(stop.wait(), timeout=0.2)
+            except asyncio.TimeoutError:
+                pass
+
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(sample_rss(stop)) if server_pid else None
+    started = time.perf_counter()
+    async with httpx.AsyncClient(base_url=base_url, timeout=120.0, limits=httpx.Limits(max_connections=concurrency)) as client:
+        await asyncio.gather(*(worker(client) for _ in range(concurrency)))
+    elapsed = time.perf_counter() - started
+    stop.set()
+    if sampler:
+        await sampler
+
+    return {
+        "requests": requests,
+        "concurrency": concurrency,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(requests / elapsed, 2) if elapsed else 0.0,
+        "statuses": dict(statuses),
+        "latency": summarize(latencies),
+        "rss_start_mb": rss_samples[0] if rss_samples else None,
+        "rss_peak_mb": max(rss_samples) if rss_samples else None,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="End-to-end load test for /api/parse")
+    parser.add_argument("--base-url", default="http://127.0.0.1:8000")
+    parser.add_argument("--spawn", action="store_true", help="自动启动模拟服务器和 API 服务")
+    parser.add_argument("--api-port", type=int, default=8765, help="--spawn 时 API 服务端口")
+    parser.add_argument("--mock-port", type=int, default=8090, help="--spawn 时模拟服务器端口")
+    parser.add_argument("--mock-latency", type=float, default=0.05, help="--spawn 时模拟服务器延迟（秒）")
+    parser.add_argument("--server-pid", type=int, help="API 服务进程号（用于采样 RSS）")
+    parser.add_argument("--pages", nargs="+", default=DEFAULT_PAGES, help="轮流请求的语料名")
+    parser.add_argument("--requests", type=int, default=100)
+    parser.add_argument("--concurrency", type=int, default=10)
+    parser.add_argument("--cache", default="bypass", choices=["default", "bypass", "refresh"])
+    parser.add_argument("--unique", action="store_true", help="每个请求使用不同的文章 URL")
+    args = parser.parse_args()
+
+    def run(base_url: str, pid: Optional[int]) -> dict:
+        return asyncio.run(run_load(base_url, args.pages, args.requests, args.concurrency, args.cache, pid, args.unique))
+
+    if args.spawn:
+        with spawn_stack(args.api_port, args.mock_port, args.mock_latency) as api:
+            result = run(f"http://127.0.0.1:{args.api_port}", api.pid)
+    else:
+        result = run(args.base_url, args.server_pid)
+    print(json.dumps(result, indent=2))
+
+
+if __name__ == "__main__":
+    main()
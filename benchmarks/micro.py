@@ -0,0 +1,58 @@
+"""
+解析微基准测试
+
+在语料上测量 ArticleParser.parse_html、clean_text 和 extract_image_urls 的耗时。
+OCR 不参与计时（parse_html 只解析 HTML）。
+
+用法（在项目根目录运行）：
+    python -m benchmarks.micro --rounds 20
+"""
+import argparse
+import json
+from bs4 import BeautifulSoup
+from app.parser import ArticleParser
+from app.utils import clean_text, extract_image_urls
+from benchmarks.common import measure
+from benchmarks.corpus import load_corpus
+
+
+ARTICLE_URL = "https://mp.weixin.qq.com/s/bench"
+
+
+def run_micro(rounds: int = 10) -> dict:
+    """运行全部微基准测试，返回 {名称: 统计摘要}"""
+    corpus = load_corpus()
+    results = {}
+
+    for name, html in corpus.items():
+        results[f"parse.{name}"] = measure(lambda: ArticleParser.parse_html(html, ARTICLE_URL), rounds)
+
+    for name in ("text", "huge"):
+        soup = BeautifulSoup(corpus[name], 'lxml')
+        raw_text = soup.find('div', id='js_content').get_text()
+        results[f"clean_text.{name}"] = measure(lambda: clean_text(raw_text), rounds)
+
+    for name in ("image_only", "huge"):
+        soup = BeautifulSoup(corpus[name], 'lxml')
+        content_div = soup.find('div', id='js_content')
+        results[f"extract_image_urls.{name}"] = measure(lambda: extract_image_urls(soup, content_div), rounds)
+
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parser micro-benchmarks")
+    parser.add_argument("--rounds", type=int, default=10, help="每项测量的重复次数")
+    parser.add_argument("--json", action="store_true", help="以 JSON 输出结果")
+    args = parser.parse_args()
+
+    results = run_micro(args.rounds)
+    if args.json:
+        print(json.dumps(results, indent=2))
+        return
+    for name, summary in results.items():
+        print(f"{name:32s} p50 {summary['p50_ms']:9.3f} ms  p95 {summary['p95_ms']:9.3f} ms  p99 {summary['p99_ms']:9.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
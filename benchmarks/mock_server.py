@@ -0,0 +1,98 @@
+"""
+微信文章本地模拟服务器
+
+以 /s/<语料名> 提供 benchmarks/corpus 中的页面（text、image_only、malformed、huge），
+可配置响应延迟，用于在不访问微信的情况下做端到端压测。
+
+用法：
+    python -m benchmarks.mock_server --port 8090 --latency 0.05
+
+然后设置：
+    WECHAT_UPSTREAM_BASE=http://127.0.0.1:8090
+    FETCH_MODE=http
+并请求 /api/parse?url=https://mp.weixin.qq.com/s/text
+"""
+import argparse
+import random
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from benchmarks.corpus import load_corpus
+
+
+class MockState:
+    """模拟服务器的配置和计数"""
+
+    def __init__(self, latency: float, jitter: float):
+        self.latency = latency
+        self.jitter = jitter
+        self.pages = {name: html.encode("utf-8") for name, html in load_corpus().items()}
+        self.lock = threading.Lock()
+        self.requests = 0
+
+    def delay(self) -> float:
+        return max(0.0, self.latency + random.uniform(-self.jitter, self.jitter))
+
+
+def make_handler(state: MockState):
+    class Handler(BaseHTTPRequestHandler):
+        protocol_version = "HTTP/1.1"
+
+        def _send(self, status: int, body: bytes, content_type: str = "text/html; charset=utf-8"):
+            self.send_response(status)
+            self.send_header("Content-Type", content_type)
+            self.send_header("Content-Length", str(len(body)))
+            self.end_headers()
+            self.wfile.write(body)
+
+        def do_GET(self):
+            path = self.path.split("?", 1)[0].rstrip("/")
+            if path == "/_stats":
+                self._send(200, f'{{"requests": {state.requests}}}'.encode(), "application/json")
+                return
+
+            with state.lock:
+                state.requests += 1
+            time.sleep(state.delay())
+
+            # /s/<语料名> 或 /s/<语料名>-<任意后缀>（后缀用于生成不同的 URL，绕开缓存和请求合并）
+            name = path[len("/s/"):].split("-", 1)[0] if path.startswith("/s/") else ""
+            page = state.pages.get(name)
+            if page is None:
+                self._send(404, b"Not Found", "text/plain")
+                return
+            self._send(200, page)
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def serve(host: str, port: int, latency: float, jitter: float = 0.0) -> ThreadingHTTPServer:
+    """创建模拟服务器（调用方负责 serve_forever / shutdown）"""
+    server = ThreadingHTTPServer((host, port), make_handler(MockState(latency, jitter)))
+    server.daemon_threads = True
+    return server
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Mock WeChat article server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8090)
+    parser.add_argument("--latency", type=float, default=0.05, help="每个响应的模拟延迟（秒）")
+    parser.add_argument("--jitter", type=float, default=0.0, help="延迟随机抖动幅度（秒）")
+    args = parser.parse_args()
+
+    server = serve(args.host, args.port, args.latency, args.jitter)
+    print(f"Mock WeChat server listening on http://{args.host}:{args.port} (pages: /s/<name>)")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,121 @@
+"""
+基准测试入口与回归门禁
+
+运行微基准测试（可选端到端压测），把结果与保存的基线比较：
+任一指标比基线慢（或内存高）超过容差时以非零状态退出。
+
+用法（在项目根目录运行）：
+    # 与基线比较
+    python -m benchmarks.run --load
+
+    # 更新基线（在同一台机器上、确认性能变化符合预期后执行）
+    python -m benchmarks.run --load --save-baseline
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+from typing import List
+from benchmarks.micro import run_micro
+
+
+BASELINE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+
+# 参与比较的指标：微基准测试看 p50，压测看 p95 / p99 和内存峰值
+MICRO_METRIC = "p50_ms"
+LOAD_LATENCY_METRICS = ("p95_ms", "p99_ms")
+
+
+def run_all(rounds: int, load: bool, load_requests: int, load_concurrency: int) -> dict:
+    """运行基准测试，返回结果"""
+    results = {"micro": run_micro(rounds)}
+    if load:
+        from benchmarks.load import DEFAULT_PAGES, run_load, spawn_stack
+        with spawn_stack() as api:
+            results["load"] = asyncio.run(run_load(
+                "http://127.0.0.1:8765", DEFAULT_PAGES, load_requests, load_concurrency,
+                server_pid=api.pid, unique=True
+            ))
+    return results
+
+
+def compare(results: dict, baseline: dict, tolerance: float) -> List[str]:
+    """
+    与基线比较
+
+    Returns:
+        超出容差的指标说明列表（为空表示通过）
+    """
+    regressions = []
+
+    def check(name: str, current, expected):
+        if current is None or not expected:
+            return
+        limit = expected * (1 + tolerance)
+        status = "REGRESSION" if current > limit else "ok"
+        print(f"  {status:10s} {name:44s} {current:10.3f} (baseline {expected:.3f}, limit {limit:.3f})")
+        if current > limit:
+            regressions.append(f"{name}: {current:.3f} > {limit:.3f}")
+
+    for name, summary in results.get("micro", {}).items():
+        expected = baseline.get("micro", {}).get(name)
+        if expected:
+            check(f"micro.{name}.{MICRO_METRIC}", summary.get(MICRO_METRIC), expected.get(MICRO_METRIC))
+
+    load, expected_load = results.get("load"), baseline.get("load")
+    if load and expected_load:
+        for metric in LOAD_LATENCY_METRICS:
+            check(f"load.latency.{metric}", load["latency"].get(metric), expected_load["latency"].get(metric))
+        check("load.rss_peak_mb", load.get("rss_peak_mb"), expected_load.get("rss_peak_mb"))
+        failed = sum(count for status, count in load["statuses"].items() if status != "200")
+        if failed:
+            regressions.append(f"load: {failed} non-200 responses ({load['statuses']})")
+
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run benchmarks and compare against the stored baseline")
+    parser.add_argument("--rounds", type=int, default=10, help="微基准测试每项重复次数")
+    parser.add_argument("--load", action="store_true", help="同时运行端到端压测（启动模拟服务器和 API 服务）")
+    parser.add_argument("--load-requests", type=int, default=100)
+    parser.add_argument("--load-concurrency", type=int, default=8)
+    parser.add_argument("--baseline", default=BASELINE_PATH, help="基线文件路径")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="允许比基线慢的比例")
+    parser.add_argument("--save-baseline", action="store_true", help="把本次结果保存为基线")
+    parser.add_argument("--output", help="把本次结果写入 JSON 文件")
+    args = parser.parse_args()
+
+    results = run_all(args.rounds, args.load, args.load_requests, args.load_concurrency)
+
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(results, f, indent=2)
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(results, f, indent=2)
+            f.write("\n")
+        print(f"Baseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"Baseline not found: {args.baseline} (run with --save-baseline first)")
+        sys.exit(2)
+
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    print(f"Comparing against {args.baseline} (tolerance {args.tolerance:.0%})")
+    regressions = compare(results, baseline, args.tolerance)
+    if regressions:
+        print(f"{len(regressions)} regression(s):")
+        for regression in regressions:
+            print(f"  - {regression}")
+        sys.exit(1)
+    print("No regressions.")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,174 @@
+"""
+DashScope 多模态接口本地桩服务
+
+模拟 qwen3-vl-plus 的 OCR 调用，用于在不消耗配额的情况下测试 OCR 并发、限流和重试。
+
+用法：
+    python scripts/dashscope_stub.py --port 8081 --latency 0.5 --qps 2
+    # 前两次调用依次返回 429、503，之后正常返回
+    python scripts/dashscope_stub.py --port 8081 --fail-first 429,503
+
+然后设置：
+    DASHSCOPE_API_KEY=stub
+    DASHSCOPE_BASE_URL=http://127.0.0.1:8081/api/v1
+"""
+import argparse
+import json
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Iterable
+
+
+GENERATION_PATH = "/api/v1/services/aigc/multimodal-generation/generation"
+
+# 预设失败状态码对应的错误码
+_ERROR_CODES = {
+    400: "InvalidParameter",
+    401: "InvalidApiKey",
+    429: "Throttling.RateQuota",
+}
+
+
+class StubState:
+    """桩服务的配置和计数"""
+
+    def __init__(self, latency: float, qps: float, fail_rate: float, fail_first: Iterable[int] = ()):
+        self.latency = latency
+        self.qps = qps
+        self.fail_rate = fail_rate
+        self.fail_first = deque(fail_first)  # 依次用于最先到达的请求的失败状态码
+        self.lock = threading.Lock()
+        self.window_start = time.monotonic()
+        self.window_count = 0
+        self.requests = 0
+        self.throttled = 0
+        self.failed = 0
+
+    def over_quota(self) -> bool:
+        """按 1 秒窗口统计请求数，超过 qps 时限流"""
+        if self.qps <= 0:
+            return False
+        with self.lock:
+            now = time.monotonic()
+            if now - self.window_start >= 1:
+                self.window_start = now
+                self.window_count = 0
+            self.window_count += 1
+            return self.window_count > self.qps
+
+    def next_failure(self):
+        """取出下一个预设的失败状态码，没有时返回 None"""
+        with self.lock:
+            return self.fail_first.popleft() if self.fail_first else None
+
+
+def _image_urls(body: dict) -> list:
+    urls = []
+    for message in body.get("input", {}).get("messages", []):
+        content = message.get("content")
+        if isinstance(content, list):
+            urls.extend(item["image"] for item in content if isinstance(item, dict) and "image" in item)
+    return urls
+
+
+def _render_text(image_urls: list) -> str:
+    """单图返回该图的文字；多图按 “【图片 n】” 分段返回"""
+    if len(image_urls) == 1:
+        return f"桩服务识别文字：{image_urls[0]}"
+    return "\n\n".join(
+        f"【图片 {idx}】\n桩服务识别文字：{url}" for idx, url in enumerate(image_urls, 1)
+    )
+
+
+def make_handler(state: StubState):
+    class Handler(BaseHTTPRequestHandler):
+        def _send(self, status: int, payload: dict):
+            data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+            self.send_response(status)
+            self.send_header("Content-Type", "application/json")
+            self.send_header("Content-Length", str(len(data)))
+            self.end_headers()
+            self.wfile.write(data)
+
+        def do_POST(self):
+            length = int(self.headers.get("Content-Length") or 0)
+            body = json.loads(self.rfile.read(length) or b"{}")
+            request_id = str(uuid.uuid4())
+
+            if self.path.rstrip("/") != GENERATION_PATH:
+                self._send(404, {"code": "NotFound", "message": f"Unknown path {self.path}", "request_id": request_id})
+                return
+
+            state.requests += 1
+            status = state.next_failure()
+            if status is not None:
+                state.failed += 1
+                code = _ERROR_CODES.get(status, "InternalError")
+                self._send(status, {"code": code, "message": f"Stub scripted {status}", "request_id": request_id})
+                return
+
+            if state.over_quota():
+                state.throttled += 1
+                self._send(429, {"code": "Throttling.RateQuota", "message": "Requests rate limit exceeded", "request_id": request_id})
+                return
+
+            time.sleep(state.latency)
+
+            if state.fail_rate and random.random() < state.fail_rate:
+                state.failed += 1
+                self._send(500, {"code": "InternalError", "message": "Stub internal error", "request_id": request_id})
+                return
+
+            image_urls = _image_urls(body)
+            self._send(200, {
+                "request_id": request_id,
+                "output": {
+                    "choices": [{
+                        "finish_reason": "stop",
+                        "message": {"role": "assistant", "content": [{"text": _render_text(image_urls)}]}
+                    }]
+                },
+                "usage": {"input_tokens": 800 * len(image_urls), "output_tokens": 100, "image_tokens": 800 * len(image_urls)}
+            })
+
+        def do_GET(self):
+            self._send(200, {
+                "requests": state.requests,
+                "throttled": state.throttled,
+                "failed": state.failed,
+            })
+
+        def log_message(self, format, *args):
+            pass
+
+    return Handler
+
+
+def main():
+    parser = argparse.ArgumentParser(description="DashScope multimodal API stub server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8081)
+    parser.add_argument("--latency", type=float, default=0.5, help="每次调用的模拟耗时（秒）")
+    parser.add_argument("--qps", type=float, default=0, help="每秒请求上限，超过返回 429（0 表示不限流）")
+    parser.add_argument("--fail-rate", type=float, default=0, help="返回 500 的概率")
+    parser.add_argument("--fail-first", default="", help="最先到达的请求依次返回的状态码（逗号分隔，如 429,503）")
+    args = parser.parse_args()
+
+    fail_first = [int(status) for status in args.fail_first.split(",") if status.strip()]
+    state = StubState(args.latency, args.qps, args.fail_rate, fail_first)
+    server = ThreadingHTTPServer((args.host, args.port), make_handler(state))
+    print(f"DashScope stub listening on http://{args.host}:{args.port}/api/v1")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.server_close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+测试公共配置
+
+配置在导入 app 时从环境变量读取，这里先设置测试用的默认值：
+不使用缓存和文章库，只用 HTTP 抓取，不做随机延迟，不调用 DashScope。
+"""
+import os
+
+os.environ.setdefault("CACHE_BACKEND", "none")
+os.environ.setdefault("ARTICLE_STORE_BACKEND", "none")
+os.environ.setdefault("OCR_CACHE_ENABLED", "false")
+os.environ.setdefault("FETCH_MODE", "http")
+os.environ.setdefault("MIN_DELAY", "0")
+os.environ.setdefault("MAX_DELAY", "0")
+os.environ.setdefault("BROWSER_PREWARM", "false")
+os.environ.pop("DASHSCOPE_API_KEY", None)
+os.environ.pop("DASHSCOPE_BASE_URL", None)
+
+import pytest
+from app import service
+from benchmarks.corpus import load_corpus
+
+
+@pytest.fixture
+def anyio_backend():
+    return "asyncio"
+
+
+@pytest.fixture
+def fake_fetch(monkeypatch):
+    """抓取直接返回语料中的纯文字文章（不发网络请求），返回该 HTML"""
+    html = load_corpus()["text"]
+
+    async def fake_fetch_html(url, fetch_mode):
+        return html
+
+    monkeypatch.setattr(service, "_fetch_html", fake_fetch_html)
+    return html
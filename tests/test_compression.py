@@ -0,0 +1,80 @@
+"""响应压缩：大响应体在线程中压缩，所有可压缩的响应都带 Vary: Accept-Encoding"""
+import httpx
+import pytest
+from app import compression
+from app.compression import CompressionMiddleware
+from app.config import settings
+
+
+def _app(body: bytes, headers=(), more_body: bool = False):
+    async def app(scope, receive, send):
+        await send({
+            "type": "http.response.start", "status": 200,
+            "headers": [(b"content-type", b"text/plain"), *headers],
+        })
+        await send({"type": "http.response.body", "body": body, "more_body": more_body})
+        if more_body:
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+    return CompressionMiddleware(app)
+
+
+async def _get(app, accept_encoding=None) -> httpx.Response:
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding else {"Accept-Encoding": ""}
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        return await client.get("/", headers=headers)
+
+
+@pytest.fixture
+def threaded_calls(monkeypatch):
+    """记录在线程中执行的压缩"""
+    calls = []
+    to_thread = compression.asyncio.to_thread
+
+    async def recording_to_thread(func, *args):
+        calls.append(len(args[0]))
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(compression.asyncio, "to_thread", recording_to_thread)
+    return calls
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("accept_encoding,size", [
+    (None, 4096),        # 客户端不接受压缩
+    ("gzip", 10),        # 小于 RESPONSE_COMPRESS_MIN_SIZE
+    ("gzip", 4096),      # 压缩
+])
+async def test_vary_on_every_compressible_response(accept_encoding, size):
+    response = await _get(_app(b"x" * size), accept_encoding)
+    assert response.headers.get_list("vary") == ["Accept-Encoding"]
+    assert response.content == b"x" * size
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("existing,expected", [
+    (b"Origin", "Origin, Accept-Encoding"),
+    (b"accept-encoding", "accept-encoding"),
+    (b"*", "*"),
+])
+async def test_vary_merged_into_existing_header(existing, expected):
+    response = await _get(_app(b"x" * 4096, [(b"vary", existing)]), "gzip")
+    assert response.headers.get_list("vary") == [expected]
+
+
+@pytest.mark.anyio
+async def test_streaming_response_untouched():
+    response = await _get(_app(b"x" * 4096, more_body=True), "gzip")
+    assert "vary" not in response.headers
+    assert "content-encoding" not in response.headers
+
+
+@pytest.mark.anyio
+async def test_large_body_compressed_in_thread(threaded_calls, monkeypatch):
+    monkeypatch.setattr(settings, "RESPONSE_COMPRESS_THREAD_SIZE", 8192)
+    small = await _get(_app(b"s" * 4096), "gzip")
+    large = await _get(_app(b"l" * 16384), "gzip")
+
+    assert small.headers["content-encoding"] == large.headers["content-encoding"] == "gzip"
+    assert large.content == b"l" * 16384
+    assert threaded_calls == [16384]
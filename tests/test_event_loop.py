@@ -0,0 +1,60 @@
+"""请求路径不阻塞事件循环：慢解析进行中时 /api/health 的延迟保持平稳"""
+import asyncio
+import time
+import httpx
+import pytest
+from app.main import app
+from app.parser import ArticleParser
+
+
+# 每次解析在执行器线程中额外阻塞的时间（秒）
+PARSE_DELAY = 1.0
+CONCURRENT_PARSES = 4
+
+
+@pytest.fixture
+def slow_parse(fake_fetch, monkeypatch):
+    parse_html = ArticleParser.parse_html
+
+    def blocking_parse_html(*args, **kwargs):
+        time.sleep(PARSE_DELAY)
+        return parse_html(*args, **kwargs)
+
+    monkeypatch.setattr(ArticleParser, "parse_html", staticmethod(blocking_parse_html))
+
+
+async def _health_latencies(client: httpx.AsyncClient, duration: float) -> list:
+    latencies = []
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        started = time.perf_counter()
+        response = await client.get("/api/health")
+        latencies.append(time.perf_counter() - started)
+        assert response.status_code == 200
+        await asyncio.sleep(0.02)
+    return latencies
+
+
+@pytest.mark.anyio
+async def test_health_latency_flat_during_slow_parses(slow_parse):
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test", timeout=30) as client:
+        parses = [
+            asyncio.create_task(client.get("/api/parse", params={"url": f"https://mp.weixin.qq.com/s/slow{i}"}))
+            for i in range(CONCURRENT_PARSES)
+        ]
+        started = time.perf_counter()
+        latencies = await _health_latencies(client, PARSE_DELAY / 2)
+        # 健康检查全部在第一个解析完成之前结束
+        assert not any(parse.done() for parse in parses)
+        responses = await asyncio.gather(*parses)
+        elapsed = time.perf_counter() - started
+
+    assert all(response.status_code == 200 for response in responses)
+    assert all(response.json()["title"] for response in responses)
+    # 解析并行执行，而不是逐个阻塞事件循环
+    assert elapsed >= PARSE_DELAY
+    assert elapsed < PARSE_DELAY * CONCURRENT_PARSES
+    # 解析阻塞事件循环时，健康检查至少要等待一次完整的 PARSE_DELAY
+    assert len(latencies) >= 3
+    assert max(latencies) < PARSE_DELAY / 2
@@ -0,0 +1,90 @@
+"""OCR 图片预过滤：二维码判断和图片头部探测"""
+import struct
+from types import SimpleNamespace
+import httpx
+import pytest
+from app import image_filter
+from app.image_filter import _PROBE_BYTES, filter_by_attributes, filter_images
+
+
+def _image(url: str, width=300, ratio=1.0, alt=None) -> dict:
+    return {"url": url, "width": width, "ratio": ratio, "type": "png", "alt": alt}
+
+
+def _article(square: dict) -> list:
+    """正方形小图位于正文中间，后面还有两张正文图片"""
+    body = [_image(f"https://mmbiz.qpic.cn/mmbiz_png/body{i}/640", width=1080, ratio=1.5) for i in range(3)]
+    return body[:1] + [square] + body[1:]
+
+
+def test_square_image_in_body_is_kept():
+    kept, skipped = filter_by_attributes(_article(_image("https://mmbiz.qpic.cn/mmbiz_png/square/640")))
+    assert "https://mmbiz.qpic.cn/mmbiz_png/square/640" in kept
+    assert skipped == []
+
+
+@pytest.mark.parametrize("square", [
+    _image("https://mmbiz.qpic.cn/mmbiz_png/square/640", alt="长按识别二维码"),
+    _image("https://example.com/static/qrcode.png"),
+    _image("https://example.com/static/wx_qr_code.png"),
+])
+def test_square_image_with_qr_hint_is_skipped(square):
+    kept, skipped = filter_by_attributes(_article(square))
+    assert skipped == [{"url": square["url"], "reason": "likely_qr_code"}]
+
+
+def test_square_image_at_article_end_is_skipped():
+    images = _article(_image("https://mmbiz.qpic.cn/mmbiz_png/square/640"))[:1] + [
+        _image("https://mmbiz.qpic.cn/mmbiz_png/square/640")
+    ]
+    kept, skipped = filter_by_attributes(images)
+    assert skipped == [{"url": "https://mmbiz.qpic.cn/mmbiz_png/square/640", "reason": "likely_qr_code"}]
+
+
+def _png_header(width: int, height: int) -> bytes:
+    return b'\x89PNG\r\n\x1a\n' + struct.pack('>I', 13) + b'IHDR' + struct.pack('>II', width, height)
+
+
+@pytest.fixture
+def image_server(monkeypatch):
+    """忽略 Range 请求头、总是返回完整图片的服务器，记录实际发送的字节数"""
+    sent = {"bytes": 0}
+    bodies = {}
+
+    async def handler(request: httpx.Request) -> httpx.Response:
+        body = bodies[str(request.url)]
+
+        async def stream():
+            for start in range(0, len(body), 16 * 1024):
+                chunk = body[start:start + 16 * 1024]
+                sent["bytes"] += len(chunk)
+                yield chunk
+
+        return httpx.Response(200, content=stream())
+
+    client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+    monkeypatch.setattr(image_filter, "get_http_fetcher", lambda: SimpleNamespace(client=client))
+    return bodies, sent
+
+
+@pytest.mark.anyio
+async def test_probe_stops_after_header_when_range_ignored(image_server):
+    bodies, sent = image_server
+    url = "https://example.com/large.png"
+    bodies[url] = _png_header(1080, 108) + b'\0' * (5 * 1024 * 1024)
+
+    kept, skipped = await filter_images([_image(url, width=None, ratio=None)], probe=True)
+    # 1080x108：高宽比 0.1，保留
+    assert kept == [url]
+    assert sent["bytes"] <= 16 * 1024
+
+
+@pytest.mark.anyio
+async def test_probe_reads_at_most_probe_bytes(image_server):
+    bodies, sent = image_server
+    url = "https://example.com/unknown.bin"
+    bodies[url] = b'\0' * (5 * 1024 * 1024)
+
+    kept, skipped = await filter_images([_image(url, width=None, ratio=None)], probe=True)
+    assert kept == [url]
+    assert sent["bytes"] <= _PROBE_BYTES + 16 * 1024
@@ -0,0 +1,196 @@
+"""queue 模式的任务队列：多进程后端重启崩溃的工作进程，Redis Streams 后端（fakeredis）"""
+import asyncio
+import json
+import multiprocessing
+import os
+import signal
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import ThreadingHTTPServer
+import fakeredis
+import pytest
+import redis.asyncio
+from app import job_queue, worker
+from app.article_store import SQLiteArticleStore
+from app.config import settings
+from app.job_queue import MultiprocessingJobQueue, RedisJobQueue, WorkerCrashedError, result_key
+from app.service import job_result, unwrap_job_result
+from benchmarks.mock_server import MockState, make_handler
+
+
+@pytest.fixture
+def slow_upstream(monkeypatch):
+    """上游延迟 1 秒的模拟服务器（工作进程从环境变量读取地址）"""
+    state = MockState(latency=1.0, jitter=0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    monkeypatch.setenv("WECHAT_UPSTREAM_BASE", f"http://127.0.0.1:{server.server_port}")
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+async def _wait_for(condition, timeout: float = 30):
+    deadline = time.monotonic() + timeout
+    while not condition():
+        assert time.monotonic() < deadline, "condition not met in time"
+        await asyncio.sleep(0.05)
+
+
+@pytest.mark.anyio
+async def test_multiprocessing_worker_restarted_after_crash(slow_upstream, monkeypatch):
+    monkeypatch.setattr(settings, "BROWSER_DRAIN_TIMEOUT", 5)
+    queue = MultiprocessingJobQueue(1, concurrency=2)
+    await queue.start()
+    payload = {"url": "https://mp.weixin.qq.com/s/text", "fetch_mode": "http", "stats_only": False}
+    try:
+        # 工作进程正在抓取时被强制结束：任务立即失败，进程被重启
+        submitted = asyncio.create_task(queue.submit(payload, 30))
+        await _wait_for(lambda: slow_upstream.requests == 1)
+        crashed_pid = queue._handles[0].process.pid
+        os.kill(crashed_pid, signal.SIGKILL)
+        with pytest.raises(WorkerCrashedError):
+            await asyncio.wait_for(submitted, 5)
+
+        await _wait_for(lambda: queue.stats()["alive_workers"] == 1)
+        assert queue._handles[0].process.pid != crashed_pid
+        assert queue.stats()["restarts"] == 1
+        assert queue.stats()["crashed_jobs"] == 1
+
+        # 重启后的工作进程继续处理任务，超出并发数的任务在 API 进程中排队
+        results = await asyncio.gather(*(queue.submit(payload, 30) for _ in range(3)))
+        assert all(unwrap_job_result(result)["title"] for result in results)
+        assert queue.stats()["running"] == 0
+        assert queue.stats()["backlog"] == 0
+    finally:
+        await queue.close()
+
+
+@pytest.fixture
+def fake_redis(monkeypatch):
+    """fakeredis 的 TCP 服务器（阻塞命令需要真实连接，客户端使用 redis-py）"""
+    server = fakeredis.TcpFakeServer(("127.0.0.1", 0))
+    server.daemon_threads = True
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    host, port = server.server_address
+    monkeypatch.setattr(settings, "REDIS_URL", f"redis://{host}:{port}/0")
+    monkeypatch.setattr(settings, "QUEUE_STREAM", "test:jobs")
+    monkeypatch.setattr(settings, "QUEUE_GROUP", "test-workers")
+    yield
+    server.shutdown()
+    server.server_close()
+
+
+@pytest.fixture
+def fake_jobs(monkeypatch):
+    """工作进程不抓取页面、不启动浏览器，直接返回任务中的 URL"""
+    handled = []
+
+    async def handle_job(job):
+        handled.append(job["url"])
+        return job_result(job["job_id"], data={"url": job["url"]})
+
+    async def noop():
+        pass
+
+    monkeypatch.setattr(worker, "handle_job", handle_job)
+    monkeypatch.setattr(worker, "_startup", noop)
+    monkeypatch.setattr(worker, "_shutdown", noop)
+    return handled
+
+
+@pytest.mark.anyio
+async def test_redis_streams_round_trip(fake_redis, fake_jobs):
+    queue = RedisJobQueue(settings.REDIS_URL)
+    await queue.start()
+    consumer = worker.RedisWorker("test-consumer", concurrency=2)
+    running = asyncio.create_task(consumer.run())
+    try:
+        urls = [f"https://mp.weixin.qq.com/s/{i}" for i in range(5)]
+        results = await asyncio.gather(*(queue.submit({"url": url, "fetch_mode": "http"}, 10) for url in urls))
+        assert [unwrap_job_result(result)["url"] for result in results] == urls
+        assert sorted(fake_jobs) == sorted(urls)
+
+        # 处理完的任务已确认并从任务流删除（写入结果之后进行）
+        client = redis.asyncio.from_url(settings.REDIS_URL, decode_responses=True)
+        deadline = time.monotonic() + 5
+        while await client.xlen(settings.QUEUE_STREAM) and time.monotonic() < deadline:
+            await asyncio.sleep(0.05)
+        assert await client.xlen(settings.QUEUE_STREAM) == 0
+        pending = await client.xpending(settings.QUEUE_STREAM, settings.QUEUE_GROUP)
+        assert pending["pending"] == 0
+        await client.aclose()
+    finally:
+        consumer.stop()
+        await asyncio.wait_for(running, 10)
+        await queue.close()
+
+
+@pytest.mark.anyio
+async def test_redis_worker_claims_stale_jobs(fake_redis, fake_jobs, monkeypatch):
+    monkeypatch.setattr(settings, "QUEUE_CLAIM_IDLE", 0.2)
+    client = redis.asyncio.from_url(settings.REDIS_URL, decode_responses=True)
+    await client.xgroup_create(settings.QUEUE_STREAM, settings.QUEUE_GROUP, id="0", mkstream=True)
+
+    # 另一个消费者领取后崩溃，任务未确认
+    job = job_queue.new_job({"url": "https://mp.weixin.qq.com/s/stale", "fetch_mode": "http"}, 30)
+    await client.xadd(settings.QUEUE_STREAM, {"job": json.dumps(job)})
+    await client.xreadgroup(settings.QUEUE_GROUP, "crashed-consumer", {settings.QUEUE_STREAM: ">"}, count=1)
+    await asyncio.sleep(0.3)
+
+    consumer = worker.RedisWorker("test-consumer", concurrency=1)
+    running = asyncio.create_task(consumer.run())
+    try:
+        reply = await client.blpop([result_key(job["job_id"])], timeout=5)
+        assert reply is not None
+        assert unwrap_job_result(json.loads(reply[1]))["url"] == "https://mp.weixin.qq.com/s/stale"
+    finally:
+        consumer.stop()
+        await asyncio.wait_for(running, 10)
+        await client.aclose()
+
+
+@pytest.mark.anyio
+async def test_process_worker_leaves_default_executor_free(fake_jobs):
+    """等待任务时不占用默认执行器的线程（文章库等 asyncio.to_thread 调用仍可执行）"""
+    loop = asyncio.get_running_loop()
+    executor = ThreadPoolExecutor(max_workers=1)
+    loop.set_default_executor(executor)
+    job_reader, job_writer = multiprocessing.Pipe(duplex=False)
+    result_reader, result_writer = multiprocessing.Pipe(duplex=False)
+    running = asyncio.create_task(worker._process_worker_main(job_reader, result_writer, 0))
+    try:
+        await asyncio.sleep(0.1)
+        assert await asyncio.wait_for(asyncio.to_thread(lambda: "free"), 2) == "free"
+
+        job = job_queue.new_job({"url": "https://mp.weixin.qq.com/s/pipe", "fetch_mode": "http"}, 30)
+        job_writer.send(job)
+        await _wait_for(result_reader.poll)
+        assert unwrap_job_result(result_reader.recv())["url"] == "https://mp.weixin.qq.com/s/pipe"
+    finally:
+        job_writer.send(None)
+        await asyncio.wait_for(running, 5)
+        executor.shutdown(wait=False)
+
+
+def test_article_store_waits_for_other_writers(tmp_path):
+    """queue 模式下多个进程共用文章库：WAL 模式，另一连接持有写锁时等待而不是报 database is locked"""
+    path = str(tmp_path / "articles.sqlite3")
+    store = SQLiteArticleStore(path, busy_timeout=3000)
+    assert store._conn.execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+    assert store._conn.execute("PRAGMA busy_timeout").fetchone()[0] == 3000
+
+    other = sqlite3.connect(path, check_same_thread=False)
+    other.execute("BEGIN IMMEDIATE")
+    timer = threading.Timer(0.3, other.commit)
+    timer.start()
+    try:
+        store.put("https://mp.weixin.qq.com/s/locked", {"title": "t"}, "<html></html>", 1)
+        assert store.get("https://mp.weixin.qq.com/s/locked")["article"]["title"] == "t"
+    finally:
+        timer.join()
+        other.close()
+        store.close()
@@ -0,0 +1,108 @@
+"""OCR 重试退避（对本地 DashScope 桩服务）和共享令牌桶"""
+import threading
+import time
+from http.server import ThreadingHTTPServer
+import fakeredis
+import pytest
+from app import vision
+from app.config import settings
+from app.ratelimit import RedisTokenBucket, TokenBucket
+from scripts.dashscope_stub import StubState, make_handler
+
+
+@pytest.fixture
+def stub(monkeypatch):
+    state = StubState(latency=0, qps=0, fail_rate=0)
+    server = ThreadingHTTPServer(("127.0.0.1", 0), make_handler(state))
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+
+    monkeypatch.setattr(settings, "DASHSCOPE_API_KEY", "stub")
+    monkeypatch.setattr(settings, "DASHSCOPE_BASE_URL", f"http://127.0.0.1:{server.server_port}/api/v1")
+    monkeypatch.setattr(settings, "OCR_MAX_RETRIES", 3)
+    monkeypatch.setattr(settings, "OCR_RETRY_BASE_DELAY", 0.01)
+    monkeypatch.setattr(settings, "OCR_RATE_LIMIT_BACKEND", "local")
+    monkeypatch.setattr(settings, "OCR_QPS", 100)
+    monkeypatch.setattr(vision, "_rate_limiter", None)
+    yield state
+    server.shutdown()
+    server.server_close()
+
+
+def _messages(image_url: str = "https://mmbiz.qpic.cn/a/0") -> list:
+    return [{"role": "user", "content": [{"image": image_url}, {"text": "识别图片中的文字"}]}]
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("failures", [[429], [503], [429, 500, 502]])
+async def test_retries_throttling_and_server_errors(stub, failures):
+    stub.fail_first.extend(failures)
+    text = await vision.VisionOCR()._call_with_retry(_messages())
+    assert text == "桩服务识别文字：https://mmbiz.qpic.cn/a/0"
+    assert stub.requests == len(failures) + 1
+
+
+@pytest.mark.anyio
+async def test_gives_up_after_max_retries(stub):
+    stub.fail_first.extend([503] * 10)
+    assert await vision.VisionOCR()._call_with_retry(_messages()) is None
+    assert stub.requests == settings.OCR_MAX_RETRIES + 1
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("status", [400, 401])
+async def test_does_not_retry_client_errors(stub, status):
+    stub.fail_first.append(status)
+    assert await vision.VisionOCR()._call_with_retry(_messages()) is None
+    assert stub.requests == 1
+
+
+def test_local_limiter_split_across_worker_processes(monkeypatch):
+    monkeypatch.setattr(settings, "OCR_RATE_LIMIT_BACKEND", "auto")
+    monkeypatch.setattr(settings, "QUEUE_BACKEND", "multiprocessing")
+    monkeypatch.setattr(settings, "OCR_QPS", 6)
+    monkeypatch.setattr(settings, "OCR_BURST", 8)
+    monkeypatch.setattr(vision, "_rate_limiter", None)
+    monkeypatch.setattr(vision, "_rate_limit_processes", 1)
+    vision.set_ocr_rate_limit_processes(3)
+
+    limiter = vision.get_ocr_rate_limiter()
+    assert isinstance(limiter, TokenBucket)
+    assert (limiter.rate, limiter.capacity) == (2, 8 / 3)
+
+
+@pytest.mark.anyio
+async def test_redis_bucket_shared_between_limiters():
+    server = fakeredis.FakeServer()
+    # 两个进程各自的限流器，连接同一个 Redis
+    limiters = [
+        RedisTokenBucket(
+            fakeredis.aioredis.FakeRedis(server=server), "test:ocr", rate=20, capacity=2,
+            fallback=TokenBucket(20, 2)
+        )
+        for _ in range(2)
+    ]
+
+    started = time.monotonic()
+    for _ in range(3):
+        for limiter in limiters:
+            await limiter.acquire()
+    elapsed = time.monotonic() - started
+
+    # 6 次请求共用容量 2、速率 20/s 的令牌桶：至少等待 4 个令牌的补充时间
+    assert elapsed >= 4 / 20 * 0.9
+    assert all(limiter.redis_errors == 0 for limiter in limiters)
+    for limiter in limiters:
+        await limiter.close()
+
+
+@pytest.mark.anyio
+async def test_redis_bucket_falls_back_to_local_limiter():
+    server = fakeredis.FakeServer()
+    client = fakeredis.aioredis.FakeRedis(server=server)
+    limiter = RedisTokenBucket(client, "test:ocr", rate=100, capacity=1, fallback=TokenBucket(100, 1))
+    server.connected = False
+
+    await limiter.acquire()
+    assert limiter.redis_errors == 1
+    assert limiter.fallback.total_acquired == 1
@@ -0,0 +1,58 @@
+"""PARSER_ENGINE=strained 与 full 在全部语料上的解析结果一致"""
+import pytest
+from app.config import settings
+from app.parser import ArticleParser, BODY_FIELDS
+from app.sanitizer import PROFILES
+from benchmarks.corpus import load_corpus
+
+
+CORPUS = load_corpus()
+
+
+def _parse_with(engine: str, monkeypatch, func, *args):
+    monkeypatch.setattr(settings, "PARSER_ENGINE", engine)
+    return func(*args)
+
+
+@pytest.mark.parametrize("output_format", list(BODY_FIELDS))
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_parse_html_equal(name, output_format, monkeypatch):
+    url = f"https://mp.weixin.qq.com/s/{name}"
+    results = [
+        _parse_with(engine, monkeypatch, ArticleParser.parse_html, CORPUS[name], url, None, output_format)
+        for engine in ("full", "strained")
+    ]
+    assert results[0] == results[1]
+
+
+# 字段选择：只要元数据（不构建正文）、只要纯文本
+@pytest.mark.parametrize("fields", [[], ["content_text"]], ids=["metadata", "content_text"])
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_selected_fields_equal(name, fields, monkeypatch):
+    url = f"https://mp.weixin.qq.com/s/{name}"
+    results = [
+        _parse_with(engine, monkeypatch, ArticleParser.parse_html, CORPUS[name], url, fields)
+        for engine in ("full", "strained")
+    ]
+    assert results[0] == results[1]
+
+
+@pytest.mark.parametrize("profile", PROFILES)
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_content_html_profiles_equal(name, profile, monkeypatch):
+    monkeypatch.setattr(settings, "CONTENT_HTML_PROFILE", profile)
+    url = f"https://mp.weixin.qq.com/s/{name}"
+    results = [
+        _parse_with(engine, monkeypatch, ArticleParser.parse_html, CORPUS[name], url, ["content_html"])
+        for engine in ("full", "strained")
+    ]
+    assert results[0] == results[1]
+
+
+@pytest.mark.parametrize("name", sorted(CORPUS))
+def test_stats_and_completeness_equal(name, monkeypatch):
+    html = CORPUS[name]
+    stats = [_parse_with(engine, monkeypatch, ArticleParser.parse_stats, html) for engine in ("full", "strained")]
+    assert stats[0] == stats[1]
+    complete = [_parse_with(engine, monkeypatch, ArticleParser.is_complete, html) for engine in ("full", "strained")]
+    assert complete[0] == complete[1]
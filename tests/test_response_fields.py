@@ -0,0 +1,107 @@
+"""响应只包含所选格式的正文字段（html 格式的 content_html 不为 null，其他格式的正文字段不出现）"""
+import asyncio
+import json
+import httpx
+import pytest
+from bs4 import BeautifulSoup
+from app.formats import render_blocks, render_markdown
+from app.main import app
+
+
+BODY_FIELDS = {"content_html", "content_markdown", "content_blocks"}
+
+
+@pytest.fixture
+def client(fake_fetch):
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(transport=transport, base_url="http://test")
+
+
+@pytest.mark.anyio
+@pytest.mark.parametrize("output_format,body_field", [
+    ("html", "content_html"),
+    ("markdown", "content_markdown"),
+    ("blocks", "content_blocks"),
+])
+async def test_parse_returns_only_selected_body(client, output_format, body_field):
+    async with client:
+        response = await client.get("/api/parse", params={
+            "url": "https://mp.weixin.qq.com/s/fields-parse", "format": output_format, "cache": "bypass"
+        })
+    assert response.status_code == 200
+    article = response.json()
+    assert article[body_field]
+    assert not (BODY_FIELDS - {body_field}) & set(article)
+
+
+@pytest.mark.anyio
+async def test_fields_with_other_format_body_rejected(client):
+    async with client:
+        response = await client.get("/api/parse", params={
+            "url": "https://mp.weixin.qq.com/s/fields-parse", "format": "markdown", "fields": "title,content_html"
+        })
+    assert response.status_code == 400
+    assert "content_markdown" in response.json()["detail"]
+
+
+@pytest.mark.anyio
+async def test_batch_omits_other_bodies(client):
+    async with client:
+        response = await client.post("/api/parse/batch", json={
+            "urls": ["https://mp.weixin.qq.com/s/fields-batch"], "cache": "bypass"
+        })
+    items = [json.loads(line) for line in response.text.splitlines()]
+    assert [item["status"] for item in items] == ["ok"]
+    article = items[0]["data"]
+    assert article["content_html"]
+    assert not {"content_markdown", "content_blocks"} & set(article)
+
+
+@pytest.mark.anyio
+async def test_job_omits_other_bodies(client):
+    async with client:
+        response = await client.post("/api/jobs", json={
+            "url": "https://mp.weixin.qq.com/s/fields-job", "cache": "bypass"
+        })
+        assert response.status_code == 202
+        job_id = response.json()["job_id"]
+        for _ in range(100):
+            job = (await client.get(f"/api/jobs/{job_id}")).json()
+            if job["status"] in ("done", "error"):
+                break
+            await asyncio.sleep(0.05)
+
+    assert job["status"] == "done"
+    assert job["data"]["content_html"]
+    assert not {"content_markdown", "content_blocks"} & set(job["data"])
+
+
+QUOTE_HTML = (
+    '<div id="js_content"><blockquote><p>引言</p>'
+    '<ul><li>第一项</li><li>第二项</li></ul>'
+    '<table><tr><th>名称</th><th>数量</th></tr><tr><td>苹果</td><td>3</td></tr></table>'
+    '</blockquote></div>'
+)
+
+
+def test_quote_keeps_nested_list_and_table():
+    content_div = BeautifulSoup(QUOTE_HTML, "lxml").find(id="js_content")
+    assert render_blocks(content_div) == [{
+        "type": "quote",
+        "text": "引言",
+        "blocks": [
+            {"type": "paragraph", "text": "引言"},
+            {"type": "list", "ordered": False, "items": ["第一项", "第二项"]},
+            {"type": "table", "rows": [["名称", "数量"], ["苹果", "3"]]},
+        ],
+    }]
+    assert render_markdown(content_div) == (
+        "> 引言\n"
+        ">\n"
+        "> - 第一项\n"
+        "> - 第二项\n"
+        ">\n"
+        "> | 名称 | 数量 |\n"
+        "> | --- | --- |\n"
+        "> | 苹果 | 3 |"
+    )
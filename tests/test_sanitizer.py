@@ -0,0 +1,25 @@
+"""正文 HTML 规范化：段落和行内元素中的块级包装元素不输出为嵌套的 <p>"""
+import pytest
+from bs4 import BeautifulSoup
+from app.sanitizer import sanitize_html
+
+
+def _sanitize(body: str, profile: str) -> str:
+    content_div = BeautifulSoup(f'<div id="js_content">{body}</div>', "lxml").find(id="js_content")
+    return sanitize_html(content_div, profile)
+
+
+@pytest.mark.parametrize("profile", ["clean", "minimal"])
+@pytest.mark.parametrize("body,expected", [
+    ("<p>x<section>y</section></p>", "<p>x<br>y</p>"),
+    ("<p><section>y</section></p>", "<p>y</p>"),
+    ("<p>x<section>y</section>z</p>", "<p>x<br>y<br>z</p>"),
+    ("<p>a<br><section>b</section></p>", "<p>a<br>b</p>"),
+    ("<p>x<section><section>y</section><section>z</section></section></p>", "<p>x<br>y<br>z</p>"),
+    ("<section>a<span><section><p>b</p></section></span>c</section>", "<p>a<br>b<br>c</p>"),
+    ("<section><p>one</p>two<strong>x<section>three</section></strong></section>",
+     "<p>one</p><p>two<strong>x<br>three</strong></p>"),
+    ("<section><p>one</p><section>two</section></section>", "<p>one</p><p>two</p>"),
+])
+def test_no_nested_paragraphs(profile, body, expected):
+    assert _sanitize(body, profile) == f'<div id="js_content">{expected}</div>'
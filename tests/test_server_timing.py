@@ -0,0 +1,26 @@
+"""Server-Timing 包含在执行器线程中计时的阶段"""
+import httpx
+import pytest
+from app.config import settings
+from app.main import app
+
+
+def _stages(header: str) -> set:
+    return {part.split(";", 1)[0].strip() for part in header.split(",")}
+
+
+@pytest.mark.anyio
+async def test_server_timing_includes_executor_stages(fake_fetch, monkeypatch):
+    monkeypatch.setattr(settings, "CONTENT_HTML_PROFILE", "clean")
+    transport = httpx.ASGITransport(app=app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+        html_response = await client.get("/api/parse", params={
+            "url": "https://mp.weixin.qq.com/s/timing-html", "cache": "bypass"
+        })
+        markdown_response = await client.get("/api/parse", params={
+            "url": "https://mp.weixin.qq.com/s/timing-markdown", "cache": "bypass", "format": "markdown"
+        })
+
+    assert html_response.status_code == 200
+    assert {"parse", "sanitize", "serialize", "total"} <= _stages(html_response.headers["Server-Timing"])
+    assert {"parse", "format"} <= _stages(markdown_response.headers["Server-Timing"])
@@ -0,0 +1,51 @@
+"""流式解析：元数据在正文解析完成前产出（不依赖 OCR 的 on_partial），且只解析一次 HTML"""
+import threading
+from types import SimpleNamespace
+import pytest
+from app import service
+from app.parser import ArticleParser
+
+
+# 提取正文等待元数据事件的最长时间（秒），超时说明元数据在等待正文
+RELEASE_TIMEOUT = 10
+
+
+@pytest.fixture
+def gated_parse(fake_fetch, monkeypatch):
+    """提取正文在 gate 打开（测试收到 metadata 事件）之前阻塞，并记录 parse_html 的调用次数"""
+    state = SimpleNamespace(gate=threading.Event(), parses=0)
+    parse_html = ArticleParser.parse_html
+    extract_content = ArticleParser._extract_content
+
+    def counting_parse_html(*args, **kwargs):
+        state.parses += 1
+        return parse_html(*args, **kwargs)
+
+    def gated_extract_content(*args, **kwargs):
+        state.gate.wait(RELEASE_TIMEOUT)
+        return extract_content(*args, **kwargs)
+
+    monkeypatch.setattr(ArticleParser, "parse_html", staticmethod(counting_parse_html))
+    monkeypatch.setattr(ArticleParser, "_extract_content", staticmethod(gated_extract_content))
+    return state
+
+
+@pytest.mark.anyio
+async def test_metadata_precedes_body_for_text_article(gated_parse):
+    url = "https://mp.weixin.qq.com/s/stream-text"
+    events = []
+    body_waiting = []
+    async for name, data in service.stream_article_events(url, "bypass"):
+        if name == "metadata":
+            body_waiting.append(not gated_parse.gate.is_set())
+            gated_parse.gate.set()
+        events.append((name, data))
+
+    assert [name for name, _ in events] == ["metadata", "content", "done"]
+    # 元数据产出时正文仍在等待提取
+    assert body_waiting == [True]
+    assert gated_parse.parses == 1
+    metadata, content = events[0][1], events[1][1]
+    assert metadata["title"]
+    assert metadata["url"] == url
+    assert content["content_html"]